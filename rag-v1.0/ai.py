@@ -1,39 +1,91 @@
+import contextvars
 import os
-import sys
+import threading
+import time
 import requests
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
 
-# Load environment variables from .env file
-load_dotenv()
+from app_context import get_context
+from hybrid_search.hybrid_search import hybrid_search, hybrid_search_many
+from caching.answer_cache import hash_chunk_text
+from caching.expansion_cache import normalize_query
+from generation.context_packer import ContextPacker, DEFAULT_TOKEN_BUDGET
+from observability.tracing import record, span, start_trace, submit_in_context
 
-# Change to hybrid_search directory to fix path issues
-script_dir = os.path.dirname(os.path.abspath(__file__))
-hybrid_search_dir = os.path.join(script_dir, 'hybrid_search')
-os.chdir(hybrid_search_dir)
+# LLM used for both query expansion and answer generation
+LLM_MODEL = "gryphe/mythomax-l2-13b"
 
-# Add paths
-sys.path.append('.')
-sys.path.append('..')
+# Seconds to wait for query expansion before retrieving with the original query only
+EXPANSION_DEADLINE = 5.0
 
-from hybrid_search import hybrid_search
+# Retrieval is CPU-bound, so its pool is sized to the machine and shared by all requests
+SEARCH_WORKERS = int(os.getenv("RAG_SEARCH_WORKERS", os.cpu_count() or 4))
+_search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="rag-search")
 
-def call_openrouter_api(prompt):
+# Expansion calls only wait on the network; keep them off the retrieval pool
+_expansion_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="rag-expansion")
+
+# Response detail levels, smallest first:
+#   answer  - query, answer, sources
+#   sources - adds expanded queries, source attribution and the context chunk IDs
+#   full    - adds the raw search results and context texts
+DETAIL_LEVELS = ("answer", "sources", "full")
+
+# Words of chunk text returned as a snippet when snippets are requested
+SNIPPET_WORDS = 40
+
+# Concurrent LLM calls made by one rag_query_batch
+BATCH_LLM_CONCURRENCY = 8
+
+# Seconds to wait for the LLM API to connect and to send each part of its response
+LLM_TIMEOUT = float(os.getenv("RAG_LLM_TIMEOUT", 60))
+
+# Keep-alive connections to the LLM API, one session per thread: with gevent every thread has
+# its own hub, and a socket must not be used from another hub. Greenlets of a thread share it.
+_llm_local = threading.local()
+
+def _llm_session():
+    session = getattr(_llm_local, "session", None)
+    if session is None:
+        session = _llm_local.session = requests.Session()
+        session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=64))
+        session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=64))
+    return session
+
+# Maximum prompt tokens spent on retrieved context
+CONTEXT_TOKEN_BUDGET = DEFAULT_TOKEN_BUDGET
+
+def get_expansion_cache():
+    """Return the shared expansion cache, opening it on first use."""
+    return get_context().expansion_cache
+
+def get_answer_cache():
+    """Return the shared semantic answer cache."""
+    return get_context().answer_cache
+
+def _chunk_is_current(chunk_id, chunk_hash):
+    """Check that a cached answer's source chunk still exists with the same content."""
+    text = get_context().engines.get_chunk_text(chunk_id)
+    return text is not None and hash_chunk_text(text) == chunk_hash
+
+def call_openrouter_api(prompt, model=LLM_MODEL):
     """Call OpenRouter API directly - fuck LlamaIndex"""
-    api_key = os.getenv("OPENROUTER_API_KEY")
+    rag_context = get_context()
     
-    response = requests.post(
-        "https://openrouter.ai/api/v1/chat/completions",
+    response = _llm_session().post(
+        f"{rag_context.base_url}/chat/completions",
         headers={
-            "Authorization": f"Bearer {api_key}",
+            "Authorization": f"Bearer {rag_context.api_key}",
             "Content-Type": "application/json"
         },
         json={
-            "model": "gryphe/mythomax-l2-13b",
+            "model": model,
             "messages": [
                 {"role": "user", "content": prompt}
             ],
             "max_tokens": 512
-        }
+        },
+        timeout=LLM_TIMEOUT
     )
     
     if response.status_code == 200:
@@ -41,17 +93,23 @@ def call_openrouter_api(prompt):
     else:
         raise Exception(f"OpenRouter error: {response.status_code} - {response.text}")
 
-def expand_query(original_query, num_variations=3):
+def expand_query(original_query, num_variations=3, use_cache=True):
     """
     Generate multiple query variations using OpenRouter for better retrieval.
     
     Args:
         original_query (str): The original user query
         num_variations (int): Number of query variations to generate
+        use_cache (bool): Read through the persistent expansion cache
         
     Returns:
         list: List of expanded/rewritten queries including the original
     """
+    if use_cache:
+        cached = get_expansion_cache().get(original_query, LLM_MODEL, num_variations)
+        if cached:
+            return [original_query] + [q for q in cached if q != original_query][:num_variations]
+    
     expansion_prompt = f"""
 You are a query expansion expert for technical document search. Given a user query, generate {num_variations} alternative phrasings that would help find relevant technical documents.
 
@@ -67,97 +125,355 @@ Format: Return ONLY the alternative queries, one per line, no numbering or extra
 """
     
     try:
-        response = call_openrouter_api(expansion_prompt)
+        with span("expansion"):
+            response = call_openrouter_api(expansion_prompt)
         expanded_queries = [original_query]  # Always include original
+        seen = {normalize_query(original_query)}
         
-        # Parse the response and add variations
+        # Parse the response and add variations (not echoes of the query or repeats)
         for line in response.strip().split('\n'):
-            line = line.strip()
-            if line and line not in expanded_queries:
+            line = line.strip().strip('"\'')
+            if line and normalize_query(line) not in seen:
+                seen.add(normalize_query(line))
                 expanded_queries.append(line)
                 
-        return expanded_queries[:num_variations + 1]  # Limit to requested number + original
+        expanded_queries = expanded_queries[:num_variations + 1]  # Limit to requested number + original
+        
+        # An empty answer or a bare echo of the query is not worth skipping expansion for until the TTL
+        if use_cache and len(expanded_queries) > 1:
+            get_expansion_cache().put(original_query, LLM_MODEL, num_variations, expanded_queries[1:])
+        
+        return expanded_queries
         
     except Exception as e:
         print(f"⚠️ Query expansion failed: {e}")
         return [original_query]  # Fallback to original query
 
-def rag_query(user_query, top_k=3, use_query_expansion=True):
+def merge_search_results(all_results, search_results):
+    """
+    Merge one hybrid_search result set into the combined results (avoiding duplicates).
+    
+    Args:
+        all_results (dict): Combined results, updated in place
+        search_results (dict): Results from a single hybrid_search call
+    """
+    for bm25_result in search_results['bm25']:
+        if not any(r['chunk_id'] == bm25_result['chunk_id'] for r in all_results['bm25']):
+            all_results['bm25'].append(bm25_result)
+            
+    for chroma_result in search_results['chroma']:
+        if not any(r['chunk_id'] == chroma_result['chunk_id'] for r in all_results['chroma']):
+            all_results['chroma'].append(chroma_result)
+    
+    # Merge weighted combinations and final scores
+    for filename, score in search_results['weighted_combination']:
+        if filename not in all_results['final_scores']:
+            all_results['final_scores'][filename] = score
+            all_results['weighted_combination'].append((filename, score))
+        else:
+            # Take the best score if filename appears multiple times
+            if score > all_results['final_scores'][filename]:
+                all_results['final_scores'][filename] = score
+                # Update in weighted_combination
+                all_results['weighted_combination'] = [(f, s) if f != filename else (f, score) 
+                                                     for f, s in all_results['weighted_combination']]
+
+def rag_query(user_query, top_k=3, use_query_expansion=True, expansion_deadline=EXPANSION_DEADLINE,
+              use_cache=True, context_token_budget=CONTEXT_TOKEN_BUDGET, detail="full",
+              include_snippets=False):
     """
     Complete RAG pipeline: Retrieve relevant chunks + Generate answer.
     
+    The original query is searched while query expansion is still running, so the
+    expansion round trip is no longer on the critical path of retrieval.
+    
     Args:
         user_query (str): User's question
         top_k (int): Number of chunks to retrieve
         use_query_expansion (bool): Whether to use query expansion
+        expansion_deadline (float): Seconds to wait for expansion before continuing without variants
+        use_cache (bool): Return the cached answer of a near-duplicate question if one exists and
+            read through the expansion cache (False bypasses and doesn't fill both, e.g. for load tests)
+        context_token_budget (int): Maximum tokens of retrieved context in the prompt
+        detail (str): Which result fields to build, one of DETAIL_LEVELS
+        include_snippets (bool): Add a text snippet to each context chunk reference
         
     Returns:
-        dict: Contains search results and generated answer
+        dict: Contains search results, generated answer and per-stage `timings` in ms
     """
+    prepared = prepare_rag_query(user_query, top_k, use_query_expansion, expansion_deadline, use_cache,
+                                 context_token_budget, detail, include_snippets)
+    if isinstance(prepared, PendingAnswer):
+        return prepared.complete()
+    return prepared
+
+def prepare_rag_query(user_query, top_k=3, use_query_expansion=True, expansion_deadline=EXPANSION_DEADLINE,
+                      use_cache=True, context_token_budget=CONTEXT_TOKEN_BUDGET, detail="full",
+                      include_snippets=False):
+    """
+    rag_query() up to the answer's LLM call: cache lookup, retrieval and context packing.
+    
+    Lets a server make the LLM call somewhere else (e.g. as a greenlet), so waiting for the
+    LLM doesn't hold a worker thread. Arguments are those of rag_query().
+    
+    Returns:
+        dict or PendingAnswer: The result of an answer cache hit, or the packed prompt whose
+            complete() returns the rag_query() result
+    """
+    if detail not in DETAIL_LEVELS:
+        raise ValueError(f"detail must be one of {DETAIL_LEVELS}, got {detail!r}")
+    
+    start = time.perf_counter()
+    with start_trace() as trace:
+        result, pending = _run_rag_query(user_query, top_k, use_query_expansion, expansion_deadline,
+                                         use_cache, context_token_budget, detail, include_snippets)
+        if pending is None:
+            return _with_timings(result, trace, start)
+        
+        pending.trace, pending.start = trace, start
+        return pending
+
+def _with_timings(result, trace, start):
+    record("total", time.perf_counter() - start)
+    if trace is None:
+        return result
+    return {**result, "timings": trace.snapshot()}
+
+class PendingAnswer:
+    """
+    A query whose context is packed; only the LLM call that answers it is left.
+    """
+    
+    def __init__(self, prompt, finish):
+        """
+        Args:
+            prompt (str): Prompt for the LLM
+            finish (callable): finish(answer, error) -> rag_query() result
+        """
+        self.prompt = prompt
+        self._finish = finish
+        self.trace = None  # Set with start by prepare_rag_query()
+        self.start = time.perf_counter()
+        # complete() runs in the request's context, so the generation span lands in its trace
+        self._context = contextvars.copy_context()
+    
+    def complete(self):
+        """
+        Call the LLM and build the result, in any thread or greenlet.
+        
+        Returns:
+            dict: The rag_query() result, with `error` if the LLM call failed
+        """
+        return self._context.run(self._complete)
+    
+    def _complete(self):
+        try:
+            with span("generation"):
+                answer = call_openrouter_api(self.prompt)
+        except Exception as e:
+            result = self._finish(None, e)
+        else:
+            result = self._finish(answer, None)
+        return _with_timings(result, self.trace, self.start)
+
+def _run_rag_query(user_query, top_k, use_query_expansion, expansion_deadline,
+                   use_cache, context_token_budget, detail, include_snippets):
+    """
+    Run the pipeline of prepare_rag_query() inside the current trace.
+    
+    Returns:
+        tuple: (result, None) for an answer cache hit, otherwise (None, PendingAnswer)
+    """
+    use_answer_cache = use_cache
     print(f"🔍 Processing query: '{user_query}'")
     
-    # Step 1: Query expansion (optional)
+    rag_context = get_context()
+    engines = rag_context.engines
+    answer_cache = rag_context.answer_cache
+    query_embedding = None  # Computed for the answer cache, then reused by the semantic search
+    
+    # Step 0: Reuse the answer to a paraphrase of this question if its sources are unchanged
+    if use_answer_cache:
+        with span("answer_cache"):
+            try:
+                query_embedding = engines.embed_query(user_query)
+            except Exception as e:
+                print(f"⚠️ Answer cache unavailable: {e}")
+                use_answer_cache = False
+            
+            if use_answer_cache:
+                cache_params = (top_k, use_query_expansion, context_token_budget, detail, include_snippets)
+                index_version = rag_context.index_version()
+                cached = answer_cache.lookup(query_embedding, params=cache_params, version=index_version,
+                                             is_current=_chunk_is_current)
+        
+        if use_answer_cache and cached:
+            print(f"⚡ Answer cache hit (similarity {cached['similarity']:.3f}): '{cached['query']}'")
+            return {
+                **cached['result'],
+                "query": user_query,
+                "cache_hit": True,
+                "cached_query": cached['query']
+            }, None
+    
+    # Step 1: Start searching the original query right away
+    original_search = submit_in_context(_search_executor, hybrid_search, user_query, top_k=top_k, engines=engines,
+                                        query_embedding=query_embedding)
+    
+    # Step 2: Query expansion (optional) runs concurrently with the original search
     if use_query_expansion:
         print("🔄 Expanding query for better retrieval...")
-        expanded_queries = expand_query(user_query, num_variations=2)
+        expansion = submit_in_context(_expansion_executor, expand_query, user_query, num_variations=2,
+                                      use_cache=use_cache)
+        try:
+            with span("expansion_wait"):
+                expanded_queries = expansion.result(timeout=expansion_deadline)
+        except FutureTimeoutError:
+            # Still queued: drop it. Already calling the LLM: let it finish into the expansion cache,
+            # so the next ask of this question gets its variants without waiting
+            if expansion.cancel():
+                print(f"⏱️ Query expansion missed the {expansion_deadline}s deadline before starting, cancelled")
+            else:
+                print(f"⏱️ Query expansion missed the {expansion_deadline}s deadline, caching its variants for later")
+            expanded_queries = [user_query]
         print(f"📝 Generated {len(expanded_queries)} query variations:")
         for i, q in enumerate(expanded_queries):
             print(f"  {i+1}. {q}")
     else:
         expanded_queries = [user_query]
     
-    # Step 2: Search with all query variations and combine results
+    # Step 3: Search the variants as they arrive and combine results
+    variant_searches = [submit_in_context(_search_executor, hybrid_search, query, top_k=top_k, engines=engines)
+                        for query in expanded_queries[1:]]
+    
     all_results = {'bm25': [], 'chroma': [], 'weighted_combination': [], 'final_scores': {}}
     
-    for query in expanded_queries:
-        search_results = hybrid_search(query, top_k=top_k)
-        
-        # Merge results (avoiding duplicates)
-        for bm25_result in search_results['bm25']:
-            if not any(r['filename'] == bm25_result['filename'] for r in all_results['bm25']):
-                all_results['bm25'].append(bm25_result)
-                
-        for chroma_result in search_results['chroma']:
-            if not any(r['filename'] == chroma_result['filename'] for r in all_results['chroma']):
-                all_results['chroma'].append(chroma_result)
-        
-        # Merge weighted combinations and final scores
-        for filename, score in search_results['weighted_combination']:
-            if filename not in all_results['final_scores']:
-                all_results['final_scores'][filename] = score
-                all_results['weighted_combination'].append((filename, score))
-            else:
-                # Take the best score if filename appears multiple times
-                if score > all_results['final_scores'][filename]:
-                    all_results['final_scores'][filename] = score
-                    # Update in weighted_combination
-                    all_results['weighted_combination'] = [(f, s) if f != filename else (f, score) 
-                                                         for f, s in all_results['weighted_combination']]
+    # Merge in query order so the combined ranking stays deterministic
+    for search in [original_search] + variant_searches:
+        merge_search_results(all_results, search.result())
     
     # Re-sort weighted combination by score
     all_results['weighted_combination'].sort(key=lambda x: x[1], reverse=True)
     
-    # Step 3: Build context from combined weighted results
-    context_chunks = []
-    for filename, _ in all_results['weighted_combination'][:top_k]:  # Use _ for unused score
-        # Find the actual chunk text from either BM25 or ChromaDB results
-        chunk_text = None
+    prompt, finish, context_chunk_hashes = _prepare_answer(user_query, expanded_queries, all_results,
+                                                           top_k, context_token_budget, detail, include_snippets)
+    
+    def finish_and_cache(answer, error):
+        result = finish(answer, error)
+        if use_answer_cache and "error" not in result:
+            answer_cache.add(user_query, query_embedding, context_chunk_hashes, result, params=cache_params,
+                             version=index_version)
+        return result
+    
+    return None, PendingAnswer(prompt, finish_and_cache)
+
+def rag_query_batch(queries, top_k=3, use_query_expansion=True, max_concurrency=BATCH_LLM_CONCURRENCY,
+                    context_token_budget=CONTEXT_TOKEN_BUDGET, detail="full", include_snippets=False,
+                    use_cache=True):
+    """
+    RAG pipeline for many queries at once.
+    
+    Retrieval for every query and variant runs as one batched search (BM25 scores each
+    distinct term once, ChromaDB embeds all queries in one call); expansion and answer
+    generation fan out over at most max_concurrency concurrent LLM calls.
+    
+    Args:
+        queries (list): User questions
+        top_k (int): Number of chunks to retrieve per question
+        use_query_expansion (bool): Whether to use query expansion
+        max_concurrency (int): Maximum concurrent LLM calls
+        context_token_budget (int): Maximum tokens of retrieved context per prompt
+        detail (str): Which result fields to build, one of DETAIL_LEVELS
+        include_snippets (bool): Add a text snippet to each context chunk reference
+        use_cache (bool): Read through the expansion cache
+        
+    Yields:
+        tuple: (index into queries, rag_query-style result), in completion order
+    """
+    if detail not in DETAIL_LEVELS:
+        raise ValueError(f"detail must be one of {DETAIL_LEVELS}, got {detail!r}")
+    
+    engines = get_context().engines
+    llm_pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="rag-batch")
+    
+    try:
+        # Step 1: Expand every query (optional)
+        if use_query_expansion:
+            expanded = list(llm_pool.map(lambda query: expand_query(query, num_variations=2, use_cache=use_cache),
+                                         queries))
+        else:
+            expanded = [[query] for query in queries]
         
-        # Check BM25 results first
-        for result in all_results['bm25']:
-            if result['filename'] == filename:
-                chunk_text = result['text']
-                break
+        # Step 2: One batched search over every distinct query and variant
+        distinct_queries = list(dict.fromkeys(q for variants in expanded for q in variants))
+        searches = dict(zip(distinct_queries, hybrid_search_many(distinct_queries, top_k=top_k, engines=engines)))
         
-        # If not found in BM25, check ChromaDB results
-        if chunk_text is None:
-            for result in all_results['chroma']:
-                if result['filename'] == filename:
-                    chunk_text = result['text']
-                    break
+        # Step 3: Combine each question's results and generate its answer
+        pending = {}
+        for index, (query, variants) in enumerate(zip(queries, expanded)):
+            all_results = {'bm25': [], 'chroma': [], 'weighted_combination': [], 'final_scores': {}}
+            for variant in variants:
+                merge_search_results(all_results, searches[variant])
+            all_results['weighted_combination'].sort(key=lambda x: x[1], reverse=True)
+            
+            future = llm_pool.submit(_generate_answer, query, variants, all_results, top_k, context_token_budget,
+                                     detail, include_snippets)
+            pending[future] = index
         
-        if chunk_text:
-            context_chunks.append(f"Source: {filename}\n{chunk_text}")
+        for future in as_completed(pending):
+            result, _ = future.result()
+            yield pending[future], result
+    
+    finally:
+        # Stop generating answers nobody will read if the consumer goes away
+        llm_pool.shutdown(wait=False, cancel_futures=True)
+
+def _generate_answer(user_query, expanded_queries, all_results, top_k, context_token_budget,
+                     detail="full", include_snippets=False):
+    """
+    Pack the retrieved chunks into a prompt and generate the answer.
+    Only the result fields of the requested detail level are built.
+    
+    Returns:
+        tuple: (result dict, chunk_id -> content hash of the chunks in the context)
+    """
+    prompt, finish, context_chunk_hashes = _prepare_answer(user_query, expanded_queries, all_results, top_k,
+                                                           context_token_budget, detail, include_snippets)
+    try:
+        with span("generation"):
+            answer = call_openrouter_api(prompt)
+    except Exception as e:
+        return finish(None, e), context_chunk_hashes
+    return finish(answer, None), context_chunk_hashes
+
+def _prepare_answer(user_query, expanded_queries, all_results, top_k, context_token_budget,
+                    detail="full", include_snippets=False):
+    """
+    Pack the retrieved chunks into a prompt.
+    
+    Returns:
+        tuple: (prompt, finish(answer, error) building the result dict of the requested detail
+               level, chunk_id -> content hash of the chunks in the context)
+    """
+    # Step 3: Pack the chunks of the top documents into a token-budgeted context
+    candidates = []
+    for filename, score in all_results['weighted_combination'][:top_k]:
+        # Every retrieved chunk of this document, BM25 first
+        for result in all_results['bm25'] + all_results['chroma']:
+            if result['filename'] == filename and result['text']:
+                candidates.append({**result, "score": score})
+    
+    with span("packing"):
+        packed = ContextPacker(token_budget=context_token_budget).pack(candidates)
+    context_chunks = [block['text'] for block in packed]
+    
+    # Only documents that made it into the context are reported as sources
+    packed_sources = list(dict.fromkeys(block['filename'] for block in packed))
+    
+    # chunk_id -> content hash, for answer cache invalidation
+    candidate_texts = {c['chunk_id']: c['text'] for c in candidates}
+    context_chunk_hashes = {chunk_id: hash_chunk_text(candidate_texts[chunk_id])
+                            for block in packed for chunk_id in block['chunk_ids']}
     
     # Step 3: Create context for LLM
     context = "\n\n---\n\n".join(context_chunks)
@@ -178,7 +494,7 @@ INSTRUCTIONS:
 
 ANSWER:"""
 
-    print(f"📚 Retrieved {len(context_chunks)} relevant chunks")
+    print(f"📚 Packed {len(context_chunk_hashes)} relevant chunks into {sum(b['tokens'] for b in packed)} context tokens")
     
     # Step 4.5: Create source attribution with confidence scores - FIXED VERSION
     def create_source_attribution(search_results, top_k):
@@ -197,9 +513,11 @@ ANSWER:"""
                 max_score = max(bm25_scores)
                 min_score = min(bm25_scores)
                 if max_score == min_score:
-                    bm25_normalized[result['filename']] = 1.0
+                    normalized = 1.0
                 else:
-                    bm25_normalized[result['filename']] = (result['score'] - min_score) / (max_score - min_score)
+                    normalized = (result['score'] - min_score) / (max_score - min_score)
+                # Keep the best chunk's score when a document has several chunks
+                bm25_normalized[result['filename']] = max(normalized, bm25_normalized.get(result['filename'], 0))
         
         for result in search_results['chroma']:
             # Re-normalize ChromaDB distances using the same logic as hybrid_search
@@ -208,13 +526,15 @@ ANSWER:"""
                 max_distance = max(chroma_distances)
                 min_distance = min(chroma_distances)
                 if max_distance == min_distance:
-                    chroma_normalized[result['filename']] = 1.0
+                    similarity = 1.0
                 else:
                     similarity = 1 - ((result['distance'] - min_distance) / (max_distance - min_distance))
-                    chroma_normalized[result['filename']] = similarity
+                chroma_normalized[result['filename']] = max(similarity, chroma_normalized.get(result['filename'], 0))
         
-        # Process each source in weighted combination (these scores are already correct!)
+        # Process each packed source in weighted combination (these scores are already correct!)
         for filename, weighted_score in search_results['weighted_combination'][:top_k]:
+            if filename not in packed_sources:
+                continue
             source_info = {
                 "source": filename,
                 "weighted_confidence": round(weighted_score, 3),  # This is already the correct weighted score
@@ -239,29 +559,57 @@ ANSWER:"""
         
         return attribution
     
-    source_attribution = create_source_attribution(all_results, top_k)
+    def create_chunk_references():
+        """IDs (and optionally query-aware snippets) of the chunks packed into the context."""
+        engines = get_context().engines
+        by_id = {c['chunk_id']: c for c in candidates}
+        references = []
+        for block in packed:
+            for chunk_id in block['chunk_ids']:
+                chunk = by_id[chunk_id]
+                reference = {
+                    "chunk_id": chunk_id,
+                    "filename": chunk['filename'],
+                    "chunk_number": chunk['chunk_number'],
+                    "score": round(chunk['score'], 3)
+                }
+                if include_snippets:
+                    # Only computed for the chunks that are returned
+                    snippets = engines.snippets(chunk_id, user_query, chunk['text'], window_words=SNIPPET_WORDS)
+                    if snippets:
+                        reference["snippet"] = snippets[0]['text']
+                        reference["highlights"] = snippets[0]['highlights']
+                references.append(reference)
+        return references
     
-    # Step 5: Generate answer using direct OpenRouter API
-    try:
-        answer = call_openrouter_api(prompt)
+    # Step 5: The answer comes from the OpenRouter API (called by the caller)
+    def finish(answer, error):
+        if error is None:
+            result = {
+                "query": user_query,
+                "answer": answer,
+                "sources": packed_sources
+            }
+        else:
+            result = {
+                "query": user_query,
+                "error": f"Error generating response: {error}"
+            }
         
-        return {
-            "query": user_query,
-            "expanded_queries": expanded_queries if use_query_expansion else [user_query],
-            "answer": answer,
-            "search_results": all_results,
-            "context_used": context_chunks,
-            "sources": [filename for filename, _ in all_results['weighted_combination'][:top_k]],
-            "source_attribution": source_attribution  # NEW: Source attribution with confidence scores
-        }
+        if detail != "answer":
+            result["expanded_queries"] = expanded_queries
+            result["chunks"] = create_chunk_references()
+            if "answer" in result:
+                result["source_attribution"] = create_source_attribution(all_results, top_k)
+        
+        if detail == "full":
+            result["search_results"] = all_results
+            if "answer" in result:
+                result["context_used"] = context_chunks
+        
+        return result
     
-    except Exception as e:
-        return {
-            "query": user_query,
-            "expanded_queries": expanded_queries if use_query_expansion else [user_query],
-            "error": f"Error generating response: {e}",
-            "search_results": all_results
-        }
+    return prompt, finish, context_chunk_hashes
 
 def main():
     """Test the complete RAG system."""
@@ -0,0 +1,275 @@
+"""
+RAG Application Context
+Owns configuration, search engines and caches; heavy modules load on first use or warmup.
+"""
+
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+from caching.expansion_cache import ExpansionCache
+from caching.answer_cache import SemanticAnswerCache
+from observability.metrics import COLD_START_SECONDS
+
+DEFAULT_OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+# 'memory' builds the indexes in each process; 'mmap' maps the files from hybrid_search/mmap_index.py,
+# sharing them between pre-forked workers (server/prefork.py)
+INDEX_BACKENDS = ("memory", "mmap")
+
+# How often (seconds) requests check the generation pointer for a newly published index
+RELOAD_CHECK_SECONDS = float(os.getenv("RAG_RELOAD_CHECK_SECONDS", 2))
+
+# Seconds a swapped-out generation's engines stay open for queries that already hold them
+RETIRE_SECONDS = float(os.getenv("RAG_RETIRE_SECONDS", 60))
+
+# Delay (seconds) before a background warmup with failed components tries again
+WARMUP_RETRY_SECONDS = float(os.getenv("RAG_WARMUP_RETRY_SECONDS", 30))
+
+# Chunks the in-memory indexes load when no index generation is published
+DEFAULT_CHUNKS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "preprocessing", "processed_chunks")
+
+# Minimum cosine similarity for reusing the answer to a paraphrased question
+ANSWER_CACHE_THRESHOLD = 0.92
+
+class RagContext:
+    """
+    Everything a RAG query needs, created without touching the cwd or sys.path.
+    Engines are built lazily, or up front by warmup() so the first query is not cold.
+    """
+
+    def __init__(self, env_file=None):
+        """
+        Args:
+            env_file (str): Optional .env file (defaults to searching from the cwd)
+        """
+        load_dotenv(env_file)
+
+        self.api_key = os.getenv("OPENROUTER_API_KEY")
+        # Override to point at a compatible server (e.g. benchmarks/openrouter_stub.py)
+        self.base_url = os.getenv("OPENROUTER_BASE_URL", DEFAULT_OPENROUTER_BASE_URL)
+
+        self.index_backend = os.getenv("RAG_INDEX_BACKEND", "memory")
+        if self.index_backend not in INDEX_BACKENDS:
+            raise ValueError(f"RAG_INDEX_BACKEND must be one of {', '.join(INDEX_BACKENDS)}")
+        self.mmap_index_dir = os.getenv("RAG_MMAP_INDEX_DIR")
+        # Published index generations (hybrid_search/generations.py); without any, the fixed paths are used
+        self.index_root = os.getenv("RAG_INDEX_ROOT")
+        self.generation = None
+
+        self.answer_cache = SemanticAnswerCache(threshold=ANSWER_CACHE_THRESHOLD)
+        self.cold_start = {}  # component -> seconds (or failure message)
+        self.warmup_failures = []  # Components the last warmup could not load
+        self.ready = threading.Event()  # Set only once every component has loaded
+
+        self._engines = None
+        self._next_reload_check = 0.0
+        self._reloading = None  # Generation being loaded in the background
+        self._failed_generation = None
+        self._expansion_cache = None
+        self._warmup_thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def engines(self):
+        """
+        Search engines, imported and created on first use.
+        Callers keep the object they got for the whole query, so a generation swap
+        never changes the indexes under an in-flight query.
+        """
+        with self._lock:
+            if self._engines is None:
+                self.generation = self._current_generation()
+                self._engines = self._create_engines(self.generation)
+        self._check_for_new_generation()
+        return self._engines
+
+    def _current_generation(self):
+        from hybrid_search.generations import current_generation, DEFAULT_INDEX_ROOT
+        return current_generation(self.index_root or DEFAULT_INDEX_ROOT)
+
+    def _create_engines(self, generation):
+        """
+        Engines over a published generation, or over the fixed index paths if there is none.
+        A generation is leased until _retire_engines(), so pruning doesn't delete it while open.
+        """
+        if generation is not None:
+            from hybrid_search.generations import acquire_lease, open_engines, DEFAULT_INDEX_ROOT
+            root = self.index_root or DEFAULT_INDEX_ROOT
+            acquire_lease(root, generation)
+            return open_engines(root, generation, self.index_backend)
+
+        if self.index_backend == "mmap":
+            from hybrid_search.mmap_index import MmapIndex, DEFAULT_INDEX_DIR
+            return MmapIndex(self.mmap_index_dir or DEFAULT_INDEX_DIR)
+
+        from hybrid_search.hybrid_search import SearchEngines
+        return SearchEngines()
+
+    def _check_for_new_generation(self):
+        """Start loading a newly published generation, at most once per RELOAD_CHECK_SECONDS."""
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_reload_check or self._reloading is not None:
+                return
+            self._next_reload_check = now + RELOAD_CHECK_SECONDS
+
+        generation = self._current_generation()
+        with self._lock:
+            if generation in (None, self.generation, self._failed_generation) or self._reloading is not None:
+                return
+            self._reloading = generation
+
+        threading.Thread(target=self._load_generation, args=(generation,), name="rag-reload", daemon=True).start()
+
+    def _load_generation(self, generation):
+        """Warm up a generation off the request path, then swap it in."""
+        start = time.perf_counter()
+        engines = None
+        try:
+            engines = self._create_engines(generation)
+            timings = engines.warmup()
+            failed = [name for name, seconds in timings.items() if not isinstance(seconds, float)]
+            # The embedding model is shared by every generation; only the indexes must load
+            if any(name != "embedding_model" for name in failed):
+                raise RuntimeError(f"could not load {', '.join(failed)}")
+        except Exception as e:
+            print(f"⚠️ Index generation {generation} failed to load, staying on {self.generation}: {e}")
+            with self._lock:
+                self._failed_generation = generation
+                self._reloading = None
+            self._retire_engines(generation, engines)
+            return
+
+        with self._lock:
+            previous, previous_engines = self.generation, self._engines
+            self._engines = engines
+            self.generation = generation
+            self._reloading = None
+        # Cached answers were generated from the previous corpus
+        self.answer_cache.clear()
+        print(f"🔄 Switched index generation {previous} -> {generation} in {time.perf_counter() - start:.1f}s")
+
+        # Queries that started before the swap keep the old engines; close them once those are done
+        if previous is not None:
+            timer = threading.Timer(RETIRE_SECONDS, self._retire_engines, args=(previous, previous_engines))
+            timer.daemon = True
+            timer.start()
+
+    def _retire_engines(self, generation, engines):
+        """Close a generation's engines and give up this process's lease on it."""
+        from hybrid_search.generations import release_lease, DEFAULT_INDEX_ROOT
+        try:
+            if engines is not None:
+                engines.close()
+        except Exception as e:
+            print(f"⚠️ Closing index generation {generation} failed: {e}")
+        release_lease(self.index_root or DEFAULT_INDEX_ROOT, generation)
+
+    def index_version(self):
+        """
+        Identity of the corpus answers are retrieved from, stored with cached answers so a
+        re-ingest invalidates them: the published generation, or else the modification time
+        of the mmap index's meta file or of the processed chunks directory (whose files are
+        replaced by rename).
+
+        Returns:
+            str: Version, or None if the index files are missing
+        """
+        if self.generation is not None:
+            return f"generation:{self.generation}"
+
+        if self.index_backend == "mmap":
+            from hybrid_search.mmap_index import DEFAULT_INDEX_DIR
+            path = os.path.join(self.mmap_index_dir or DEFAULT_INDEX_DIR, "meta.json")
+        else:
+            path = DEFAULT_CHUNKS_PATH
+        try:
+            return f"{path}:{os.stat(path).st_mtime_ns}"
+        except OSError:
+            return None
+
+    @property
+    def expansion_cache(self):
+        """Persistent expansion cache, opened on first use."""
+        with self._lock:
+            if self._expansion_cache is None:
+                self._expansion_cache = ExpansionCache()
+        return self._expansion_cache
+
+    def warmup(self):
+        """
+        Load (or map) the search indexes and the embedding model, timing each.
+        The context is marked ready only if every component loaded; failures are
+        listed in status() and the worker stays out of rotation.
+
+        Returns:
+            dict: Cold-start seconds per component plus the total
+        """
+        start = time.perf_counter()
+
+        engines = self.engines
+        timings = {"import": round(time.perf_counter() - start, 3)}
+
+        timings.update(engines.warmup())
+        self.expansion_cache  # Opens the SQLite file
+        timings["total"] = round(time.perf_counter() - start, 3)
+
+        self.cold_start = timings
+        self.warmup_failures = [component for component, seconds in timings.items() if not isinstance(seconds, float)]
+        for component, seconds in timings.items():
+            if isinstance(seconds, float):
+                COLD_START_SECONDS.set(component, seconds)
+
+        if self.warmup_failures:
+            print(f"⚠️ Warmup incomplete, not ready: {', '.join(self.warmup_failures)} failed")
+        else:
+            self.ready.set()
+            print(f"🔥 Warmup finished in {timings['total']}s: {timings}")
+        return timings
+
+    def _warmup_until_ready(self):
+        """Repeat warmup() every WARMUP_RETRY_SECONDS until every component has loaded."""
+        while True:
+            try:
+                self.warmup()
+            except Exception as e:
+                self.warmup_failures = [f"warmup: {e}"]
+                print(f"⚠️ Warmup failed: {e}")
+            if self.ready.is_set():
+                return
+            time.sleep(WARMUP_RETRY_SECONDS)
+
+    def start_background_warmup(self):
+        """Warm up on a daemon thread (retrying until ready) so the server can accept liveness checks meanwhile."""
+        if self._warmup_thread is None:
+            self._warmup_thread = threading.Thread(target=self._warmup_until_ready, name="rag-warmup", daemon=True)
+            self._warmup_thread.start()
+        return self._warmup_thread
+
+    def status(self):
+        """
+        Returns:
+            dict: Readiness flag, failed components, cold-start timings and which process/index answered
+        """
+        return {
+            "ready": self.ready.is_set(),
+            "warmup_failures": self.warmup_failures,
+            "pid": os.getpid(),
+            "index_backend": self.index_backend,
+            "generation": self.generation,
+            "cold_start": self.cold_start
+        }
+
+_context = None
+_context_lock = threading.Lock()
+
+def get_context():
+    """Return the process-wide RAG context, creating it on first use."""
+    global _context
+
+    with _context_lock:
+        if _context is None:
+            _context = RagContext()
+    return _context
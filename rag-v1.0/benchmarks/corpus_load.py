@@ -0,0 +1,107 @@
+"""
+Chunk Corpus Benchmark
+Compares loading every chunk from the per-document *_chunks.json files with loading the
+packed corpus (chunk_corpus.py): load time, disk size and a random-access lookup.
+
+Usage:
+    python corpus_load.py --copies 10
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "hybrid_search"))
+
+from chunk_corpus import DEFAULT_CHUNKS_PATH, TEXT_FILE, ChunkCorpus, build_corpus
+
+
+def copy_chunks(chunks_path, target, copies):
+    """Replicate the *_chunks.json files under new names, to stand in for a larger corpus."""
+    for json_file in sorted(os.listdir(chunks_path)):
+        if not json_file.endswith('_chunks.json'):
+            continue
+        with open(os.path.join(chunks_path, json_file), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for copy in range(copies):
+            data['filename'] = f"copy{copy}_{data['filename']}"
+            with open(os.path.join(target, f"copy{copy}_{json_file}"), 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            data['filename'] = data['filename'].split("_", 1)[1]
+
+
+def load_json_files(chunks_path):
+    """The previous loader: list the directory and parse each document's JSON."""
+    records = []
+    for json_file in sorted(os.listdir(chunks_path)):
+        if json_file.endswith('_chunks.json'):
+            with open(os.path.join(chunks_path, json_file), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for i, chunk in enumerate(data['chunks']):
+                records.append((f"{data['filename']}_chunk_{i+1}", chunk))
+    return records
+
+
+def load_corpus(corpus_dir):
+    return [(record["id"], record["text"]) for record in ChunkCorpus(corpus_dir)]
+
+
+def best_of(fn, repeats):
+    """Fastest of several runs (seconds) and the last result."""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def dir_size(path, names):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-document JSON vs packed chunk corpus")
+    parser.add_argument("--chunks", default=DEFAULT_CHUNKS_PATH, help="Directory of *_chunks.json files")
+    parser.add_argument("--copies", type=int, default=1, help="Replicate the documents this many times")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per loader (fastest is reported)")
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp()
+    try:
+        copy_chunks(args.chunks, work, args.copies)
+        json_files = [f for f in os.listdir(work) if f.endswith('_chunks.json')]
+        corpus_dir = os.path.join(work, "corpus")
+        corpus = build_corpus(work, corpus_dir)
+        corpus_files = os.listdir(corpus.path)
+
+        json_time, expected = best_of(lambda: load_json_files(work), args.repeats)
+        corpus_time, records = best_of(lambda: load_corpus(corpus_dir), args.repeats)
+        assert records == expected, "corpus records differ from the JSON files"
+
+        ids = random.Random(0).sample([chunk_id for chunk_id, _ in records], min(1000, len(records)))
+        start = time.perf_counter()
+        for chunk_id in ids:
+            corpus.get(chunk_id)
+        lookup_us = (time.perf_counter() - start) / len(ids) * 1e6
+
+        json_mb = dir_size(work, json_files) / 1e6
+        corpus_mb = dir_size(corpus.path, corpus_files) / 1e6
+        print(f"\n{len(records)} chunks in {len(json_files)} documents")
+        print(f"{'':<14}{'load (s)':>10}{'disk (MB)':>11}{'files':>7}")
+        print(f"{'JSON files':<14}{json_time:>10.3f}{json_mb:>11.1f}{len(json_files):>7}")
+        print(f"{'corpus':<14}{corpus_time:>10.3f}{corpus_mb:>11.1f}{len(corpus_files):>7}")
+        print(f"Load {json_time / corpus_time:.2f}x, disk {corpus_mb / json_mb:.0%} of the JSON files "
+              f"({os.path.getsize(os.path.join(corpus.path, TEXT_FILE)) / 1e6:.1f} MB of text), "
+              f"{lookup_us:.0f} µs per chunk lookup")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
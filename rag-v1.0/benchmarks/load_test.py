@@ -0,0 +1,204 @@
+"""
+End-to-End Load Test
+Drives the REST /query endpoint and the Socket.IO send_query event at a target
+QPS and reports latency percentiles and throughput, overall and per pipeline stage.
+
+Usage:
+    python openrouter_stub.py &
+    OPENROUTER_BASE_URL=http://127.0.0.1:8099/api/v1 python ../server/run.py &
+    python load_test.py --qps 5 --duration 30 --mode both
+"""
+
+import argparse
+import itertools
+import math
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+FRONTEND_ORIGIN = "http://localhost:3000"
+
+DEFAULT_QUERIES = [
+    "Can you give me a brief explanation of antimatter theory?",
+    "What are the key principles of quantum physics?",
+    "How do particle accelerators work?",
+    "How are GaAs detectors affected by radiation?",
+    "What is a Kalman filter used for?",
+    "How do steam ships work?"
+]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class LoadStats:
+    """Thread-safe collector of per-request latencies and stage timings."""
+
+    def __init__(self):
+        self.latencies = []
+        self.stage_timings = defaultdict(list)
+        self.errors = 0
+        self.statuses = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms, response=None, status="ok"):
+        with self._lock:
+            self.statuses[status] += 1
+            if status != "ok":
+                self.errors += 1
+                return
+
+            self.latencies.append(latency_ms)
+
+            # Per-stage timings reported by the pipeline, if present
+            timings = (response or {}).get("timings") or {}
+            for stage, value in timings.items():
+                if isinstance(value, (int, float)):
+                    self.stage_timings[stage].append(value)
+
+    def report(self, label, elapsed):
+        print(f"\n📊 {label}")
+        print("-" * 60)
+        total = len(self.latencies) + self.errors
+        print(f"Requests: {total}  OK: {len(self.latencies)}  Errors: {self.errors}  "
+              f"Statuses: {dict(self.statuses)}")
+        print(f"Throughput: {len(self.latencies) / elapsed:.2f} req/s over {elapsed:.1f}s")
+
+        rows = [("end_to_end", self.latencies)] + sorted(self.stage_timings.items())
+        print(f"{'stage':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+        for stage, values in rows:
+            if values:
+                print(f"{stage:<24}{percentile(values, 50):>10.1f}{percentile(values, 95):>10.1f}"
+                      f"{percentile(values, 99):>10.1f}{sum(values) / len(values):>10.1f}")
+
+
+def rest_request(base_url, payload, stats, timeout):
+    """Send one query to /query."""
+    start = time.perf_counter()
+    try:
+        response = requests.post(f"{base_url}/query", json=payload, timeout=timeout)
+        latency_ms = (time.perf_counter() - start) * 1000
+        if response.status_code != 200:
+            stats.record(latency_ms, status=f"http_{response.status_code}")
+            return
+        payload = response.json()
+        stats.record(latency_ms, payload, status="error" if "error" in payload else "ok")
+    except requests.RequestException:
+        stats.record((time.perf_counter() - start) * 1000, status="exception")
+
+
+def socketio_request(base_url, payload, stats, timeout):
+    """Send one query over the Socket.IO send_query event on a fresh connection."""
+    import socketio
+
+    client = socketio.Client(reconnection=False)
+    done = threading.Event()
+    outcome = {}
+
+    @client.on('query_response')
+    def on_response(data):
+        outcome['response'] = data.get('response', {})
+        outcome['status'] = "error" if "error" in outcome['response'] else "ok"
+        done.set()
+
+    @client.on('error')
+    def on_error(data):
+        outcome['status'] = "error"
+        done.set()
+
+    @client.on('busy')
+    def on_busy(data):
+        outcome['status'] = "busy"
+        done.set()
+
+    try:
+        # The server only accepts the frontend's origins; the websocket transport
+        # would send a second Origin header, so stay on long-polling
+        client.connect(base_url, headers={'Origin': FRONTEND_ORIGIN},
+                       transports=['polling'], wait_timeout=timeout)
+    except Exception:
+        stats.record(0.0, status="connect_failed")
+        return
+
+    try:
+        # Latency is measured from the event, excluding connection setup
+        start = time.perf_counter()
+        client.emit('send_query', payload)
+        if not done.wait(timeout):
+            outcome['status'] = "timeout"
+        latency_ms = (time.perf_counter() - start) * 1000
+        stats.record(latency_ms, outcome.get('response'), status=outcome.get('status', 'timeout'))
+    finally:
+        client.disconnect()
+
+
+def run_load(send, base_url, queries, qps, duration, max_in_flight, timeout, unique):
+    """
+    Open-loop load: issue requests on a fixed schedule regardless of completions.
+
+    Returns:
+        tuple: (LoadStats, elapsed seconds)
+    """
+    stats = LoadStats()
+    interval = 1 / qps
+    total_requests = int(qps * duration)
+    query_cycle = itertools.cycle(queries)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for i in range(total_requests):
+            # Sleep until this request's scheduled send time
+            delay = start + i * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            payload = {"query": next(query_cycle)}
+            if unique:
+                # The suffix keeps identical in-flight queries from being coalesced; the flag makes
+                # the server skip the answer and expansion caches (a paraphrase would still hit them)
+                payload = {"query": f"{payload['query']} (request {i})", "cache": False}
+            executor.submit(send, base_url, payload, stats, timeout)
+
+    return stats, time.perf_counter() - start
+
+
+def main():
+    """Parse arguments and run the load test."""
+    parser = argparse.ArgumentParser(description="Load test the RAG server over REST and Socket.IO")
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="RAG server base URL")
+    parser.add_argument("--mode", choices=["rest", "socketio", "both"], default="rest")
+    parser.add_argument("--qps", type=float, default=2.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load per mode")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="Client-side concurrency cap")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--queries", help="File with one query per line (defaults to a built-in set)")
+    parser.add_argument("--unique", action="store_true",
+                        help="Distinct queries with caching disabled (no coalescing, answer or expansion cache)")
+    args = parser.parse_args()
+
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, 'r', encoding='utf-8') as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    modes = ["rest", "socketio"] if args.mode == "both" else [args.mode]
+    senders = {"rest": rest_request, "socketio": socketio_request}
+
+    for mode in modes:
+        print(f"🚀 {mode}: {args.qps} QPS for {args.duration}s against {args.url}")
+        stats, elapsed = run_load(senders[mode], args.url, queries, args.qps, args.duration,
+                                  args.max_in_flight, args.timeout, args.unique)
+        stats.report(f"{mode} results", elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+OpenRouter-Compatible Stub Server
+Speaks /api/v1/chat/completions (plain and streaming) with configurable latency
+and token rates, so the RAG pipeline can be benchmarked without network or API key.
+
+Usage:
+    python openrouter_stub.py --port 8099 --latency-dist lognormal --latency-ms 400 --tokens-per-sec 60
+    OPENROUTER_BASE_URL=http://127.0.0.1:8099/api/v1 python ../server/run.py
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import time
+import uuid
+
+from flask import Flask, Response, jsonify, request
+
+app = Flask(__name__)
+
+# Replaced from the command line in main()
+config = {
+    "latency_dist": "fixed",
+    "latency_ms": 300.0,
+    "latency_jitter_ms": 100.0,
+    "tokens_per_sec": 50.0,
+    "answer_tokens": 120,
+    "seed": None
+}
+
+FILLER_WORDS = (
+    "antimatter positron annihilation detector energy field particle quantum "
+    "symmetry spectrum measurement calibration photon electron charge model"
+).split()
+
+
+def sample_latency():
+    """Sample time-to-first-token in seconds from the configured distribution."""
+    mean = config["latency_ms"] / 1000
+    jitter = config["latency_jitter_ms"] / 1000
+    dist = config["latency_dist"]
+
+    if dist == "uniform":
+        value = random.uniform(mean - jitter, mean + jitter)
+    elif dist == "normal":
+        value = random.gauss(mean, jitter)
+    elif dist == "lognormal":
+        # Parameterized so the distribution mean is `mean` and the std is `jitter`
+        if mean > 0:
+            sigma2 = math.log(1 + (jitter / mean) ** 2)
+            value = random.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2))
+        else:
+            value = 0
+    elif dist == "exponential":
+        value = random.expovariate(1 / mean) if mean > 0 else 0
+    else:
+        value = mean
+
+    return max(0.0, value)
+
+
+def build_reply(prompt, max_tokens):
+    """Return canned completion tokens shaped like the real responses."""
+    # Query expansion prompts get one alternative query per line
+    expansion = re.search(r'generate (\d+) alternative phrasings', prompt)
+    original = re.search(r'Original query: "(.*)"', prompt)
+    if expansion and original:
+        count = int(expansion.group(1))
+        words = original.group(1).split()
+        lines = [" ".join(words[i:] + words[:i] + [random.choice(FILLER_WORDS)]) for i in range(count)]
+        return [token + " " for token in "\n".join(lines).split(" ")]
+
+    count = min(max_tokens, config["answer_tokens"])
+    return [random.choice(FILLER_WORDS) + " " for _ in range(count)]
+
+
+def completion_payload(completion_id, model, content, prompt_tokens, completion_tokens):
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+
+@app.route('/api/v1/chat/completions', methods=['POST'])
+def chat_completions():
+    data = request.get_json()
+    model = data.get("model", "stub")
+    prompt = "\n".join(m.get("content", "") for m in data.get("messages", []))
+    tokens = build_reply(prompt, data.get("max_tokens", 512))
+    prompt_tokens = len(prompt.split())
+    completion_id = f"gen-{uuid.uuid4().hex[:16]}"
+    token_delay = 1 / config["tokens_per_sec"] if config["tokens_per_sec"] > 0 else 0
+
+    first_token_delay = sample_latency()
+
+    if not data.get("stream"):
+        time.sleep(first_token_delay + token_delay * len(tokens))
+        content = "".join(tokens).strip()
+        return jsonify(completion_payload(completion_id, model, content, prompt_tokens, len(tokens)))
+
+    def stream():
+        time.sleep(first_token_delay)
+        for token in tokens:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            time.sleep(token_delay)
+
+        final = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+        }
+        yield f"data: {json.dumps(final)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return Response(stream(), mimetype="text/event-stream")
+
+
+@app.route('/api/v1/models', methods=['GET'])
+def models():
+    return jsonify({"data": [{"id": "stub", "name": "OpenRouter stub"}]})
+
+
+def main():
+    """Parse arguments and run the stub server."""
+    parser = argparse.ArgumentParser(description="OpenRouter-compatible stub server for offline benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "normal", "lognormal", "exponential"],
+                        default=config["latency_dist"], help="Distribution of time to first token")
+    parser.add_argument("--latency-ms", type=float, default=config["latency_ms"], help="Mean time to first token")
+    parser.add_argument("--latency-jitter-ms", type=float, default=config["latency_jitter_ms"],
+                        help="Spread (uniform half-width or standard deviation)")
+    parser.add_argument("--tokens-per-sec", type=float, default=config["tokens_per_sec"], help="Generation rate")
+    parser.add_argument("--answer-tokens", type=int, default=config["answer_tokens"], help="Tokens per answer")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible runs")
+    args = parser.parse_args()
+
+    config.update({k: v for k, v in vars(args).items() if k in config})
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    print(f"🤖 OpenRouter stub on http://{args.host}:{args.port}/api/v1")
+    print(f"   Latency: {args.latency_dist} {args.latency_ms}ms ± {args.latency_jitter_ms}ms, "
+          f"{args.tokens_per_sec} tokens/s")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
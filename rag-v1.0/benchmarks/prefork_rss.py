@@ -0,0 +1,108 @@
+"""
+Pre-Fork Memory Benchmark
+Starts server/prefork.py with in-memory and with memory-mapped indexes, sends queries to
+every worker and reports per-worker RSS, PSS and private (incremental) memory from /proc.
+
+Usage:
+    python openrouter_stub.py &
+    python ../hybrid_search/mmap_index.py
+    OPENROUTER_BASE_URL=http://127.0.0.1:8099/api/v1 python prefork_rss.py --workers 4
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import requests
+
+from load_test import DEFAULT_QUERIES
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server")
+READY_TIMEOUT = 300  # Seconds to wait for every worker to finish warmup
+
+
+def memory_kb(pid):
+    """Rss, Pss and private memory of a process in kB (Linux smaps_rollup)."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    }
+
+
+def worker_pids(master_pid):
+    with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def wait_until_ready(base_url, workers):
+    """Poll readiness until every worker has answered ready (connections spread across them)."""
+    ready = set()
+    deadline = time.time() + READY_TIMEOUT
+    while time.time() < deadline:
+        try:
+            response = requests.get(f"{base_url}/health/ready", headers={"Connection": "close"}, timeout=5)
+            if response.status_code == 200:
+                ready.add(response.json().get("pid"))
+                if len(ready) >= workers:
+                    return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError("Workers did not become ready")
+
+
+def run_backend(backend, workers, port, queries_per_worker):
+    """Start the pre-forked server with one index backend and measure its workers."""
+    env = dict(os.environ, RAG_INDEX_BACKEND=backend)
+    master = subprocess.Popen([sys.executable, "prefork.py", "--workers", str(workers), "--port", str(port)],
+                              cwd=SERVER_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+
+    try:
+        wait_until_ready(base_url, workers)
+
+        # New connections land on different workers, so every worker touches the indexes
+        for i in range(queries_per_worker * workers):
+            query = DEFAULT_QUERIES[i % len(DEFAULT_QUERIES)]
+            requests.post(f"{base_url}/query", json={"query": f"{query} ({i})", "detail": "answer"},
+                          headers={"Connection": "close"}, timeout=120)
+
+        return [memory_kb(pid) for pid in worker_pids(master.pid)]
+    finally:
+        master.terminate()
+        master.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker memory of the pre-forked server")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--queries-per-worker", type=int, default=3)
+    parser.add_argument("--backends", nargs="+", default=["memory", "mmap"])
+    args = parser.parse_args()
+
+    for backend in args.backends:
+        measurements = run_backend(backend, args.workers, args.port, args.queries_per_worker)
+        count = len(measurements)
+
+        print(f"\n📊 {backend} indexes, {count} workers")
+        print(f"{'':10} {'RSS MB':>10} {'PSS MB':>10} {'Private MB':>12}")
+        for i, m in enumerate(measurements):
+            print(f"worker {i:<3} {m['rss'] / 1024:>10.1f} {m['pss'] / 1024:>10.1f} {m['private'] / 1024:>12.1f}")
+        print(f"{'mean':10} {sum(m['rss'] for m in measurements) / count / 1024:>10.1f} "
+              f"{sum(m['pss'] for m in measurements) / count / 1024:>10.1f} "
+              f"{sum(m['private'] for m in measurements) / count / 1024:>12.1f}")
+        print(f"Total PSS: {sum(m['pss'] for m in measurements) / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
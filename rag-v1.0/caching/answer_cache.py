@@ -0,0 +1,176 @@
+"""
+Semantic Answer Cache
+In-process vector index of answered queries, so paraphrased questions reuse a cached answer.
+"""
+
+import copy
+import hashlib
+import itertools
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_THRESHOLD = 0.92  # Minimum cosine similarity for a cache hit
+DEFAULT_MAX_ENTRIES = 1000
+
+
+def hash_chunk_text(text):
+    """Content hash used to detect chunks that changed in a re-ingest."""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class SemanticAnswerCache:
+    """
+    Stores (query embedding, retrieved chunk hashes, index version, result) and answers
+    nearest-neighbour lookups.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            threshold (float): Minimum cosine similarity between queries for a hit
+            max_entries (int): Least recently used entries are evicted above this size
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # entry_id -> entry, in LRU order
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+        # Vector index over all entries, rebuilt lazily after inserts/evictions
+        self._matrix = None
+        self._matrix_ids = []
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _rebuild_index(self):
+        self._matrix_ids = list(self._entries.keys())
+        if self._matrix_ids:
+            self._matrix = np.stack([self._entries[i]['embedding'] for i in self._matrix_ids])
+        else:
+            self._matrix = None
+
+    def lookup(self, embedding, params=None, version=None, is_current=None):
+        """
+        Find a cached answer for a semantically equivalent query.
+
+        Args:
+            embedding: Query embedding
+            params: Pipeline parameters the cached answer must have been produced with
+            version: Index/corpus version the answer must come from; entries cached
+                under another version are dropped
+            is_current (callable): is_current(chunk_id, chunk_hash) -> bool, used to drop
+                entries whose source chunks changed since they were cached (called
+                without holding the cache lock)
+
+        Returns:
+            dict: {"query", "result", "similarity"} for the best hit (the result is a copy
+                  the caller may modify), or None
+        """
+        query_vector = self._normalize(embedding)
+
+        with self._lock:
+            if self._matrix is None and self._entries:
+                self._rebuild_index()
+            if self._matrix is None:
+                return None
+
+            similarities = self._matrix @ query_vector
+            candidates = []  # (entry_id, entry, similarity), most similar first
+            stale = []
+
+            for position in np.argsort(-similarities):
+                similarity = float(similarities[position])
+                if similarity < self.threshold:
+                    break
+
+                entry_id = self._matrix_ids[position]
+                entry = self._entries.get(entry_id)
+                if entry is None or entry['params'] != params:
+                    continue
+                if entry['version'] != version:
+                    stale.append(entry_id)
+                    continue
+                candidates.append((entry_id, entry, similarity))
+
+            for entry_id in stale:
+                self._remove(entry_id)
+
+        for entry_id, entry, similarity in candidates:
+            # Validate lazily: drop the entry if any source chunk changed
+            if is_current and not all(is_current(cid, h) for cid, h in entry['chunk_hashes'].items()):
+                with self._lock:
+                    self._remove(entry_id)
+                continue
+
+            with self._lock:
+                if entry_id not in self._entries:  # Evicted meanwhile
+                    continue
+                self._entries.move_to_end(entry_id)
+            return {"query": entry['query'], "result": copy.deepcopy(entry['result']), "similarity": similarity}
+
+        return None
+
+    def add(self, query, embedding, chunk_hashes, result, params=None, version=None):
+        """
+        Cache an answer.
+
+        Args:
+            query (str): Query that produced the answer
+            embedding: Query embedding
+            chunk_hashes (dict): chunk_id -> content hash of every chunk used as context
+            result (dict): rag_query result to return on a hit (a copy is stored)
+            params: Pipeline parameters the answer was produced with
+            version: Index/corpus version the answer was retrieved from
+        """
+        result = copy.deepcopy(result)
+
+        with self._lock:
+            self._entries[next(self._ids)] = {
+                'query': query,
+                'embedding': self._normalize(embedding),
+                'chunk_hashes': dict(chunk_hashes),
+                'result': result,
+                'params': params,
+                'version': version
+            }
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+            self._matrix = None
+
+    def invalidate_chunks(self, chunk_ids):
+        """
+        Drop every entry that used any of the given chunks.
+
+        Returns:
+            int: Number of entries removed
+        """
+        chunk_ids = set(chunk_ids)
+
+        with self._lock:
+            stale = [entry_id for entry_id, entry in self._entries.items()
+                     if chunk_ids.intersection(entry['chunk_hashes'])]
+            for entry_id in stale:
+                self._remove(entry_id)
+
+        return len(stale)
+
+    def clear(self):
+        """Drop all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def _remove(self, entry_id):
+        self._entries.pop(entry_id, None)
+        self._matrix = None
+
+    def __len__(self):
+        return len(self._entries)
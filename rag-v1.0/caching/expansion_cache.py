@@ -0,0 +1,133 @@
+"""
+Persistent Query Expansion Cache
+SQLite-backed cache for LLM query expansions with TTL and a size cap.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "expansion_cache.sqlite3")
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600  # One week
+DEFAULT_MAX_ENTRIES = 10000
+
+
+def normalize_query(query):
+    """Normalize query text so trivial case/whitespace differences share a cache entry."""
+    return " ".join(query.lower().split())
+
+
+class ExpansionCache:
+    """
+    Read-through cache for query expansions, keyed by normalized query, model and num_variations.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Open (or create) the cache file.
+
+        Args:
+            path (str): Path to the SQLite file
+            ttl_seconds (float): Entries older than this are treated as misses
+            max_entries (int): Least recently used entries are evicted above this size
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS expansions (
+                key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                model TEXT NOT NULL,
+                num_variations INTEGER NOT NULL,
+                variations TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON expansions(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(query, model, num_variations):
+        """Build the cache key for a query/model/num_variations combination."""
+        raw = f"{model}\x00{num_variations}\x00{normalize_query(query)}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, query, model, num_variations):
+        """
+        Look up cached variations.
+
+        Returns:
+            list: Cached alternative queries (without the original), or None on a miss
+        """
+        key = self.make_key(query, model, num_variations)
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT variations, created_at FROM expansions WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            variations, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM expansions WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+
+            self._conn.execute("UPDATE expansions SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+
+        return json.loads(variations)
+
+    def put(self, query, model, num_variations, variations):
+        """
+        Store alternative queries for a query.
+
+        Args:
+            query (str): Original query
+            model (str): LLM model that produced the variations
+            num_variations (int): Number of variations requested
+            variations (list): Alternative queries (without the original)
+        """
+        key = self.make_key(query, model, num_variations)
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO expansions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, normalize_query(query), model, num_variations, json.dumps(variations), now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop expired entries, then least recently used entries above max_entries."""
+        self._conn.execute("DELETE FROM expansions WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+
+        count = self._conn.execute("SELECT COUNT(*) FROM expansions").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM expansions WHERE key IN "
+                "(SELECT key FROM expansions ORDER BY last_access ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM expansions").fetchone()[0]
+
+    def close(self):
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,91 @@
+"""
+Prewarm the Query Expansion Cache
+Expands every distinct query from a query log so repeat queries skip the LLM call.
+
+Usage:
+    python prewarm_expansion_cache.py queries.log [--num-variations 2] [--workers 4]
+
+The log is either plain text (one query per line) or JSONL with a "query" field per line.
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to import ai.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai import LLM_MODEL, expand_query, get_expansion_cache
+from caching.expansion_cache import normalize_query
+
+
+def read_query_log(log_path):
+    """
+    Read distinct queries from a query log.
+
+    Args:
+        log_path (str): Path to a plain-text or JSONL query log
+
+    Returns:
+        list: Queries in first-seen order, deduplicated by normalized text
+    """
+    queries = []
+    seen = set()
+
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+
+            if line.startswith('{'):
+                try:
+                    line = json.loads(line).get('query', '')
+                except json.JSONDecodeError:
+                    pass
+
+            key = normalize_query(line)
+            if key and key not in seen:
+                seen.add(key)
+                queries.append(line)
+
+    return queries
+
+
+def prewarm(log_path, num_variations=2, workers=4, limit=None):
+    """Expand every uncached query in the log and store the results."""
+    queries = read_query_log(os.path.abspath(log_path))
+    if limit:
+        queries = queries[:limit]
+
+    cache = get_expansion_cache()
+    missing = [q for q in queries if cache.get(q, LLM_MODEL, num_variations) is None]
+    print(f"📝 {len(queries)} distinct queries, {len(missing)} not cached yet")
+
+    def warm(query):
+        return query, expand_query(query, num_variations=num_variations)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for i, (query, expanded) in enumerate(executor.map(warm, missing), 1):
+            status = "✓" if len(expanded) > 1 else "✗"
+            print(f"[{i}/{len(missing)}] {status} {query}")
+
+    print(f"✅ Cache now holds {len(cache)} expansions")
+
+
+def main():
+    """Parse arguments and prewarm the cache."""
+    parser = argparse.ArgumentParser(description="Prewarm the query expansion cache from a query log")
+    parser.add_argument("query_log", help="Plain-text or JSONL query log")
+    parser.add_argument("--num-variations", type=int, default=2, help="Variations per query (rag_query uses 2)")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent LLM calls")
+    parser.add_argument("--limit", type=int, default=None, help="Only warm the first N distinct queries")
+    args = parser.parse_args()
+
+    prewarm(args.query_log, num_variations=args.num_variations, workers=args.workers, limit=args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Test the Semantic Answer Cache
+"""
+
+import numpy as np
+
+from answer_cache import SemanticAnswerCache, hash_chunk_text
+
+PARAMS = (3, True, 2000, "full", False)
+
+
+def vector(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_threshold_and_params():
+    """Near-duplicate queries hit; dissimilar queries and other pipeline parameters miss."""
+
+    print("🧠 Testing Semantic Answer Cache")
+    print("=" * 50)
+
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.add("What is antimatter?", vector(1, 0, 0), {"a.pdf_chunk_1": "h1"}, {"answer": "A"}, params=PARAMS)
+
+    hit = cache.lookup(vector(0.95, 0.1, 0), params=PARAMS)
+    print(f"Paraphrase hit: {hit}")
+    assert hit["result"] == {"answer": "A"} and hit["query"] == "What is antimatter?"
+    assert hit["similarity"] > 0.9
+
+    assert cache.lookup(vector(0.5, 0.8, 0), params=PARAMS) is None  # Below the threshold
+    assert cache.lookup(vector(1, 0, 0), params=(5, True, 2000, "full", False)) is None  # Other top_k
+    assert len(cache) == 1
+
+
+def test_stale_entries_are_dropped():
+    """Entries go away when their chunks change, are invalidated or the index version moves on."""
+
+    cache = SemanticAnswerCache(threshold=0.9)
+    chunks = {"a.pdf_chunk_1": hash_chunk_text("antimatter annihilates"), "b.pdf_chunk_2": hash_chunk_text("positrons")}
+    cache.add("What is antimatter?", vector(1, 0), chunks, {"answer": "A"}, params=PARAMS, version="generation:1")
+    cache.add("Who found positrons?", vector(0, 1), {"b.pdf_chunk_2": chunks["b.pdf_chunk_2"]}, {"answer": "B"},
+              params=PARAMS, version="generation:1")
+
+    # A source chunk changed: the entry is dropped on lookup
+    current = {"a.pdf_chunk_1": "antimatter annihilates with matter", "b.pdf_chunk_2": "positrons"}
+    is_current = lambda chunk_id, chunk_hash: hash_chunk_text(current[chunk_id]) == chunk_hash
+    assert cache.lookup(vector(1, 0), params=PARAMS, version="generation:1", is_current=is_current) is None
+    assert len(cache) == 1
+
+    # Still valid under the same version, dropped once the index version changes
+    assert cache.lookup(vector(0, 1), params=PARAMS, version="generation:1", is_current=is_current)["result"] == {"answer": "B"}
+    assert cache.lookup(vector(0, 1), params=PARAMS, version="generation:2") is None
+    assert len(cache) == 0
+
+    # invalidate_chunks removes every entry that used one of the chunks
+    cache.add("What is antimatter?", vector(1, 0), chunks, {"answer": "A"}, params=PARAMS)
+    cache.add("Who found positrons?", vector(0, 1), {"b.pdf_chunk_2": "h"}, {"answer": "B"}, params=PARAMS)
+    removed = cache.invalidate_chunks(["a.pdf_chunk_1"])
+    print(f"Invalidated {removed} entries, {len(cache)} left")
+    assert removed == 1 and len(cache) == 1
+    assert cache.lookup(vector(1, 0), params=PARAMS) is None
+    assert cache.lookup(vector(0, 1), params=PARAMS)["result"] == {"answer": "B"}
+
+
+def test_hits_are_copies():
+    """Changing a stored or returned result doesn't change what the cache returns next time."""
+
+    cache = SemanticAnswerCache(threshold=0.9)
+    result = {"answer": "A", "sources": ["a.pdf"]}
+    cache.add("What is antimatter?", vector(1, 0), {}, result, params=PARAMS)
+    result["sources"].append("b.pdf")
+
+    hit = cache.lookup(vector(1, 0), params=PARAMS)
+    hit["result"]["sources"].append("c.pdf")
+    assert cache.lookup(vector(1, 0), params=PARAMS)["result"] == {"answer": "A", "sources": ["a.pdf"]}
+
+
+if __name__ == "__main__":
+    test_threshold_and_params()
+    test_stale_entries_are_dropped()
+    test_hits_are_copies()
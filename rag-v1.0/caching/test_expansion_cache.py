@@ -0,0 +1,53 @@
+"""
+Test the Persistent Query Expansion Cache
+"""
+
+import os
+import tempfile
+import time
+
+from expansion_cache import ExpansionCache
+
+
+def test_expansion_cache():
+    """Test hits, normalization, TTL and the size cap."""
+
+    print("🔍 Testing Expansion Cache")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = ExpansionCache(path=os.path.join(tmp_dir, "cache.sqlite3"), ttl_seconds=60, max_entries=2)
+
+        variations = ["antiparticle physics", "positron theory"]
+        cache.put("Explain antimatter", "test-model", 2, variations)
+
+        # Case and whitespace differences share one entry
+        hit = cache.get("  explain   ANTIMATTER ", "test-model", 2)
+        print(f"Normalized hit: {hit}")
+        assert hit == variations
+
+        # Model and num_variations are part of the key
+        assert cache.get("Explain antimatter", "other-model", 2) is None
+        assert cache.get("Explain antimatter", "test-model", 3) is None
+
+        # Least recently used entry is evicted above max_entries
+        cache.put("quantum physics", "test-model", 2, ["quantum mechanics"])
+        cache.get("Explain antimatter", "test-model", 2)
+        cache.put("particle accelerators", "test-model", 2, ["synchrotron"])
+        print(f"Entries after eviction: {len(cache)}")
+        assert len(cache) == 2
+        assert cache.get("quantum physics", "test-model", 2) is None
+
+        # Expired entries are misses
+        cache.ttl_seconds = 0.01
+        time.sleep(0.05)
+        assert cache.get("Explain antimatter", "test-model", 2) is None
+        print("Expired entry treated as a miss")
+
+        cache.close()
+
+    print("🎉 Expansion cache working!")
+
+
+if __name__ == "__main__":
+    test_expansion_cache()
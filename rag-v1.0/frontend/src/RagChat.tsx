@@ -5,10 +5,11 @@ interface RagResponse {
   query: string;
   expanded_queries: string[];
   answer: string;
-  search_results: any;
-  context_used: string[];
+  search_results?: any;  // Only with detail: 'full'
+  context_used?: string[];  // Only with detail: 'full'
   sources: string[];
   source_attribution: any[];
+  chunks?: { chunk_id: string; filename: string; chunk_number: number; score: number; snippet?: string }[];
   error?: string;
 }
 
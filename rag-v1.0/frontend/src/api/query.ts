@@ -4,15 +4,18 @@ interface RagResponse {
   query: string;
   expanded_queries: string[];
   answer: string;
-  search_results: any;
-  context_used: string[];
+  search_results?: any;  // Only with detail: 'full'
+  context_used?: string[];  // Only with detail: 'full'
   sources: string[];
   source_attribution: any[];
+  chunks?: { chunk_id: string; filename: string; chunk_number: number; score: number; snippet?: string }[];
   error?: string;
 }
 
 interface QueryRequest {
   query: string;
+  detail?: 'answer' | 'sources' | 'full';  // Server default: 'sources'
+  snippets?: boolean;
 }
 
 const API_BASE_URL = 'http://127.0.0.1:5000';
@@ -0,0 +1,224 @@
+"""
+Token-Budgeted Context Packing
+Merges overlapping chunks of the same document, drops repeated sentences and
+fills a token budget greedily by retrieval score.
+"""
+
+import os
+import re
+import threading
+import time
+from typing import Dict, List
+
+DEFAULT_TOKEN_BUDGET = 2500
+TOKENIZER_ENCODING = "cl100k_base"
+
+# tiktoken downloads the encoding on first use (then caches it, see TIKTOKEN_CACHE_DIR).
+# Queries wait at most this long for it in total; until it arrives token counts are approximated
+TOKENIZER_LOAD_TIMEOUT = float(os.getenv("RAG_TOKENIZER_LOAD_TIMEOUT", 2.0))
+
+# Longest word overlap searched for between neighbouring chunks
+MAX_OVERLAP_WORDS = 200
+
+# Sentence/line boundaries; captured so the original separators can be kept
+_SEGMENT_SPLIT = re.compile(r'((?<=[.!?])\s+|\n+)')
+_APPROX_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+_encoder = None
+_encoder_loaded = threading.Event()
+_encoder_deadline = None
+_encoder_lock = threading.Lock()
+
+
+def _load_encoder():
+    """Load the tiktoken encoding (in the background, it may need a download)."""
+    global _encoder
+
+    try:
+        import tiktoken
+        _encoder = tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as e:
+        print(f"⚠️ tiktoken unavailable, approximating token counts: {e}")
+    finally:
+        _encoder_loaded.set()
+
+
+def _get_encoder():
+    """
+    The tiktoken encoding, or None while it is still loading or if it is unavailable.
+
+    The first call starts loading it; callers wait for it until TOKENIZER_LOAD_TIMEOUT
+    after that, so a slow or blocked download never stalls more than the first queries.
+    """
+    global _encoder_deadline
+
+    if not _encoder_loaded.is_set():
+        with _encoder_lock:
+            if _encoder_deadline is None:
+                _encoder_deadline = time.monotonic() + TOKENIZER_LOAD_TIMEOUT
+                threading.Thread(target=_load_encoder, name="tiktoken-load", daemon=True).start()
+        _encoder_loaded.wait(max(0.0, _encoder_deadline - time.monotonic()))
+
+    return _encoder
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken, or approximate by words and punctuation."""
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return len(_APPROX_TOKEN.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text down to at most max_tokens tokens."""
+    encoder = _get_encoder()
+    if encoder is not None:
+        tokens = encoder.encode(text, disallowed_special=())
+        return encoder.decode(tokens[:max_tokens])
+
+    matches = list(_APPROX_TOKEN.finditer(text))
+    if len(matches) <= max_tokens:
+        return text
+    return text[:matches[max_tokens].start()].rstrip()
+
+
+def merge_overlapping(first: str, second: str) -> str:
+    """
+    Join two neighbouring chunks, dropping the words the second repeats from the end of the first.
+
+    Args:
+        first (str): Earlier chunk text
+        second (str): Following chunk text
+
+    Returns:
+        str: Combined text
+    """
+    first_words = first.split()
+    second_words = second.split()
+
+    for size in range(min(len(first_words), len(second_words), MAX_OVERLAP_WORDS), 0, -1):
+        if first_words[-size:] == second_words[:size]:
+            return first + " " + " ".join(second_words[size:])
+
+    return first + " " + second
+
+
+class ContextPacker:
+    """
+    Packs retrieved chunks into an LLM context under a token budget.
+    """
+
+    def __init__(self, token_budget: int = DEFAULT_TOKEN_BUDGET, min_sentence_words: int = 5):
+        """
+        Args:
+            token_budget (int): Maximum tokens for the packed context
+            min_sentence_words (int): Shorter segments (headings, labels) are never deduplicated
+        """
+        self.token_budget = token_budget
+        self.min_sentence_words = min_sentence_words
+
+    def pack(self, candidates: List[Dict]) -> List[Dict]:
+        """
+        Pack candidate chunks into context blocks.
+
+        Args:
+            candidates (List[Dict]): Chunks with chunk_id, filename, chunk_number, text and score,
+                ordered by score (best first)
+
+        Returns:
+            List[Dict]: Packed blocks with filename, chunk_ids, text and tokens, best first
+        """
+        blocks = self._merge_adjacent(candidates)
+        blocks.sort(key=lambda b: b['score'], reverse=True)
+
+        seen_sentences = set()
+        packed = []
+        used_tokens = 0
+
+        for block in blocks:
+            # Sentences only count as seen once their block is actually packed
+            block_sentences = set(seen_sentences)
+            text = self._drop_seen_sentences(block['text'], block_sentences)
+            if not text.strip():
+                continue
+
+            entry = f"Source: {block['filename']}\n{text}"
+            tokens = count_tokens(entry)
+
+            if used_tokens + tokens > self.token_budget:
+                if packed:
+                    continue  # Try smaller blocks further down the ranking
+                entry = truncate_to_tokens(entry, self.token_budget)
+                tokens = count_tokens(entry)
+                block_sentences = set(seen_sentences)  # Only what survived the cut
+                self._drop_seen_sentences(entry, block_sentences)
+
+            packed.append({
+                'filename': block['filename'],
+                'chunk_ids': block['chunk_ids'],
+                'text': entry,
+                'tokens': tokens
+            })
+            used_tokens += tokens
+            seen_sentences = block_sentences
+
+        return packed
+
+    def _merge_adjacent(self, candidates: List[Dict]) -> List[Dict]:
+        """Merge consecutive chunks of the same document into single blocks."""
+        by_document = {}
+        seen_ids = set()
+
+        for rank, candidate in enumerate(candidates):
+            if candidate['chunk_id'] in seen_ids:
+                continue
+            seen_ids.add(candidate['chunk_id'])
+            by_document.setdefault(candidate['filename'], []).append((rank, candidate))
+
+        blocks = []
+        for filename, chunks in by_document.items():
+            chunks.sort(key=lambda item: item[1]['chunk_number'])
+
+            current = None
+            for rank, chunk in chunks:
+                if current and chunk['chunk_number'] == current['last_chunk_number'] + 1:
+                    current['text'] = merge_overlapping(current['text'], chunk['text'])
+                    current['chunk_ids'].append(chunk['chunk_id'])
+                    current['last_chunk_number'] = chunk['chunk_number']
+                    current['score'] = max(current['score'], chunk['score'])
+                    current['rank'] = min(current['rank'], rank)
+                else:
+                    current = {
+                        'filename': filename,
+                        'chunk_ids': [chunk['chunk_id']],
+                        'text': chunk['text'],
+                        'last_chunk_number': chunk['chunk_number'],
+                        'score': chunk['score'],
+                        'rank': rank
+                    }
+                    blocks.append(current)
+
+        # Stable on retrieval order for equal scores
+        blocks.sort(key=lambda b: b['rank'])
+        return blocks
+
+    def _drop_seen_sentences(self, text: str, seen_sentences: set) -> str:
+        """Remove sentences already packed from another block (or earlier in this one)."""
+        parts = _SEGMENT_SPLIT.split(text)
+        kept = []
+
+        # parts alternates segment, separator, segment, ...
+        for i in range(0, len(parts), 2):
+            segment = parts[i]
+            separator = parts[i + 1] if i + 1 < len(parts) else ""
+            key = " ".join(segment.lower().split())
+
+            if len(key.split()) >= self.min_sentence_words:
+                if key in seen_sentences:
+                    continue
+                seen_sentences.add(key)
+
+            kept.append(segment + separator)
+
+        return "".join(kept)
@@ -0,0 +1,131 @@
+"""
+Test Token-Budgeted Context Packing
+"""
+
+import sys
+import threading
+import time
+import types
+
+import context_packer
+from context_packer import ContextPacker, count_tokens, merge_overlapping
+
+
+def test_overlap_merge():
+    """Adjacent chunks that repeat sentences are merged without the repetition."""
+
+    print("🔍 Testing overlap merge")
+    print("=" * 50)
+
+    first = "Antimatter is matter made of antiparticles\nPositrons are antielectrons with positive charge"
+    second = "Positrons are antielectrons with positive charge\nThey annihilate with electrons"
+
+    merged = merge_overlapping(first, second)
+    print(f"Merged: {merged}")
+    assert merged.count("Positrons are antielectrons") == 1
+
+
+def test_context_packing():
+    """Pack chunks of two documents under a tight budget."""
+
+    print("\n🔍 Testing context packing")
+    print("=" * 50)
+
+    shared = "The isodual theory predicts antimatter emits a new light"
+    candidates = [
+        {"chunk_id": "paper_a_chunk_1", "filename": "paper_a", "chunk_number": 1, "score": 0.9,
+         "text": f"Intro to antimatter theory and its history\n{shared}"},
+        {"chunk_id": "paper_a_chunk_2", "filename": "paper_a", "chunk_number": 2, "score": 0.9,
+         "text": f"{shared}\nExperimental tests are proposed for the future"},
+        {"chunk_id": "paper_b_chunk_7", "filename": "paper_b", "chunk_number": 7, "score": 0.4,
+         "text": f"{shared}\nA completely different discussion of gravity " + "word " * 400},
+    ]
+
+    packed = ContextPacker(token_budget=200).pack(candidates)
+
+    for block in packed:
+        print(f"  {block['filename']} {block['chunk_ids']} ({block['tokens']} tokens)")
+
+    # Neighbouring chunks of paper_a become a single block
+    assert packed[0]['chunk_ids'] == ["paper_a_chunk_1", "paper_a_chunk_2"]
+    assert packed[0]['text'].count(shared) == 1
+
+    # paper_b does not fit in the remaining budget
+    assert len(packed) == 1
+    assert sum(b['tokens'] for b in packed) <= 200
+    print(f"Total tokens: {sum(count_tokens(b['text']) for b in packed)}")
+
+
+
+def test_skipped_block_keeps_its_sentences_available():
+    """A block dropped for the budget doesn't remove its sentences from blocks that do fit."""
+
+    print("\n🔍 Testing sentences of skipped blocks")
+    print("=" * 50)
+
+    shared = "Positrons annihilate with electrons into two gamma photons."
+    candidates = [
+        {"chunk_id": "paper_a_chunk_1", "filename": "paper_a", "chunk_number": 1, "score": 0.9,
+         "text": "Antimatter was predicted by Dirac in 1928."},
+        {"chunk_id": "paper_b_chunk_4", "filename": "paper_b", "chunk_number": 4, "score": 0.8,
+         "text": f"{shared}\n" + "word " * 400},
+        {"chunk_id": "paper_c_chunk_2", "filename": "paper_c", "chunk_number": 2, "score": 0.5,
+         "text": f"{shared}\nThe photons carry 511 keV each."},
+    ]
+
+    packed = ContextPacker(token_budget=100).pack(candidates)
+    print(f"Packed: {[block['filename'] for block in packed]}")
+
+    assert [block['filename'] for block in packed] == ["paper_a", "paper_c"]
+    assert shared in packed[1]['text']
+
+
+def test_slow_tokenizer_download():
+    """A tiktoken download that hangs delays queries by at most the load timeout."""
+
+    print("\n🔍 Testing a slow tokenizer download")
+    print("=" * 50)
+
+    download = threading.Event()
+
+    class WordEncoder:
+        def encode(self, text, disallowed_special=()):
+            return text.split()
+
+    def get_encoding(name):
+        download.wait()
+        return WordEncoder()
+
+    saved = (sys.modules.get("tiktoken"), context_packer.TOKENIZER_LOAD_TIMEOUT, context_packer._encoder,
+             context_packer._encoder_loaded, context_packer._encoder_deadline)
+    sys.modules["tiktoken"] = types.SimpleNamespace(get_encoding=get_encoding)
+    context_packer.TOKENIZER_LOAD_TIMEOUT = 0.2
+    context_packer._encoder = None
+    context_packer._encoder_loaded = threading.Event()
+    context_packer._encoder_deadline = None
+    try:
+        start = time.perf_counter()
+        assert count_tokens("antimatter, positrons") == 3  # Approximated: two words and a comma
+        assert count_tokens("antimatter, positrons") == 3  # No second wait
+        elapsed = time.perf_counter() - start
+        print(f"Waited {elapsed:.2f}s for the tokenizer")
+        assert elapsed < 1.0
+
+        download.set()
+        context_packer._encoder_loaded.wait(5)
+        assert count_tokens("antimatter, positrons") == 2  # The encoding arrived
+    finally:
+        download.set()
+        (tiktoken, context_packer.TOKENIZER_LOAD_TIMEOUT, context_packer._encoder,
+         context_packer._encoder_loaded, context_packer._encoder_deadline) = saved
+        if tiktoken is None:
+            sys.modules.pop("tiktoken", None)
+        else:
+            sys.modules["tiktoken"] = tiktoken
+
+
+if __name__ == "__main__":
+    test_overlap_merge()
+    test_context_packing()
+    test_skipped_block_keeps_its_sentences_available()
+    test_slow_tokenizer_download()
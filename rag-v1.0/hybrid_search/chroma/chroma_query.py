@@ -3,56 +3,180 @@ Simple ChromaDB Query Function
 Uses the same logic as test_chromadb.py but as a reusable function.
 """
 
-import chromadb
 import os
+import threading
+
+# Use absolute path to eliminate path confusion bullshit
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chroma_db")
+COLLECTION_NAME = "scientific_papers"
+
+class ChromaIndex:
+    """
+    Persistent ChromaDB collection, opened once on first use.
+    chromadb itself is only imported then, keeping module import cheap.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, collection_name=COLLECTION_NAME):
+        """
+        Args:
+            db_path (str): ChromaDB persistence directory
+            collection_name (str): Collection to query
+        """
+        self.db_path = db_path
+        self.collection_name = collection_name
+        self._client = None
+        self._collection = None
+        self._embedding_function = None
+        # Client and collection are opened once; concurrent PersistentClient creation races
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Open the persistent collection (idempotent, thread-safe).
+
+        Returns:
+            Collection: The ChromaDB collection
+        """
+        with self._lock:
+            if self._collection is None:
+                import chromadb
+
+                # Connect to existing database with absolute path
+                self._client = chromadb.PersistentClient(path=self.db_path)
+                self._collection = self._client.get_or_create_collection(self.collection_name)
+                print(f"📦 ChromaDB '{self.collection_name}' contains {self._collection.count()} chunks")
+
+        return self._collection
+
+    def close(self):
+        """Close the client (e.g. of a generation that was swapped out); load() opens it again."""
+        with self._lock:
+            # Clients of older chromadb versions have no close()
+            if self._client is not None and hasattr(self._client, "close"):
+                self._client.close()
+            self._client = None
+            self._collection = None
+
+    def embed_query(self, query):
+        """
+        Embed a query with the collection's default embedding model.
+
+        Args:
+            query (str): Query text
+
+        Returns:
+            list: Query embedding vector
+        """
+        return self.embed_documents([query])[0]
+
+    def embed_documents(self, texts):
+        """
+        Embed texts as one batch with the collection's default embedding model.
+
+        Args:
+            texts (list): Texts to embed
+
+        Returns:
+            list: One embedding vector per text
+        """
+        with self._lock:
+            if self._embedding_function is None:
+                from chromadb.utils import embedding_functions
+                self._embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        return self._embedding_function(list(texts))
+
+    def search(self, query, top_k=5, query_embedding=None):
+        """
+        Search ChromaDB for relevant chunks using the same logic as test_chromadb.py.
+
+        Args:
+            query (str): Search query
+            top_k (int): Number of results to return
+            query_embedding: The query's embed_query() vector, if the caller already has it
+
+        Returns:
+            list: Results with metadata and distances
+        """
+        collection = self.load()
+
+        # An empty collection can't be queried
+        if collection.count() == 0:
+            return []
+
+        # Search for most relevant chunks (same as test_chromadb.py)
+        if query_embedding is not None:
+            results = collection.query(query_embeddings=[[float(x) for x in query_embedding]], n_results=top_k)
+        else:
+            results = collection.query(
+                query_texts=[query],
+                n_results=top_k
+            )
+
+        return self._format_results(results, 0)
+
+    def search_many(self, queries, top_k=5):
+        """
+        Search several queries with one collection query, so they are embedded as a batch.
+
+        Args:
+            queries (list): Search queries
+            top_k (int): Number of results per query
+
+        Returns:
+            list: One result list per query, in input order
+        """
+        collection = self.load()
+
+        if not queries or collection.count() == 0:
+            return [[] for _ in queries]
+
+        results = collection.query(
+            query_texts=list(queries),
+            n_results=top_k
+        )
+
+        return [self._format_results(results, i) for i in range(len(queries))]
+
+    def _format_results(self, results, query_index):
+        """Format one query's results in the expected format for hybrid search."""
+        formatted_results = []
+        if results['documents'][query_index]:
+            for chunk_id, doc, metadata, distance in zip(
+                results['ids'][query_index],
+                results['documents'][query_index],
+                results['metadatas'][query_index],
+                results['distances'][query_index]
+            ):
+                formatted_results.append({
+                    "chunk_id": chunk_id,
+                    "text": doc,
+                    "filename": metadata['filename'],
+                    "chunk_number": metadata['chunk_number'],
+                    "distance": distance
+                })
+
+        return formatted_results
+
+# Shared default index
+default_index = ChromaIndex()
+
+def embed_query(query):
+    """Embed a query with the default collection's embedding model."""
+    return default_index.embed_query(query)
 
 def chroma_search(query, top_k=5):
     """
     Search ChromaDB for relevant chunks using the same logic as test_chromadb.py.
-    
+
     Args:
         query (str): Search query
         top_k (int): Number of results to return
-        
+
     Returns:
         list: Results with metadata and distances
     """
-    # Use absolute path to eliminate path confusion bullshit
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    db_path = os.path.join(script_dir, "chroma_db")
-    
-    # Connect to existing database with absolute path
-    client = chromadb.PersistentClient(path=db_path)
-    collection = client.get_or_create_collection("scientific_papers")
-    
-    # Check how many documents we have
-    count = collection.count()
-    print(f"Available collections: ['scientific_papers']")
-    print(f"Database contains: {count} chunks")
-    
-    if count == 0:
-        print("No collections found in database!")
-        return []
-    
-    # Search for most relevant chunks (same as test_chromadb.py)
-    results = collection.query(
-        query_texts=[query],
-        n_results=top_k
-    )
-    
-    # Format results in the expected format for hybrid search
-    formatted_results = []
-    if results['documents'][0]:
-        for i, (doc, metadata, distance) in enumerate(zip(
-            results['documents'][0],
-            results['metadatas'][0], 
-            results['distances'][0]
-        )):
-            formatted_results.append({
-                "text": doc,
-                "filename": metadata['filename'],
-                "chunk_number": metadata['chunk_number'],
-                "distance": distance
-            })
-    
-    return formatted_results
+    return default_index.search(query, top_k)
+
+def chroma_search_many(queries, top_k=5):
+    """Search the default collection for several queries at once."""
+    return default_index.search_many(queries, top_k)
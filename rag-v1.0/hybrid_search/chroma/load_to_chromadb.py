@@ -3,45 +3,49 @@ Load processed PDF chunks into ChromaDB
 """
 
 import chromadb
-import json
 import os
+import sys
 
-def load_chunks_to_chromadb():
-    """Load all processed chunks into ChromaDB."""
+try:
+    from ..chunk_corpus import iter_chunk_records
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from chunk_corpus import iter_chunk_records
+
+# Use absolute path to eliminate path confusion bullshit
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB_PATH = os.path.join(SCRIPT_DIR, "chroma_db")
+DEFAULT_CHUNKS_DIR = os.path.join(os.path.dirname(os.path.dirname(SCRIPT_DIR)), "preprocessing", "processed_chunks")
+
+def load_chunks_to_chromadb(chunks_dir=DEFAULT_CHUNKS_DIR, db_path=DEFAULT_DB_PATH):
+    """
+    Load all processed chunks into ChromaDB.
     
-    # Use absolute path to eliminate path confusion bullshit
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    db_path = os.path.join(script_dir, "chroma_db")
+    Args:
+        chunks_dir (str): Directory containing *_chunks.json files or a chunk corpus
+        db_path (str): ChromaDB persistence directory (e.g. a new index generation)
+    """
     
     # Create ChromaDB client with persistent storage
     client = chromadb.PersistentClient(path=db_path)
     collection = client.get_or_create_collection("scientific_papers")
     
     # Load processed chunks
-    chunks_dir = "../../preprocessing/processed_chunks"
     all_ids = []
     all_documents = []
     all_metadatas = []
     
-    print("Loading chunks from JSON files...")
+    print("Loading chunks...")
     
-    for json_file in os.listdir(chunks_dir):
-        if json_file.endswith('_chunks.json'):
-            print(f"Processing {json_file}")
-            
-            with open(os.path.join(chunks_dir, json_file), 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Add each chunk with unique ID
-            for i, chunk in enumerate(data['chunks']):
-                chunk_id = f"{data['filename']}_chunk_{i+1}"
-                all_ids.append(chunk_id)
-                all_documents.append(chunk)
-                all_metadatas.append({
-                    "filename": data['filename'],
-                    "chunk_number": i+1,
-                    "total_chunks": data['chunk_count']
-                })
+    # Each record already carries its unique ID
+    for record in iter_chunk_records(chunks_dir):
+        all_ids.append(record["id"])
+        all_documents.append(record["text"])
+        all_metadatas.append({
+            "filename": record["filename"],
+            "chunk_number": record["chunk_number"],
+            "total_chunks": record["total_chunks"]
+        })
     
     # Add all chunks to ChromaDB
     print(f"\nAdding {len(all_documents)} chunks to ChromaDB...")
@@ -0,0 +1,348 @@
+"""
+Chunk Corpus
+All chunks in one columnar corpus: the texts back to back in a single UTF-8 file, their byte
+offsets and page ranges in numpy arrays and the per-document layout in a small JSON file, so
+the retrievers read a few files instead of globbing and parsing a pretty-printed JSON per document.
+
+Each build is written to its own corpus-<id> directory and published by replacing the CORPUS
+pointer file, so readers see one complete corpus or the other. Reading never writes: without a
+current corpus, the *_chunks.json files are read directly.
+
+Pack processed_chunks (ingest_pipeline.py and generations.py do this after their runs):
+    python chunk_corpus.py build
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+# Processed chunks, resolved from this file so the working directory doesn't matter
+DEFAULT_CHUNKS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "preprocessing", "processed_chunks"
+)
+
+TEXT_FILE = "corpus_text.bin"  # UTF-8 chunk texts, concatenated
+OFFSETS_FILE = "corpus_offsets.npy"  # int64 byte offset of each text, plus the end of the file
+PAGES_FILE = "corpus_pages.npy"  # int32 (first_page, last_page) per chunk, 0 if unknown
+META_FILE = "corpus_meta.json"
+POINTER_FILE = "CORPUS"  # Name of the published corpus-<id> directory
+FORMAT_VERSION = 1
+
+# Superseded corpus directories kept for readers that opened them just before a publish
+KEEP_PREVIOUS = 1
+
+
+def chunk_id(filename, chunk_number):
+    """Chunk ID shared by every index: '<filename>_chunk_<n>' (n from 1)."""
+    return f"{filename}_chunk_{chunk_number}"
+
+
+def _source_files(chunks_path):
+    """Per-document *_chunks.json files written by the preprocessing processors."""
+    return sorted(f for f in os.listdir(chunks_path) if f.endswith('_chunks.json'))
+
+
+def published_corpus(corpus_dir):
+    """
+    Directory of the published corpus.
+
+    Returns:
+        str: Path of the corpus-<id> directory, or None if nothing was published
+    """
+    try:
+        with open(os.path.join(corpus_dir, POINTER_FILE), 'r', encoding='utf-8') as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(corpus_dir, name) if name else None
+
+
+class ChunkCorpusWriter:
+    """
+    Appends documents to a new corpus-<id> directory; the arrays and meta file are written
+    and the CORPUS pointer swapped to it on close(), so readers never see a partial corpus.
+    """
+
+    def __init__(self, corpus_dir):
+        """
+        Args:
+            corpus_dir (str): Directory for the corpus (created if missing)
+        """
+        os.makedirs(corpus_dir, exist_ok=True)
+        self.corpus_dir = corpus_dir
+        self.name = f"corpus-{time.time_ns()}-{os.getpid()}"
+        self.path = os.path.join(corpus_dir, self.name)
+        os.makedirs(self.path)
+        self._file = open(os.path.join(self.path, TEXT_FILE), 'wb')
+        self._offsets = [0]
+        self._pages = []
+        self._files = {}  # filename -> [first chunk, chunk count]
+
+    def add_document(self, filename, chunks, chunk_pages=None):
+        """
+        Append one document's chunks in order.
+
+        Args:
+            filename (str): Source document name
+            chunks (list): Chunk texts
+            chunk_pages (list): Optional [first_page, last_page] per chunk
+        """
+        if filename in self._files:
+            raise ValueError(f"{filename} is already in the corpus")
+        self._files[filename] = [len(self._pages), len(chunks)]
+
+        for i, text in enumerate(chunks):
+            data = text.encode('utf-8')
+            self._file.write(data)
+            self._offsets.append(self._offsets[-1] + len(data))
+            self._pages.append(tuple(chunk_pages[i]) if chunk_pages and chunk_pages[i] else (0, 0))
+
+    def close(self, sources=None):
+        """
+        Publish the corpus.
+
+        Args:
+            sources (dict): Optional description of the inputs, kept in the meta file
+                (open_corpus() uses it to detect stale corpora)
+
+        Returns:
+            dict: The meta file contents
+        """
+        self._file.close()
+        np.save(os.path.join(self.path, OFFSETS_FILE), np.array(self._offsets, dtype=np.int64))
+        np.save(os.path.join(self.path, PAGES_FILE), np.array(self._pages, dtype=np.int32).reshape(-1, 2))
+
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "num_chunks": len(self._pages),
+            "files": self._files,
+            "sources": sources,
+            "created_at": time.time()
+        }
+        with open(os.path.join(self.path, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+        # One rename publishes every file of the new corpus
+        tmp_path = os.path.join(self.corpus_dir, f".{POINTER_FILE}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.name)
+        os.replace(tmp_path, os.path.join(self.corpus_dir, POINTER_FILE))
+
+        self._prune()
+        return meta
+
+    def _prune(self):
+        """Delete corpus directories older than the published one and the KEEP_PREVIOUS before it."""
+        versions = sorted((name for name in os.listdir(self.corpus_dir) if name.startswith("corpus-")),
+                          key=lambda name: int(name.split("-")[1]))
+        current = versions.index(self.name)
+        for name in versions[:max(0, current - KEEP_PREVIOUS)]:
+            shutil.rmtree(os.path.join(self.corpus_dir, name), ignore_errors=True)
+
+    def abort(self):
+        """Discard everything written so far."""
+        self._file.close()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class ChunkCorpus:
+    """
+    Read access to the published corpus: records in order, or any chunk by position or ID.
+    The text file and arrays are memory-mapped, so opening a corpus reads only the meta file,
+    and a corpus stays readable after a newer one is published.
+
+    Records: {"id", "filename", "chunk_number", "total_chunks", "text", "pages"}
+    ("pages" is [first_page, last_page], or None when the chunk has no page map).
+    """
+
+    def __init__(self, corpus_dir):
+        """
+        Args:
+            corpus_dir (str): Directory holding the CORPUS pointer
+        """
+        self.corpus_dir = corpus_dir
+        self.path = published_corpus(corpus_dir)
+        if self.path is None:
+            raise FileNotFoundError(f"No chunk corpus published in {corpus_dir}")
+        with open(os.path.join(self.path, META_FILE), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported corpus format {self.meta['format_version']} in {self.path}")
+
+        self._offsets = np.load(os.path.join(self.path, OFFSETS_FILE), mmap_mode='r')
+        self._pages = np.load(os.path.join(self.path, PAGES_FILE), mmap_mode='r')
+        self._text = np.memmap(os.path.join(self.path, TEXT_FILE), dtype=np.uint8, mode='r') \
+            if self._offsets[-1] else np.zeros(0, dtype=np.uint8)  # mmap can't map an empty file
+
+    def __len__(self):
+        return self.meta["num_chunks"]
+
+    def __iter__(self):
+        """Records in corpus order (documents in the order they were added, chunks in order)."""
+        text = self._text.tobytes()  # One read for the whole corpus
+        offsets = self._offsets.tolist()
+        pages = self._pages.tolist()
+
+        for filename, (first, count) in self.meta["files"].items():
+            for i in range(first, first + count):
+                yield self._make_record(filename, i - first + 1, count,
+                                        text[offsets[i]:offsets[i + 1]].decode('utf-8'), pages[i])
+
+    @staticmethod
+    def _make_record(filename, chunk_number, total_chunks, text, pages):
+        return {
+            "id": chunk_id(filename, chunk_number),
+            "filename": filename,
+            "chunk_number": chunk_number,
+            "total_chunks": total_chunks,
+            "text": text,
+            "pages": list(pages) if pages[0] else None
+        }
+
+    def text(self, position):
+        """Chunk text at a corpus position (0-based)."""
+        return self._text[int(self._offsets[position]):int(self._offsets[position + 1])].tobytes().decode('utf-8')
+
+    def position(self, chunk_id):
+        """
+        Corpus position of a chunk ID.
+
+        Returns:
+            int: Position, or None if the chunk is not in the corpus
+        """
+        filename, _, number = chunk_id.rpartition("_chunk_")
+        entry = self.meta["files"].get(filename)
+        if entry is None or not number.isdigit() or not 1 <= int(number) <= entry[1]:
+            return None
+        return entry[0] + int(number) - 1
+
+    def get(self, chunk_id):
+        """The record of a chunk ID, or None."""
+        position = self.position(chunk_id)
+        if position is None:
+            return None
+        filename, _, number = chunk_id.rpartition("_chunk_")
+        return self._make_record(filename, int(number), self.meta["files"][filename][1],
+                                 self.text(position), self._pages[position].tolist())
+
+
+def build_corpus(chunks_path=DEFAULT_CHUNKS_PATH, corpus_dir=None):
+    """
+    Pack the per-document *_chunks.json files into a corpus.
+
+    Args:
+        chunks_path (str): Directory of *_chunks.json files
+        corpus_dir (str): Where to write the corpus (defaults to chunks_path)
+
+    Returns:
+        ChunkCorpus: The new corpus
+    """
+    corpus_dir = corpus_dir or chunks_path
+    start = time.perf_counter()
+    files = _source_files(chunks_path)
+
+    # Taken before reading: a file changed meanwhile makes the corpus look stale, not fresh
+    sources = _sources_signature(chunks_path, files)
+
+    writer = ChunkCorpusWriter(corpus_dir)
+    try:
+        for json_file in files:
+            with open(os.path.join(chunks_path, json_file), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            writer.add_document(data['filename'], data['chunks'], data.get('chunk_pages'))
+    except BaseException:
+        writer.abort()
+        raise
+    meta = writer.close(sources=sources)
+
+    print(f"📦 Packed {meta['num_chunks']} chunks from {len(files)} files into {corpus_dir} "
+          f"in {time.perf_counter() - start:.2f}s")
+    return ChunkCorpus(corpus_dir)
+
+
+def _sources_signature(chunks_path, files):
+    """Names, sizes and mtimes of the source files, to tell whether a corpus is stale."""
+    signature = {}
+    for json_file in files:
+        stat = os.stat(os.path.join(chunks_path, json_file))
+        signature[json_file] = [stat.st_size, stat.st_mtime_ns]
+    return {"path": os.path.abspath(chunks_path), "files": signature}
+
+
+def open_corpus(chunks_path=DEFAULT_CHUNKS_PATH):
+    """
+    The published corpus of a chunks directory, if it is current: built from exactly the
+    *_chunks.json files there now. A directory holding only a corpus (e.g. an index
+    generation) always counts as current. Never writes.
+
+    Returns:
+        ChunkCorpus: The corpus, or None if there is none or it is stale
+    """
+    if published_corpus(chunks_path) is None:
+        return None
+    corpus = ChunkCorpus(chunks_path)
+
+    files = _source_files(chunks_path)
+    if files and (corpus.meta.get("sources") or {}).get("files") != _sources_signature(chunks_path, files)["files"]:
+        return None
+    return corpus
+
+
+def iter_chunk_records(chunks_path=DEFAULT_CHUNKS_PATH):
+    """
+    Every chunk record of a chunks directory (see ChunkCorpus), from the corpus when it is
+    current, otherwise parsed from the *_chunks.json files. Read-only.
+    """
+    corpus = open_corpus(chunks_path)
+    if corpus is not None:
+        yield from corpus
+        return
+
+    if published_corpus(chunks_path) is not None:
+        print(f"⚠️ Chunk corpus in {chunks_path} is stale, reading the JSON files (rebuild: python chunk_corpus.py build)")
+    for json_file in _source_files(chunks_path):
+        with open(os.path.join(chunks_path, json_file), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        chunk_pages = data.get('chunk_pages') or [None] * len(data['chunks'])
+        for i, (text, pages) in enumerate(zip(data['chunks'], chunk_pages)):
+            yield ChunkCorpus._make_record(data['filename'], i + 1, len(data['chunks']), text,
+                                           pages or (0, 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack *_chunks.json files into a chunk corpus")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Build the corpus")
+    build.add_argument("--chunks", default=DEFAULT_CHUNKS_PATH, help="Directory of *_chunks.json files")
+    build.add_argument("--output", default=None, help="Corpus directory (defaults to --chunks)")
+
+    info = subparsers.add_parser("info", help="Describe a corpus")
+    info.add_argument("--corpus", default=DEFAULT_CHUNKS_PATH, help="Corpus directory")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_corpus(args.chunks, args.output)
+    else:
+        corpus = ChunkCorpus(args.corpus)
+        size = sum(os.path.getsize(os.path.join(corpus.path, name))
+                   for name in (TEXT_FILE, OFFSETS_FILE, PAGES_FILE, META_FILE))
+        print(f"{len(corpus)} chunks from {len(corpus.meta['files'])} documents, {size / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,304 @@
+"""
+Index Generations
+Each reindex writes a complete, immutable generation directory (chunks, ChromaDB, mmap index)
+and publishes it by atomically replacing the CURRENT pointer; running servers pick it up.
+
+Build and publish a generation from preprocessing/processed_chunks:
+    python generations.py build
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+import uuid
+
+try:
+    from .lexical_matching.bm25 import BM25Index, DEFAULT_CHUNKS_PATH
+    from .chroma.chroma_query import ChromaIndex
+    from .chunk_corpus import build_corpus
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from lexical_matching.bm25 import BM25Index, DEFAULT_CHUNKS_PATH
+    from chroma.chroma_query import ChromaIndex
+    from chunk_corpus import build_corpus
+
+DEFAULT_INDEX_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "generations")
+POINTER_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+READERS_DIR = "readers"  # One lease file per process (named by PID) with the generation open
+
+# Superseded generations kept on disk for servers that have not switched yet
+KEEP_PREVIOUS = 2
+
+
+def current_generation(root=DEFAULT_INDEX_ROOT):
+    """
+    Name of the published generation.
+
+    Returns:
+        str: Generation directory name, or None if nothing was published under root
+    """
+    try:
+        with open(os.path.join(root, POINTER_FILE), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def generation_path(root, generation, component=None):
+    """Path of a generation directory, or of one of its components ('chunks', 'chroma_db', 'mmap')."""
+    path = os.path.join(root, generation)
+    return os.path.join(path, component) if component else path
+
+
+def read_manifest(root, generation):
+    with open(generation_path(root, generation, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def publish(root, generation):
+    """
+    Point CURRENT at a generation. The pointer is replaced with os.replace(), so readers
+    see either the old or the new name, never a partial write.
+    """
+    if not os.path.exists(generation_path(root, generation, MANIFEST_FILE)):
+        raise ValueError(f"Generation {generation} is incomplete or missing in {root}")
+
+    tmp_path = os.path.join(root, f".{POINTER_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(generation)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(root, POINTER_FILE))
+
+    # Persist the rename itself
+    dir_fd = os.open(root, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+    print(f"📌 Published index generation {generation}")
+
+
+def build_generation(root=DEFAULT_INDEX_ROOT, chunks_path=DEFAULT_CHUNKS_PATH, with_chroma=True,
+                     with_mmap=True, with_vectors=True, publish_when_done=True):
+    """
+    Write a new generation next to the live one, then publish it.
+
+    Args:
+        root (str): Directory holding the generations and the CURRENT pointer
+        chunks_path (str): Directory of *_chunks.json files to index (packed into the generation)
+        with_chroma (bool): Build the ChromaDB collection (embeds every chunk)
+        with_mmap (bool): Build the memory-mapped index for RAG_INDEX_BACKEND=mmap
+        with_vectors (bool): Include the embedding matrix in the mmap index
+        publish_when_done (bool): Swap CURRENT to the new generation
+
+    Returns:
+        str: Name of the new generation
+    """
+    os.makedirs(root, exist_ok=True)
+    generation = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    start = time.perf_counter()
+    print(f"🏗️ Building index generation {generation}")
+
+    # Snapshot the chunks as one corpus file, so the generation doesn't change if processed_chunks is rewritten
+    chunks_dir = generation_path(root, generation, "chunks")
+    build_corpus(chunks_path, chunks_dir)
+
+    # Validates the snapshot before anything slow runs
+    lexical = BM25Index(chunks_dir)
+    lexical.load()
+
+    components = ["chunks"]
+    chroma_index = None
+    if with_chroma:
+        try:
+            from .chroma.load_to_chromadb import load_chunks_to_chromadb
+        except ImportError:
+            from chroma.load_to_chromadb import load_chunks_to_chromadb
+
+        db_path = generation_path(root, generation, "chroma_db")
+        load_chunks_to_chromadb(chunks_dir, db_path)
+        chroma_index = ChromaIndex(db_path)
+        components.append("chroma_db")
+
+    if with_mmap:
+        try:
+            from .mmap_index import build_index
+        except ImportError:
+            from mmap_index import build_index
+
+        build_index(generation_path(root, generation, "mmap"), chunks_dir, with_vectors=with_vectors,
+                    chroma_index=chroma_index)
+        components.append("mmap")
+
+    # Written last: a generation without a manifest is incomplete and can't be published
+    manifest = {
+        "generation": generation,
+        "created_at": time.time(),
+        "num_chunks": len(lexical.metadata),
+        "components": components,
+        "source": os.path.abspath(chunks_path)
+    }
+    with open(generation_path(root, generation, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"✅ Built generation {generation} ({len(lexical.metadata)} chunks, {', '.join(components)}) "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    if publish_when_done:
+        publish(root, generation)
+        prune(root)
+
+    return generation
+
+
+def acquire_lease(root, generation):
+    """Record that this process has a generation open, so prune() leaves it on disk."""
+    readers = generation_path(root, generation, READERS_DIR)
+    os.makedirs(readers, exist_ok=True)
+    open(os.path.join(readers, str(os.getpid())), 'w').close()
+
+
+def release_lease(root, generation):
+    """Drop this process's lease on a generation (once its engines are closed)."""
+    try:
+        os.remove(os.path.join(generation_path(root, generation, READERS_DIR), str(os.getpid())))
+    except FileNotFoundError:
+        pass
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Exists, owned by another user
+    return True
+
+
+def live_readers(root, generation):
+    """
+    PIDs of running processes holding a lease on a generation. Leases left behind by
+    processes that died without releasing them are removed.
+
+    Returns:
+        list: Process IDs
+    """
+    readers = generation_path(root, generation, READERS_DIR)
+    try:
+        names = os.listdir(readers)
+    except FileNotFoundError:
+        return []
+
+    alive = []
+    for name in names:
+        if name.isdigit() and _process_alive(int(name)):
+            alive.append(int(name))
+        else:
+            try:
+                os.remove(os.path.join(readers, name))
+            except FileNotFoundError:
+                pass
+    return alive
+
+
+def prune(root=DEFAULT_INDEX_ROOT, keep_previous=KEEP_PREVIOUS):
+    """
+    Delete superseded generations, keeping the current one, the newest keep_previous others
+    and any that a running process still has open.
+
+    Returns:
+        list: Names of the deleted generations
+    """
+    current = current_generation(root)
+    others = sorted((name for name in os.listdir(root)
+                     if name != current and os.path.isdir(os.path.join(root, name))), reverse=True)
+
+    removed = []
+    for name in others[keep_previous:]:
+        readers = live_readers(root, name)
+        if readers:
+            print(f"⏳ Keeping old generation {name}, still open in processes {readers}")
+            continue
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+        removed.append(name)
+        print(f"🗑️ Removed old generation {name}")
+    return removed
+
+
+def open_engines(root, generation, backend="memory"):
+    """
+    Search engines over one generation. The caller holds a lease on it (see acquire_lease())
+    until it closes them.
+
+    Args:
+        root (str): Generations directory
+        generation (str): Generation name
+        backend (str): 'memory' (BM25 + ChromaDB) or 'mmap'
+
+    Returns:
+        SearchEngines or MmapIndex: Engines that are not loaded yet (call warmup())
+    """
+    components = read_manifest(root, generation)["components"]
+
+    if backend == "mmap":
+        if "mmap" not in components:
+            raise ValueError(f"Generation {generation} has no mmap index")
+        try:
+            from .mmap_index import MmapIndex
+        except ImportError:
+            from mmap_index import MmapIndex
+        return MmapIndex(generation_path(root, generation, "mmap"))
+
+    try:
+        from .hybrid_search import SearchEngines
+    except ImportError:
+        from hybrid_search import SearchEngines
+    return SearchEngines(
+        bm25_index=BM25Index(generation_path(root, generation, "chunks")),
+        chroma_index=ChromaIndex(generation_path(root, generation, "chroma_db"))
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build, publish and list index generations")
+    parser.add_argument("--root", default=DEFAULT_INDEX_ROOT, help="Generations directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Build a new generation and publish it")
+    build.add_argument("--chunks", default=DEFAULT_CHUNKS_PATH, help="Directory of *_chunks.json files")
+    build.add_argument("--no-chroma", action="store_true", help="Skip the ChromaDB collection")
+    build.add_argument("--no-mmap", action="store_true", help="Skip the memory-mapped index")
+    build.add_argument("--no-vectors", action="store_true", help="Leave the embedding matrix out of the mmap index")
+    build.add_argument("--no-publish", action="store_true", help="Build without switching CURRENT")
+
+    publish_parser = subparsers.add_parser("publish", help="Point CURRENT at an existing generation (e.g. roll back)")
+    publish_parser.add_argument("generation")
+
+    subparsers.add_parser("list", help="List generations")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_generation(args.root, args.chunks, with_chroma=not args.no_chroma, with_mmap=not args.no_mmap,
+                         with_vectors=not args.no_vectors, publish_when_done=not args.no_publish)
+    elif args.command == "publish":
+        publish(args.root, args.generation)
+    else:
+        current = current_generation(args.root)
+        for name in sorted(os.listdir(args.root)) if os.path.isdir(args.root) else []:
+            if os.path.isdir(os.path.join(args.root, name)):
+                marker = "*" if name == current else " "
+                try:
+                    manifest = read_manifest(args.root, name)
+                    print(f"{marker} {name}  {manifest['num_chunks']} chunks  {', '.join(manifest['components'])}")
+                except FileNotFoundError:
+                    print(f"{marker} {name}  (incomplete)")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,91 @@
 Hybrid Search: BM25 + ChromaDB with Weighted Combination
 """
 
-from lexical_matching.bm25 import bm25_search
-from chroma.chroma_query import chroma_search
+import os
+import sys
+import time
+
+try:
+    # Imported as hybrid_search.hybrid_search (from ai.py / the server)
+    from .lexical_matching.bm25 import default_index as default_bm25_index
+    from .chroma.chroma_query import default_index as default_chroma_index
+except ImportError:
+    # Run as a script from this directory (test_hybrid.py)
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from lexical_matching.bm25 import default_index as default_bm25_index
+    from chroma.chroma_query import default_index as default_chroma_index
+
+from observability.tracing import span
 
 # WEIGHT FOR BM25 VS CHROMADB (0.0 = ALL CHROMADB, 1.0 = ALL BM25)
 BM25_WEIGHT = 0.5
 
+class SearchEngines:
+    """
+    The lexical and semantic indexes hybrid search runs against.
+    """
+    
+    def __init__(self, bm25_index=None, chroma_index=None):
+        """
+        Args:
+            bm25_index (BM25Index): Lexical index (defaults to the shared index)
+            chroma_index (ChromaIndex): Vector index (defaults to the shared index)
+        """
+        self.bm25_index = bm25_index or default_bm25_index
+        self.chroma_index = chroma_index or default_chroma_index
+    
+    def bm25_search(self, query, top_k=5):
+        return self.bm25_index.search(query, top_k)
+    
+    def chroma_search(self, query, top_k=5, query_embedding=None):
+        return self.chroma_index.search(query, top_k, query_embedding)
+    
+    def bm25_search_many(self, queries, top_k=5):
+        return self.bm25_index.search_many(queries, top_k)
+    
+    def chroma_search_many(self, queries, top_k=5):
+        return self.chroma_index.search_many(queries, top_k)
+    
+    def get_chunk_text(self, chunk_id):
+        return self.bm25_index.get_chunk_text(chunk_id)
+    
+    def snippets(self, chunk_id, query, text=None, window_words=40, max_windows=1):
+        return self.bm25_index.snippets(chunk_id, query, text, window_words, max_windows)
+    
+    def embed_query(self, query):
+        return self.chroma_index.embed_query(query)
+    
+    def close(self):
+        """Close the vector index client; the BM25 index is freed with this object."""
+        self.chroma_index.close()
+    
+    def warmup(self):
+        """
+        Load every index and model up front.
+        
+        Returns:
+            dict: Seconds spent per component, or the error message if it failed
+        """
+        timings = {}
+        steps = [
+            ("bm25_index", self.bm25_index.load),
+            ("chroma_collection", self.chroma_index.load),
+            ("embedding_model", lambda: self.chroma_index.embed_query("warmup"))
+        ]
+        
+        for name, step in steps:
+            start = time.perf_counter()
+            try:
+                step()
+                timings[name] = round(time.perf_counter() - start, 3)
+            except Exception as e:
+                print(f"⚠️ Warmup of {name} failed: {e}")
+                timings[name] = f"failed: {e}"
+        
+        return timings
+
+default_engines = SearchEngines()
+
 def normalize_bm25_scores(results):
     """Normalize BM25 scores to 0-1 range."""
     if not results:
@@ -71,7 +150,8 @@ def combine_weighted_results(bm25_results, chroma_results, bm25_weight=BM25_WEIG
     
     return ranked_docs, final_scores
 
-def hybrid_search(query, top_k=5, filename_filter=None, chunk_range=None, min_text_length=None):
+def hybrid_search(query, top_k=5, filename_filter=None, chunk_range=None, min_text_length=None, engines=None,
+                  query_embedding=None):
     """
     Perform hybrid search using both BM25 and ChromaDB with weighted combination.
     
@@ -81,16 +161,59 @@ def hybrid_search(query, top_k=5, filename_filter=None, chunk_range=None, min_te
         filename_filter (str): Optional filter to only include files containing this string
         chunk_range (tuple): Optional (min_chunk, max_chunk) to filter by chunk numbers
         min_text_length (int): Optional minimum text length to filter short chunks
+        engines (SearchEngines): Indexes to search (defaults to the shared indexes)
+        query_embedding: The query's engines.embed_query() vector, if already computed
         
     Returns:
         dict: Results from both search methods + weighted combination
     """
+    engines = engines or default_engines
+    
     # Get BM25 keyword results
-    bm25_results = bm25_search(query, top_k * 2)  # Get more results for filtering
+    with span("bm25"):
+        bm25_results = engines.bm25_search(query, top_k * 2)  # Get more results for filtering
     
     # Get ChromaDB semantic results
-    chroma_results = chroma_search(query, top_k * 2)  # Get more results for filtering
+    with span("chroma"):
+        chroma_results = engines.chroma_search(query, top_k * 2, query_embedding)  # Get more results for filtering
     
+    with span("fusion"):
+        return fuse_results(bm25_results, chroma_results, top_k, filename_filter, chunk_range, min_text_length)
+
+def hybrid_search_many(queries, top_k=5, filename_filter=None, chunk_range=None, min_text_length=None, engines=None):
+    """
+    Hybrid search for several queries, sharing BM25 term scoring and batching query embedding.
+    
+    Args:
+        queries (list): Search queries
+        top_k (int): Number of results from each method
+        filename_filter (str): Optional filter to only include files containing this string
+        chunk_range (tuple): Optional (min_chunk, max_chunk) to filter by chunk numbers
+        min_text_length (int): Optional minimum text length to filter short chunks
+        engines (SearchEngines): Indexes to search (defaults to the shared indexes)
+        
+    Returns:
+        list: One hybrid_search() result per query, in input order
+    """
+    engines = engines or default_engines
+    
+    with span("bm25"):
+        bm25_batches = engines.bm25_search_many(queries, top_k * 2)
+    
+    with span("chroma"):
+        chroma_batches = engines.chroma_search_many(queries, top_k * 2)
+    
+    with span("fusion"):
+        return [fuse_results(bm25_results, chroma_results, top_k, filename_filter, chunk_range, min_text_length)
+                for bm25_results, chroma_results in zip(bm25_batches, chroma_batches)]
+
+def fuse_results(bm25_results, chroma_results, top_k, filename_filter=None, chunk_range=None, min_text_length=None):
+    """
+    Filter both result lists and combine them into the hybrid_search() result.
+    
+    Returns:
+        dict: Results from both search methods + weighted combination
+    """
     # Apply metadata filters
     def apply_filters(results):
         filtered = results
@@ -2,68 +2,210 @@
 Simple BM25 Search
 """
 
-import json
 import os
+import sys
+import threading
+import numpy as np
 from rank_bm25 import BM25Okapi
 
-# Load documents once
-documents = []
-metadata = []
-
-def _load_data():
-    """Load chunks for BM25."""
-    global documents, metadata
-    
-    if documents:  # Already loaded
-        return
-    
-    chunks_path = os.path.join("..", "preprocessing", "processed_chunks")
-    
-    for json_file in os.listdir(chunks_path):
-        if json_file.endswith('_chunks.json'):
-            with open(os.path.join(chunks_path, json_file), 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            for i, chunk in enumerate(data['chunks']):
-                documents.append(chunk.lower().split())  # Tokenize
-                metadata.append({
-                    "filename": data['filename'],
-                    "chunk_number": i + 1,
-                    "text": chunk
+try:
+    from .snippets import DEFAULT_WINDOW_WORDS, make_snippets
+except ImportError:  # Run as a script from this directory (e.g. test_bm25.py)
+    from snippets import DEFAULT_WINDOW_WORDS, make_snippets
+
+try:
+    from ..chunk_corpus import DEFAULT_CHUNKS_PATH, iter_chunk_records
+except ImportError:  # Imported as lexical_matching.bm25 or run from this directory
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from chunk_corpus import DEFAULT_CHUNKS_PATH, iter_chunk_records
+
+class BM25Index:
+    """
+    BM25 index over the processed chunks, loaded and built once on first use.
+    """
+
+    def __init__(self, chunks_path=DEFAULT_CHUNKS_PATH):
+        """
+        Args:
+            chunks_path (str): Directory containing *_chunks.json files or a chunk corpus
+        """
+        self.chunks_path = chunks_path
+        self.documents = []
+        self.metadata = []
+        self.chunk_index = {}  # chunk_id -> position in documents/metadata
+        self.bm25 = None
+        self._postings = None  # term -> (doc positions, term frequencies), for batch scoring
+        self._load_lock = threading.Lock()
+
+    def load(self):
+        """Load chunks and build the BM25 index (idempotent, thread-safe)."""
+        with self._load_lock:  # Concurrent searches must not see a half-loaded corpus
+            if self.bm25 is not None:  # Already loaded
+                return
+
+            # The packed corpus if it is current, else the *_chunks.json files
+            for record in iter_chunk_records(self.chunks_path):
+                chunk_id = record["id"]  # Same IDs as ChromaDB
+                self.chunk_index[chunk_id] = len(self.documents)
+                self.documents.append(record["text"].lower().split())  # Tokenize
+                self.metadata.append({
+                    "chunk_id": chunk_id,
+                    "filename": record["filename"],
+                    "chunk_number": record["chunk_number"],
+                    "text": record["text"]
+                })
+
+            # Build index once instead of per query
+            self.bm25 = BM25Okapi(self.documents)
+
+    def get_chunk_text(self, chunk_id):
+        """
+        Look up the current text of a chunk.
+
+        Args:
+            chunk_id (str): Chunk ID in the '<filename>_chunk_<n>' format
+
+        Returns:
+            str: Chunk text, or None if the chunk no longer exists
+        """
+        self.load()
+
+        idx = self.chunk_index.get(chunk_id)
+        return self.metadata[idx]["text"] if idx is not None else None
+
+    def snippets(self, chunk_id, query, text=None, window_words=DEFAULT_WINDOW_WORDS, max_windows=1):
+        """
+        Best-matching snippet(s) of a chunk, located with the indexed tokens and
+        ranked by the query terms' idf.
+
+        Args:
+            chunk_id (str): Chunk ID
+            query (str): Search query
+            text (str): Chunk text, used if the chunk is not in this index
+            window_words (int): Snippet length in words
+            max_windows (int): Maximum snippets to return
+
+        Returns:
+            list: Snippets with highlight offsets (see snippets.make_snippets)
+        """
+        self.load()
+
+        idx = self.chunk_index.get(chunk_id)
+        if idx is None:
+            return make_snippets(text, query, window_words=window_words, max_windows=max_windows) if text else []
+
+        return make_snippets(self.metadata[idx]["text"], query, tokens=self.documents[idx],
+                             window_words=window_words, max_windows=max_windows, weights=self.bm25.idf)
+
+    def search(self, query, top_k=5):
+        """
+        BM25 keyword search.
+
+        Args:
+            query (str): Search query
+            top_k (int): Number of results
+
+        Returns:
+            list: Results with scores and metadata
+        """
+        self.load()
+
+        # Search
+        tokenized_query = query.lower().split()
+        scores = self.bm25.get_scores(tokenized_query)
+
+        return self._top_results(scores, top_k)
+
+    def search_many(self, queries, top_k=5):
+        """
+        BM25 keyword search for several queries, scoring each distinct term once.
+        Scores are identical to calling search() per query.
+
+        Args:
+            queries (list): Search queries
+            top_k (int): Number of results per query
+
+        Returns:
+            list: One result list per query, in input order
+        """
+        self.load()
+        postings, length_norm = self._load_postings()
+
+        bm25 = self.bm25
+        term_scores = {}  # Shared across the batch
+        results = []
+
+        for query in queries:
+            scores = np.zeros(bm25.corpus_size)
+            for term in query.lower().split():
+                if term not in term_scores:
+                    vector = np.zeros(bm25.corpus_size)
+                    if term in postings:
+                        docs, freqs = postings[term]
+                        vector[docs] = (bm25.idf.get(term) or 0) * (freqs * (bm25.k1 + 1) / (freqs + length_norm[docs]))
+                    term_scores[term] = vector
+                scores += term_scores[term]
+            results.append(self._top_results(scores, top_k))
+
+        return results
+
+    def _load_postings(self):
+        """Build the inverted index used by search_many() on first use."""
+        with self._load_lock:
+            if self._postings is None:
+                bm25 = self.bm25
+                doc_len = np.array(bm25.doc_len)
+                self._length_norm = bm25.k1 * (1 - bm25.b + bm25.b * doc_len / bm25.avgdl)
+
+                postings = {}
+                for idx, frequencies in enumerate(bm25.doc_freqs):
+                    for term, freq in frequencies.items():
+                        postings.setdefault(term, ([], []))
+                        postings[term][0].append(idx)
+                        postings[term][1].append(freq)
+                self._postings = {term: (np.array(docs), np.array(freqs))
+                                  for term, (docs, freqs) in postings.items()}
+
+        return self._postings, self._length_norm
+
+    def _top_results(self, scores, top_k):
+        """Format the top_k positive scores as search results."""
+        results = []
+        scored_docs = [(score, idx) for idx, score in enumerate(scores)]
+        scored_docs.sort(reverse=True)
+
+        for score, idx in scored_docs[:top_k]:
+            if score > 0:
+                results.append({
+                    "chunk_id": self.metadata[idx]["chunk_id"],
+                    "score": score,
+                    "text": self.metadata[idx]["text"],
+                    "filename": self.metadata[idx]["filename"],
+                    "chunk_number": self.metadata[idx]["chunk_number"]
                 })
 
+        return results
+
+# Shared default index
+default_index = BM25Index()
+
+def get_chunk_text(chunk_id):
+    """Look up the current text of a chunk in the default index."""
+    return default_index.get_chunk_text(chunk_id)
+
 def bm25_search(query, top_k=5):
     """
     BM25 keyword search.
-    
+
     Args:
         query (str): Search query
         top_k (int): Number of results
-        
+
     Returns:
         list: Results with scores and metadata
     """
-    _load_data()
-    
-    # Build index
-    bm25 = BM25Okapi(documents)
-    
-    # Search
-    tokenized_query = query.lower().split()
-    scores = bm25.get_scores(tokenized_query)
-    
-    # Get top results
-    results = []
-    scored_docs = [(score, idx) for idx, score in enumerate(scores)]
-    scored_docs.sort(reverse=True)
-    
-    for score, idx in scored_docs[:top_k]:
-        if score > 0:
-            results.append({
-                "score": score,
-                "text": metadata[idx]["text"],
-                "filename": metadata[idx]["filename"],
-                "chunk_number": metadata[idx]["chunk_number"]
-            })
-    
-    return results
+    return default_index.search(query, top_k)
+
+def bm25_search_many(queries, top_k=5):
+    """BM25 keyword search for several queries in the default index."""
+    return default_index.search_many(queries, top_k)
@@ -0,0 +1,125 @@
+"""
+Query-Aware Snippets
+Picks the window(s) of a chunk with the densest query term matches, with highlight offsets.
+"""
+
+import re
+
+DEFAULT_WINDOW_WORDS = 40
+
+# Terms weighted below this fraction of the strongest query term (e.g. 'in', 'the') aren't highlighted
+MIN_HIGHLIGHT_WEIGHT = 0.5
+
+# Punctuation around a token doesn't stop it from matching a query term
+_EDGE_PUNCTUATION = re.compile(r"^\W+|\W+$")
+
+
+def normalize_token(token):
+    """Lowercase a token and strip leading/trailing punctuation."""
+    return _EDGE_PUNCTUATION.sub("", token.lower())
+
+
+def term_positions(tokens, query):
+    """
+    Find where query terms occur in a tokenized chunk.
+
+    Args:
+        tokens (list): Chunk tokens (the BM25 index tokens, i.e. text.lower().split())
+        query (str): Search query
+
+    Returns:
+        list: (position, term) pairs in position order
+    """
+    terms = {normalize_token(t) for t in query.split()} - {""}
+    return [(i, term) for i, term in enumerate(normalize_token(t) for t in tokens) if term in terms]
+
+
+def best_windows(positions, num_tokens, window_words=DEFAULT_WINDOW_WORDS, max_windows=1, weights=None):
+    """
+    Choose non-overlapping windows covering the most (weighted, distinct) query terms.
+
+    Args:
+        positions (list): (position, term) pairs from term_positions()
+        num_tokens (int): Chunk length in tokens
+        window_words (int): Window size in tokens
+        max_windows (int): Maximum windows to return
+        weights (dict): Optional term -> weight (e.g. BM25 idf); defaults to 1 per term
+
+    Returns:
+        list: (start, end) token ranges in document order
+    """
+    if num_tokens <= window_words or not positions:
+        return [(0, min(num_tokens, window_words))]
+
+    weights = weights or {}
+    windows = []
+    remaining = list(positions)
+
+    while remaining and len(windows) < max_windows:
+        best_score, best_start = -1.0, 0
+        left = 0
+        # Each window starts at a hit; score distinct terms within window_words of it
+        for right in range(len(remaining)):
+            while remaining[right][0] - remaining[left][0] >= window_words:
+                left += 1
+            terms = {term for _, term in remaining[left:right + 1]}
+            score = sum(weights.get(term, 1.0) for term in terms) + 0.01 * (right - left + 1)
+            if score > best_score:
+                best_score, best_start = score, remaining[left][0]
+
+        # Center the matches in the window where the chunk allows
+        hits = [p for p, _ in remaining if best_start <= p < best_start + window_words]
+        span = hits[-1] - hits[0] + 1
+        start = max(0, min(hits[0] - (window_words - span) // 2, num_tokens - window_words))
+        windows.append((start, start + window_words))
+
+        # Later windows must not overlap earlier ones
+        remaining = [(p, t) for p, t in remaining
+                     if all(not (s - window_words < p < e + window_words) for s, e in windows)]
+
+    return sorted(windows)
+
+
+def make_snippets(text, query, tokens=None, window_words=DEFAULT_WINDOW_WORDS, max_windows=1, weights=None):
+    """
+    Build the best-matching snippet(s) of a chunk for a query.
+
+    Args:
+        text (str): Chunk text
+        query (str): Search query
+        tokens (list): Chunk tokens from the lexical index (computed from text if omitted)
+        window_words (int): Snippet length in words
+        max_windows (int): Maximum snippets to return
+        weights (dict): Optional term -> weight used to rank windows
+
+    Returns:
+        list: Snippets {'text', 'highlights': [[start, end], ...] character offsets
+              into the snippet text, 'word_range': [start, end]}
+    """
+    words = text.split()  # Aligned 1:1 with the index tokens
+    tokens = tokens if tokens is not None else [w.lower() for w in words]
+    positions = term_positions(tokens, query)
+
+    weights = weights or {}
+    strongest = max((weights.get(t, 1.0) for _, t in positions), default=0)
+    matched = {p for p, t in positions if weights.get(t, 1.0) >= MIN_HIGHLIGHT_WEIGHT * strongest}
+
+    snippets = []
+    for start, end in best_windows(positions, len(words), window_words, max_windows, weights):
+        highlights = []
+        offset = 0
+        for i in range(start, end):
+            if i in matched:
+                # Highlight the word without its surrounding punctuation
+                word = words[i]
+                core = _EDGE_PUNCTUATION.sub("", word)
+                core_start = offset + word.find(core) if core else offset
+                highlights.append([core_start, core_start + len(core)])
+            offset += len(words[i]) + 1
+        snippets.append({
+            "text": " ".join(words[start:end]),
+            "highlights": highlights,
+            "word_range": [start, end]
+        })
+
+    return snippets
@@ -0,0 +1,375 @@
+"""
+Memory-Mapped Search Index
+Read-only index files (BM25 postings, chunk texts, embedding matrix) that pre-forked
+workers map into memory, so the pages are shared instead of copied per process.
+
+Build:
+    python mmap_index.py --output mmap_index
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+try:
+    from .lexical_matching.bm25 import BM25Index, DEFAULT_CHUNKS_PATH
+    from .lexical_matching.snippets import DEFAULT_WINDOW_WORDS, make_snippets, normalize_token
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from lexical_matching.bm25 import BM25Index, DEFAULT_CHUNKS_PATH
+    from lexical_matching.snippets import DEFAULT_WINDOW_WORDS, make_snippets, normalize_token
+
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mmap_index")
+FORMAT_VERSION = 1
+
+# Files written by build_index(); everything except meta.json is mapped read-only
+ARRAY_FILES = ("text_offsets", "chunk_file", "chunk_number", "file_start", "term_offsets", "idf",
+               "postings_offsets", "postings_docs", "postings_freqs", "length_norm")
+BLOB_FILES = ("texts", "terms")
+
+
+def _write_blob(path, strings):
+    """Write strings as one UTF-8 blob and return their byte offsets (n + 1 entries)."""
+    offsets = [0]
+    with open(path, 'wb') as f:
+        for s in strings:
+            encoded = s.encode('utf-8')
+            f.write(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+    return np.array(offsets, dtype=np.int64)
+
+
+def build_index(output_dir=DEFAULT_INDEX_DIR, chunks_path=DEFAULT_CHUNKS_PATH, with_vectors=True, chroma_index=None):
+    """
+    Build the index files from the processed chunks.
+
+    Args:
+        output_dir (str): Directory to write (created if missing)
+        chunks_path (str): Directory containing *_chunks.json files
+        with_vectors (bool): Also write the embedding matrix (needs the embedding model)
+        chroma_index (ChromaIndex): Collection to reuse stored embeddings from (defaults to the shared one)
+
+    Returns:
+        dict: The written meta.json contents
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+
+    # Same corpus order, tokens and idf as the in-memory BM25 index, so scores are identical
+    lexical = BM25Index(chunks_path)
+    lexical.load()
+    bm25 = lexical.bm25
+    metadata = lexical.metadata
+
+    arrays = {}
+    arrays["text_offsets"] = _write_blob(os.path.join(output_dir, "texts.bin"), [m["text"] for m in metadata])
+
+    filenames = list(dict.fromkeys(m["filename"] for m in metadata))
+    file_ids = {filename: i for i, filename in enumerate(filenames)}
+    arrays["chunk_file"] = np.array([file_ids[m["filename"]] for m in metadata], dtype=np.int32)
+    arrays["chunk_number"] = np.array([m["chunk_number"] for m in metadata], dtype=np.int32)
+    # Each file's chunks are contiguous, so '<filename>_chunk_<n>' resolves to file_start + n - 1
+    arrays["file_start"] = np.unique(arrays["chunk_file"], return_index=True)[1].astype(np.int64)
+
+    # Postings sorted by UTF-8 term bytes, so workers can binary search the mapped blob
+    postings = {}
+    for idx, frequencies in enumerate(bm25.doc_freqs):
+        for term, freq in frequencies.items():
+            postings.setdefault(term, []).append((idx, freq))
+    terms = sorted(postings, key=lambda t: t.encode('utf-8'))
+
+    arrays["term_offsets"] = _write_blob(os.path.join(output_dir, "terms.bin"), terms)
+    arrays["idf"] = np.array([bm25.idf[t] for t in terms], dtype=np.float64)
+    arrays["postings_offsets"] = np.cumsum([0] + [len(postings[t]) for t in terms]).astype(np.int64)
+    arrays["postings_docs"] = np.array([d for t in terms for d, _ in postings[t]], dtype=np.int32)
+    arrays["postings_freqs"] = np.array([f for t in terms for _, f in postings[t]], dtype=np.int32)
+    doc_len = np.array(bm25.doc_len)
+    arrays["length_norm"] = bm25.k1 * (1 - bm25.b + bm25.b * doc_len / bm25.avgdl)
+
+    for name, array in arrays.items():
+        np.save(os.path.join(output_dir, f"{name}.npy"), array)
+
+    dimensions = None
+    if with_vectors:
+        vectors = embed_corpus([m["chunk_id"] for m in metadata], [m["text"] for m in metadata],
+                               chroma_index=chroma_index)
+        np.save(os.path.join(output_dir, "vectors.npy"), vectors)
+        np.save(os.path.join(output_dir, "vector_norms.npy"), np.einsum('ij,ij->i', vectors, vectors))
+        dimensions = vectors.shape[1]
+
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "num_chunks": len(metadata),
+        "num_terms": len(terms),
+        "filenames": filenames,
+        "k1": bm25.k1,
+        "b": bm25.b,
+        "vector_dimensions": dimensions,
+        "built_at": time.time()
+    }
+    with open(os.path.join(output_dir, "meta.json"), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+    print(f"✅ Built mmap index of {len(metadata)} chunks and {len(terms)} terms "
+          f"in {time.perf_counter() - start:.1f}s: {output_dir}")
+    return meta
+
+
+def embed_corpus(chunk_ids, texts, batch_size=64, chroma_index=None):
+    """
+    Embedding matrix (float32) for the chunks, in index order.
+    Reuses the vectors stored in ChromaDB for chunks whose ID and text are unchanged, and
+    embeds the rest (new or re-chunked) with the collection's default model.
+    """
+    if chroma_index is None:
+        try:
+            from .chroma.chroma_query import default_index as chroma_index
+        except ImportError:
+            from chroma.chroma_query import default_index as chroma_index
+
+    collection = chroma_index.load()
+    stored = collection.get(ids=list(chunk_ids), include=["embeddings", "documents"])
+    texts_by_id = dict(zip(chunk_ids, texts))
+    by_id = {chunk_id: embedding
+             for chunk_id, document, embedding in zip(stored["ids"], stored["documents"], stored["embeddings"])
+             if texts_by_id.get(chunk_id) == document}
+
+    missing = [i for i, chunk_id in enumerate(chunk_ids) if chunk_id not in by_id]
+    if missing:
+        print(f"  Reusing {len(by_id)} stored vectors, embedding {len(missing)} chunks")
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        for i, embedding in zip(batch, chroma_index.embed_documents([texts[i] for i in batch])):
+            by_id[chunk_ids[i]] = embedding
+        print(f"  Embedded {min(start + batch_size, len(missing))}/{len(missing)} chunks")
+
+    return np.array([by_id[chunk_id] for chunk_id in chunk_ids], dtype=np.float32)
+
+
+class MmapIndex:
+    """
+    Search engines over the mapped index files, with the SearchEngines interface.
+    Open it after fork: every worker then shares the same page cache pages.
+    """
+
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR):
+        """
+        Args:
+            index_dir (str): Directory written by build_index()
+        """
+        self.index_dir = index_dir
+        self.meta = None
+        self._arrays = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Map the index files (idempotent, thread-safe)."""
+        with self._lock:
+            if self.meta is not None:
+                return
+
+            with open(os.path.join(self.index_dir, "meta.json"), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta["format_version"] != FORMAT_VERSION:
+                raise ValueError(f"Unsupported mmap index format {meta['format_version']} in {self.index_dir}")
+
+            names = ARRAY_FILES + (("vectors", "vector_norms") if meta["vector_dimensions"] else ())
+            for name in names:
+                self._arrays[name] = np.load(os.path.join(self.index_dir, f"{name}.npy"), mmap_mode='r')
+            for name in BLOB_FILES:
+                self._arrays[name] = np.memmap(os.path.join(self.index_dir, f"{name}.bin"), dtype=np.uint8, mode='r')
+
+            self._file_ids = {filename: i for i, filename in enumerate(meta["filenames"])}
+            self.meta = meta
+
+    def close(self):
+        """Drop the mappings (unmapped once no result refers to them); load() maps them again."""
+        with self._lock:
+            self._arrays = {}
+            self.meta = None
+
+    # Chunk store
+
+    def _text(self, idx):
+        offsets = self._arrays["text_offsets"]
+        return bytes(self._arrays["texts"][offsets[idx]:offsets[idx + 1]]).decode('utf-8')
+
+    def _chunk(self, idx):
+        filename = self.meta["filenames"][self._arrays["chunk_file"][idx]]
+        chunk_number = int(self._arrays["chunk_number"][idx])
+        return {
+            "chunk_id": f"{filename}_chunk_{chunk_number}",
+            "text": self._text(idx),
+            "filename": filename,
+            "chunk_number": chunk_number
+        }
+
+    def _chunk_position(self, chunk_id):
+        """Index position of a '<filename>_chunk_<n>' ID, or None."""
+        filename, _, number = chunk_id.rpartition("_chunk_")
+        file_id = self._file_ids.get(filename)
+        if file_id is None or not number.isdigit():
+            return None
+
+        idx = int(self._arrays["file_start"][file_id]) + int(number) - 1
+        if idx >= self.meta["num_chunks"] or self._arrays["chunk_file"][idx] != file_id:
+            return None
+        return idx
+
+    def get_chunk_text(self, chunk_id):
+        self.load()
+        idx = self._chunk_position(chunk_id)
+        return self._text(idx) if idx is not None else None
+
+    # Lexical search
+
+    def _term_id(self, term):
+        """Position of a term in the sorted term blob (binary search), or None."""
+        offsets = self._arrays["term_offsets"]
+        blob = self._arrays["terms"]
+        key = term.encode('utf-8')
+
+        low, high = 0, self.meta["num_terms"]
+        while low < high:
+            mid = (low + high) // 2
+            if bytes(blob[offsets[mid]:offsets[mid + 1]]) < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low < self.meta["num_terms"] and bytes(blob[offsets[low]:offsets[low + 1]]) == key:
+            return low
+        return None
+
+    def _term_scores(self, term):
+        scores = np.zeros(self.meta["num_chunks"])
+        term_id = self._term_id(term)
+        if term_id is not None:
+            start, end = self._arrays["postings_offsets"][term_id:term_id + 2]
+            docs = self._arrays["postings_docs"][start:end]
+            freqs = self._arrays["postings_freqs"][start:end]
+            k1 = self.meta["k1"]
+            scores[docs] = self._arrays["idf"][term_id] * (freqs * (k1 + 1) / (freqs + self._arrays["length_norm"][docs]))
+        return scores
+
+    def _top_lexical(self, scores, top_k):
+        # Same order as BM25Index: score descending, ties by higher position first
+        order = np.lexsort((np.arange(len(scores)), scores))[::-1][:top_k]
+        results = []
+        for idx in order:
+            if scores[idx] > 0:
+                results.append({**self._chunk(idx), "score": float(scores[idx])})
+        return results
+
+    def bm25_search(self, query, top_k=5):
+        return self.bm25_search_many([query], top_k)[0]
+
+    def bm25_search_many(self, queries, top_k=5):
+        self.load()
+        term_scores = {}
+        results = []
+        for query in queries:
+            scores = np.zeros(self.meta["num_chunks"])
+            for term in query.lower().split():
+                if term not in term_scores:
+                    term_scores[term] = self._term_scores(term)
+                scores += term_scores[term]
+            results.append(self._top_lexical(scores, top_k))
+        return results
+
+    # Vector search
+
+    def embed_query(self, query):
+        return self._embedding_index().embed_query(query)
+
+    def _embedding_index(self):
+        try:
+            from .chroma.chroma_query import default_index
+        except ImportError:
+            from chroma.chroma_query import default_index
+        return default_index
+
+    def chroma_search(self, query, top_k=5, query_embedding=None):
+        query_embeddings = None if query_embedding is None else [query_embedding]
+        return self.chroma_search_many([query], top_k, query_embeddings)[0]
+
+    def chroma_search_many(self, queries, top_k=5, query_embeddings=None):
+        self.load()
+        if not self.meta["vector_dimensions"] or not queries:
+            return [[] for _ in queries]
+
+        if query_embeddings is None:
+            query_embeddings = self._embedding_index().embed_documents(list(queries))
+        query_vectors = np.array(query_embeddings, dtype=np.float32)
+
+        # Squared L2, the distance ChromaDB collections use by default
+        vectors = self._arrays["vectors"]
+        distances = (self._arrays["vector_norms"][None, :] - 2 * query_vectors @ vectors.T
+                     + np.einsum('ij,ij->i', query_vectors, query_vectors)[:, None])
+
+        results = []
+        for row in distances:
+            k = min(top_k, len(row))
+            nearest = np.argpartition(row, k - 1)[:k]
+            nearest = nearest[np.argsort(row[nearest], kind='stable')]
+            results.append([{**self._chunk(idx), "distance": float(max(row[idx], 0.0))} for idx in nearest])
+        return results
+
+    # SearchEngines interface
+
+    def snippets(self, chunk_id, query, text=None, window_words=DEFAULT_WINDOW_WORDS, max_windows=1):
+        self.load()
+        idx = self._chunk_position(chunk_id)
+        text = self._text(idx) if idx is not None else text
+        if not text:
+            return []
+
+        weights = {}
+        for term in {normalize_token(t) for t in query.split()} - {""}:
+            term_id = self._term_id(term)
+            if term_id is not None:
+                weights[term] = float(self._arrays["idf"][term_id])
+        return make_snippets(text, query, window_words=window_words, max_windows=max_windows, weights=weights)
+
+    def warmup(self):
+        """
+        Map the index files and load the query embedding model.
+
+        Returns:
+            dict: Seconds spent per component, or the error message if it failed
+        """
+        timings = {}
+        steps = [
+            ("mmap_index", self.load),
+            ("embedding_model", lambda: self.embed_query("warmup"))
+        ]
+
+        for name, step in steps:
+            start = time.perf_counter()
+            try:
+                step()
+                timings[name] = round(time.perf_counter() - start, 3)
+            except Exception as e:
+                print(f"⚠️ Warmup of {name} failed: {e}")
+                timings[name] = f"failed: {e}"
+
+        return timings
+
+
+def main():
+    """Build the index files from the command line."""
+    parser = argparse.ArgumentParser(description="Build the memory-mapped search index")
+    parser.add_argument("--output", default=DEFAULT_INDEX_DIR, help="Index directory to write")
+    parser.add_argument("--chunks", default=DEFAULT_CHUNKS_PATH, help="Directory of *_chunks.json files")
+    parser.add_argument("--no-vectors", action="store_true", help="Skip the embedding matrix (lexical only)")
+    args = parser.parse_args()
+
+    build_index(args.output, args.chunks, with_vectors=not args.no_vectors)
+
+
+if __name__ == "__main__":
+    main()
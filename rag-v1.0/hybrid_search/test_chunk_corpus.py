@@ -0,0 +1,78 @@
+"""
+Test Chunk Corpus
+"""
+
+import json
+import os
+import tempfile
+
+from chunk_corpus import (ChunkCorpus, ChunkCorpusWriter, build_corpus, iter_chunk_records, open_corpus,
+                          published_corpus)
+
+def write_chunks_file(chunks_dir, filename, chunks):
+    """Write a *_chunks.json file the way the preprocessing processors do."""
+    data = {"filename": filename, "text_length": sum(map(len, chunks)), "chunk_count": len(chunks), "chunks": chunks}
+    with open(os.path.join(chunks_dir, f"{os.path.splitext(filename)[0]}_chunks.json"), 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+def test_round_trip():
+    """Records come back in order, by position and by chunk ID."""
+
+    print("📦 Testing chunk corpus")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        with ChunkCorpusWriter(corpus_dir) as writer:
+            writer.add_document("a.pdf", ["first chunk", "second — ünïcode\nchunk"], [[1, 1], [1, 2]])
+            writer.add_document("b_chunk_x.pdf", ["only chunk"])
+
+        corpus = ChunkCorpus(corpus_dir)
+        records = list(corpus)
+        print(f"{len(corpus)} records: {[r['id'] for r in records]}")
+
+        assert len(corpus) == 3
+        assert [r["id"] for r in records] == ["a.pdf_chunk_1", "a.pdf_chunk_2", "b_chunk_x.pdf_chunk_1"]
+        assert records[1]["text"] == "second — ünïcode\nchunk" and records[1]["pages"] == [1, 2]
+        assert records[1]["total_chunks"] == 2
+        assert records[2]["pages"] is None
+        assert [corpus.get(r["id"]) for r in records] == records
+        assert corpus.text(2) == "only chunk"
+        assert corpus.get("a.pdf_chunk_3") is None and corpus.get("c.pdf_chunk_1") is None
+
+def test_publish_and_stale_reads():
+    """Builds publish through the pointer; reads never write and skip a stale corpus."""
+
+    with tempfile.TemporaryDirectory() as chunks_dir, tempfile.TemporaryDirectory() as snapshot_dir:
+        write_chunks_file(chunks_dir, "a.pdf", ["alpha", "beta"])
+
+        # No corpus yet: records come from the JSON files, and nothing is written
+        assert [r["text"] for r in iter_chunk_records(chunks_dir)] == ["alpha", "beta"]
+        assert open_corpus(chunks_dir) is None and published_corpus(chunks_dir) is None
+
+        build_corpus(chunks_dir)
+        assert open_corpus(chunks_dir) is not None
+
+        # A reader that opened the old corpus keeps reading it after a new one is published
+        old = ChunkCorpus(chunks_dir)
+        write_chunks_file(chunks_dir, "b.pdf", ["gamma"])
+        assert open_corpus(chunks_dir) is None  # Stale
+        assert [r["id"] for r in iter_chunk_records(chunks_dir)] == ["a.pdf_chunk_1", "a.pdf_chunk_2", "b.pdf_chunk_1"]
+
+        build_corpus(chunks_dir)
+        assert len(open_corpus(chunks_dir)) == 3
+        assert [r["text"] for r in old] == ["alpha", "beta"]
+
+        # Only the published corpus and the one before it are kept
+        build_corpus(chunks_dir)
+        assert len([name for name in os.listdir(chunks_dir) if name.startswith("corpus-")]) == 2
+
+        # A corpus built elsewhere (e.g. an index generation) is used without its sources
+        build_corpus(chunks_dir, snapshot_dir)
+        os.remove(os.path.join(chunks_dir, "b_chunks.json"))
+        assert len(list(iter_chunk_records(snapshot_dir))) == 3
+        assert len(list(iter_chunk_records(chunks_dir))) == 2
+    print("✅ Corpora publish atomically and stale ones are skipped")
+
+if __name__ == "__main__":
+    test_round_trip()
+    test_publish_and_stale_reads()
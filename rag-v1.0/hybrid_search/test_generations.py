@@ -0,0 +1,68 @@
+"""
+Test Index Generations
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+from generations import (acquire_lease, build_generation, current_generation, generation_path, live_readers,
+                         open_engines, prune, publish, release_lease, READERS_DIR)
+
+def test_publish_and_rollback():
+    """A build publishes a complete generation; CURRENT can be pointed back at an older one."""
+
+    print("🏗️ Testing index generations")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as root:
+        assert current_generation(root) is None
+
+        first = build_generation(root, with_chroma=False, with_vectors=False)
+        second = build_generation(root, with_chroma=False, with_vectors=False)
+        assert current_generation(root) == second
+
+        results = open_engines(root, second, backend="mmap").bm25_search("antimatter physics", top_k=3)
+        print(f"Generation {second}: {[r['chunk_id'] for r in results]}")
+        assert results
+
+        publish(root, first)  # Roll back
+        assert current_generation(root) == first
+
+        try:
+            publish(root, "missing")
+            assert False, "publishing an unknown generation must fail"
+        except ValueError:
+            pass
+
+        assert prune(root, keep_previous=0) == [second]
+        assert set(os.listdir(root)) == {"CURRENT", first}
+
+def test_prune_keeps_open_generations():
+    """A generation some running process has open survives pruning until it is released."""
+
+    with tempfile.TemporaryDirectory() as root:
+        first = build_generation(root, with_chroma=False, with_mmap=False)
+        second = build_generation(root, with_chroma=False, with_mmap=False)
+        build_generation(root, with_chroma=False, with_mmap=False)
+
+        # A lease left behind by a process that has exited doesn't count
+        dead = subprocess.Popen([sys.executable, "-c", "pass"])
+        dead.wait()
+        os.makedirs(generation_path(root, second, READERS_DIR))
+        open(os.path.join(generation_path(root, second, READERS_DIR), str(dead.pid)), 'w').close()
+        acquire_lease(root, first)
+
+        assert live_readers(root, first) == [os.getpid()]
+        assert live_readers(root, second) == []
+        assert prune(root, keep_previous=0) == [second]
+        assert os.path.isdir(generation_path(root, first))
+
+        release_lease(root, first)
+        assert prune(root, keep_previous=0) == [first]
+
+
+if __name__ == "__main__":
+    test_publish_and_rollback()
+    test_prune_keeps_open_generations()
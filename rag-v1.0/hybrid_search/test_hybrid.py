@@ -2,7 +2,7 @@
 Test Hybrid Search
 """
 
-from hybrid_search import hybrid_search
+from hybrid_search import hybrid_search, hybrid_search_many, default_engines
 
 def test_antimatter_query():
     """Test hybrid search with antimatter query."""
@@ -64,6 +64,42 @@ def test_filtered_search():
     for i, (filename, score) in enumerate(results2["weighted_combination"], 1):
         print(f"  {i}. {filename} (final score: {score:.3f})")
 
+def test_batch_search():
+    """Test that batched search returns exactly the per-query results."""
+    
+    print("\n" + "=" * 60)
+    print("🔍 Testing Batched Search")
+    print("=" * 60)
+    
+    queries = ["antimatter physics", "radiation damage in detectors", "antimatter light emission"]
+    
+    batched = hybrid_search_many(queries, top_k=3)
+    
+    for query, results in zip(queries, batched):
+        print(f"🎯 {query}: {[filename for filename, _ in results['weighted_combination']]}")
+        assert results == hybrid_search(query, top_k=3)
+
+def test_snippets():
+    """Test that snippets cover the query terms and highlight offsets point at them."""
+    
+    print("\n" + "=" * 60)
+    print("🔍 Testing Query-Aware Snippets")
+    print("=" * 60)
+    
+    query = "radiation damage in GaAs detectors"
+    top_hit = hybrid_search(query, top_k=1)["bm25"][0]
+    
+    snippets = default_engines.snippets(top_hit["chunk_id"], query, window_words=30)
+    
+    for snippet in snippets:
+        highlighted = [snippet["text"][start:end] for start, end in snippet["highlights"]]
+        print(f"📝 {snippet['text']}")
+        print(f"   Highlights: {highlighted}")
+        assert len(snippet["text"].split()) <= 30
+        assert highlighted and all(word.lower() in query.lower() for word in highlighted)
+
 if __name__ == "__main__":
     test_antimatter_query()
     test_filtered_search()
+    test_batch_search()
+    test_snippets()
@@ -0,0 +1,75 @@
+"""
+Test Memory-Mapped Index
+"""
+
+import tempfile
+
+import numpy as np
+
+from mmap_index import MmapIndex, build_index, embed_corpus
+from lexical_matching.bm25 import BM25Index
+
+def test_matches_bm25():
+    """The mapped index returns the same lexical results, texts and snippets as the in-memory one."""
+
+    print("🗺️ Testing memory-mapped index")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        build_index(index_dir, with_vectors=False)
+
+        mapped = MmapIndex(index_dir)
+        in_memory = BM25Index()
+
+        for query in ["antimatter physics", "GaAs detectors radiation", "kalman filter, tracking"]:
+            expected = in_memory.search(query, top_k=10)
+            results = mapped.bm25_search(query, top_k=10)
+            print(f"'{query}': {[r['chunk_id'] for r in results[:3]]}")
+
+            assert [r["chunk_id"] for r in results] == [r["chunk_id"] for r in expected]
+            assert all(abs(r["score"] - e["score"]) < 1e-9 for r, e in zip(results, expected))
+
+            top = expected[0]["chunk_id"]
+            assert mapped.get_chunk_text(top) == expected[0]["text"]
+            assert mapped.snippets(top, query) == in_memory.snippets(top, query)
+
+        assert mapped.get_chunk_text("missing.pdf_chunk_1") is None
+        assert mapped.chroma_search("antimatter") == []  # Built without vectors
+
+class FakeChroma:
+    """Collection holding vectors of an older chunking; embeds by text length."""
+
+    def __init__(self, stored):
+        self.stored = stored  # chunk_id -> (text, vector)
+        self.embedded = []
+
+    def load(self):
+        return self
+
+    def get(self, ids, include):
+        found = [i for i in ids if i in self.stored]
+        return {"ids": found, "documents": [self.stored[i][0] for i in found],
+                "embeddings": [self.stored[i][1] for i in found]}
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), 0.0] for text in texts]
+
+def test_embed_corpus_after_rechunk():
+    """Stored vectors are reused only for unchanged chunks, even when the chunk count still matches."""
+
+    print("\n🗺️ Testing vector reuse after a re-chunk")
+    print("=" * 50)
+
+    chroma = FakeChroma({"a.pdf_chunk_1": ("antimatter", [1.0, 1.0]), "a.pdf_chunk_2": ("old text", [2.0, 2.0]),
+                         "b.pdf_chunk_9": ("gone", [3.0, 3.0])})
+    vectors = embed_corpus(["a.pdf_chunk_1", "a.pdf_chunk_2", "b.pdf_chunk_1"], ["antimatter", "new text!", "gaas"],
+                           batch_size=1, chroma_index=chroma)
+    print(f"Embedded: {chroma.embedded}")
+
+    assert chroma.embedded == ["new text!", "gaas"]
+    assert np.array_equal(vectors, np.array([[1, 1], [9, 0], [4, 0]], dtype=np.float32))
+
+if __name__ == "__main__":
+    test_matches_bm25()
+    test_embed_corpus_after_rechunk()
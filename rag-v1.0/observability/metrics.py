@@ -0,0 +1,102 @@
+"""
+Prometheus-Style Metrics
+Minimal histograms and gauges rendered in the Prometheus text exposition format.
+"""
+
+import bisect
+import threading
+
+# Upper bounds in seconds, from a BM25 lookup to a slow LLM call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+class Histogram:
+    """
+    Cumulative histogram keyed by label values.
+    """
+
+    def __init__(self, name, help_text, label_name, buckets=DEFAULT_BUCKETS):
+        """
+        Args:
+            name (str): Metric name
+            help_text (str): HELP line shown in /metrics
+            label_name (str): Name of the single label (e.g. 'stage')
+            buckets (tuple): Sorted bucket upper bounds
+        """
+        self.name = name
+        self.help_text = help_text
+        self.label_name = label_name
+        self.buckets = tuple(buckets)
+        self._series = {}  # label value -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, label_value, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {label: list(series) for label, series in self._series.items()}
+
+        for label_value, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                labels = _format_labels([(self.label_name, label_value), ("le", bound)])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels([(self.label_name, label_value)])
+            lines.append(f"{self.name}_sum{labels} {series[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class Gauge:
+    """
+    Last-value gauge keyed by label values.
+    """
+
+    def __init__(self, name, help_text, label_name):
+        self.name = name
+        self.help_text = help_text
+        self.label_name = label_name
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def set(self, label_value, value):
+        with self._lock:
+            self._values[label_value] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            values = dict(self._values)
+        for label_value, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels([(self.label_name, label_value)])} {value}")
+        return lines
+
+def render_metrics():
+    """
+    Returns:
+        str: Every registered metric in the Prometheus text format
+    """
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# Pipeline metrics
+STAGE_SECONDS = Histogram("rag_stage_duration_seconds", "Time spent in each RAG pipeline stage.", "stage")
+COLD_START_SECONDS = Gauge("rag_cold_start_seconds", "Time to warm up each engine component.", "component")
@@ -0,0 +1,73 @@
+"""
+Test Per-Stage Tracing and Metrics
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from observability.metrics import Histogram, render_metrics
+from observability.tracing import span, start_trace, submit_in_context
+
+
+def stage_count(stage):
+    """Observations of a stage so far in the shared stage histogram."""
+    prefix = f"rag_stage_duration_seconds_count{{stage=\"{stage}\"}} "
+    for line in render_metrics().splitlines():
+        if line.startswith(prefix):
+            return int(line[len(prefix):])
+    return 0
+
+
+def test_trace_across_threads():
+    """Spans in executor threads land in the submitting request's trace."""
+
+    print("🔍 Testing trace propagation")
+    print("=" * 50)
+
+    def search():
+        with span("bm25"):
+            return sum(range(10000))
+
+    # The histogram is process-wide, so other tests' bm25 spans are already counted
+    before = stage_count("bm25")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        with start_trace() as trace:
+            with span("total"):
+                futures = [submit_in_context(executor, search) for _ in range(3)]
+                [f.result() for f in futures]
+            timings = trace.snapshot()
+
+        # Outside a trace, spans only feed the histograms
+        executor.submit(search).result()
+
+    print(f"Timings: {timings}")
+    assert set(timings) == {"bm25", "total"}
+    assert stage_count("bm25") == before + 4
+
+
+def test_histogram_buckets():
+    """Bucket counts are cumulative and end with +Inf."""
+
+    print("\n🔍 Testing histogram rendering")
+    print("=" * 50)
+
+    histogram = Histogram("test_seconds", "Test histogram.", "stage", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe("search", value)
+
+    lines = histogram.render()
+    for line in lines:
+        print(line)
+    assert 'test_seconds_bucket{stage="search",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="search",le="1.0"} 3' in lines
+    assert 'test_seconds_bucket{stage="search",le="+Inf"} 4' in lines
+    assert 'test_seconds_count{stage="search"} 4' in lines
+
+
+if __name__ == "__main__":
+    test_trace_across_threads()
+    test_histogram_buckets()
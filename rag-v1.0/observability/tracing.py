@@ -0,0 +1,123 @@
+"""
+Per-Stage Tracing
+Times pipeline stages into the current request's trace and the stage histogram.
+Set RAG_TRACING=0 to turn every span into a shared no-op.
+"""
+
+import contextvars
+import os
+import threading
+import time
+
+from observability.metrics import STAGE_SECONDS
+
+TRACING_ENABLED = os.getenv("RAG_TRACING", "1") != "0"
+
+# Trace of the request being handled in this thread/context
+_current_trace = contextvars.ContextVar("rag_trace", default=None)
+
+class Trace:
+    """
+    Milliseconds per stage for one request. Stages that run more than once
+    (e.g. BM25 for every query variant) are summed.
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds * 1000
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: Stage -> milliseconds, rounded for the response
+        """
+        with self._lock:
+            return {stage: round(ms, 2) for stage, ms in self.timings.items()}
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _record(self.stage, time.perf_counter() - self.start)
+        return False
+
+def _record(stage, seconds):
+    STAGE_SECONDS.observe(stage, seconds)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record(stage, seconds)
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+def span(stage):
+    """
+    Time a block as one pipeline stage.
+
+    Args:
+        stage (str): Stage name (e.g. 'bm25', 'generation')
+
+    Returns:
+        Context manager recording the stage duration
+    """
+    return _Span(stage) if TRACING_ENABLED else _NOOP_SPAN
+
+def record(stage, seconds):
+    """
+    Record a stage timed outside a span, e.g. one spanning several threads.
+
+    Args:
+        stage (str): Stage name
+        seconds (float): Duration
+    """
+    if TRACING_ENABLED:
+        _record(stage, seconds)
+
+class start_trace:
+    """
+    Make a fresh Trace current for the duration of a request.
+    Yields None when tracing is disabled.
+    """
+
+    __slots__ = ("trace", "token")
+
+    def __enter__(self):
+        if not TRACING_ENABLED:
+            self.token = None
+            return None
+        self.trace = Trace()
+        self.token = _current_trace.set(self.trace)
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.token is not None:
+            _current_trace.reset(self.token)
+        return False
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    """
+    Submit work to an executor so its spans land in the caller's trace.
+
+    Returns:
+        Future: The submitted work
+    """
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
@@ -6,16 +6,80 @@ Uses existing PDF loader and semantic chunker to process all PDFs.
 import os
 import sys
 import json
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 # Add the preprocessing directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from normalization.pdf_loader import PyMuPDFPreprocessor
+from normalization.pdf_loader import PAGES_PER_BLOCK, extract_pages, iter_pages, page_count
 from chunking.simple_semantic_chunker import SemanticChunker
+from ingest_manifest import IngestManifest, extractor_version
 
+# PDFs extracted and then chunked together
+DOCS_PER_BATCH = 16
 
-def process_all_pdfs(input_path=None, output_path=None):
-    """Process all PDFs using existing components."""
+# PDFs with more pages are extracted in page blocks across processes and chunked as the pages arrive
+LARGE_PDF_PAGES = 2 * PAGES_PER_BLOCK
+
+
+def output_filename(filename):
+    """Name of the chunks file written for a document (PDF or EPUB)."""
+    return f"{os.path.splitext(filename)[0]}_chunks.json"
+
+
+def measure_pages(pages, page_lengths):
+    """Pass (page_number, text) pages through, appending each page's length to page_lengths."""
+    for page_number, page_text in pages:
+        page_lengths.append(len(page_text))
+        yield page_number, page_text
+
+
+def save_chunks(output_path, pdf_file, text_length, chunks, chunk_pages=None):
+    """
+    Write one PDF's chunks as <name>_chunks.json, the format the search indexes load.
+    
+    Args:
+        chunk_pages (list): Optional (first_page, last_page) per chunk, saved as 'chunk_pages'
+    
+    Returns:
+        dict: The saved document record
+    """
+    result = {
+        'filename': pdf_file,
+        'text_length': text_length,
+        'chunk_count': len(chunks),
+        'chunks': chunks
+    }
+    if chunk_pages is not None:
+        result['chunk_pages'] = [list(pages) if pages else None for pages in chunk_pages]
+    
+    # Written to a temp file and renamed, so readers never see a partial file
+    output_file = os.path.join(output_path, output_filename(pdf_file))
+    tmp_file = f"{output_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_file, output_file)
+    
+    return result
+
+
+def process_all_pdfs(input_path=None, output_path=None, incremental=True, extract_workers=None):
+    """
+    Process all PDFs using existing components.
+    
+    Args:
+        input_path (str): Directory of PDFs
+        output_path (str): Directory for the *_chunks.json files
+        incremental (bool): Skip PDFs whose content and settings match the ingest manifest,
+            and remove the outputs of deleted PDFs
+        extract_workers (int): Processes extracting page blocks of large PDFs (defaults to the CPU count)
+    
+    Returns:
+        dict: The change set (see IngestManifest.save)
+    """
     
     # Setup paths with defaults
     if input_path is None:
@@ -27,50 +91,103 @@ def process_all_pdfs(input_path=None, output_path=None):
     os.makedirs(output_path, exist_ok=True)
     
     # Use existing components
-    preprocessor = PyMuPDFPreprocessor(data_directory=input_path)
     chunker = SemanticChunker()
     
     # Get all PDFs
     pdf_files = [f for f in os.listdir(input_path) if f.endswith('.pdf')]
-    print(f"Found {len(pdf_files)} PDFs to process")
+    print(f"Found {len(pdf_files)} PDFs")
+    
+    # Only new or changed PDFs (or all of them, if not incremental)
+    manifest = IngestManifest(output_path)
+    extractor = extractor_version("pymupdf4llm")
+    plan = manifest.plan({f: os.path.join(input_path, f) for f in pdf_files}, extractor, chunker.config(),
+                         source_dirs=[input_path], reprocess_all=not incremental)
+    print(f"Ingest plan: {len(plan.to_process)} new or changed, {len(plan.unchanged)} unchanged, "
+          f"{len(plan.deleted)} deleted")
+    
+    for pdf_file in plan.deleted:
+        manifest.remove(pdf_file)
+        print(f"  🗑️ Removed chunks of deleted {pdf_file}")
+    
+    pdf_files = [f for f in pdf_files if f in plan.to_process]
     
-    # Process each PDF
     all_results = []
     
-    for i, pdf_file in enumerate(pdf_files, 1):
-        print(f"[{i}/{len(pdf_files)}] Processing {pdf_file}")
-        
-        try:
-            # Step 1: PDF -> Text (using existing pdf_loader)
+    def save(pdf_file, text_length, chunks_with_pages):
+        chunks = [chunk for chunk, _ in chunks_with_pages]
+        all_results.append(save_chunks(output_path, pdf_file, text_length, chunks,
+                                       [pages for _, pages in chunks_with_pages]))
+        path, sha256 = plan.to_process[pdf_file]
+        manifest.record(pdf_file, path, sha256, extractor, chunker.config(), output_filename(pdf_file), len(chunks))
+        print(f"  → {pdf_file}: {len(chunks)} chunks generated")
+    
+    # Large PDFs: page blocks extracted in parallel and chunked as they arrive, in page order
+    small_files = []
+    executor = None
+    try:
+        for pdf_file in pdf_files:
             pdf_path = os.path.join(input_path, pdf_file)
-            documents = preprocessor.process_single_pdf(pdf_path)
-            text = documents[0]['text']
+            try:
+                pages = page_count(pdf_path)
+            except Exception as e:
+                print(f"✗ Error opening {pdf_file}: {e}")
+                continue
             
-            # Step 2: Text -> Chunks (using existing semantic_chunker)
-            chunks = chunker.chunk(text)
+            if pages <= LARGE_PDF_PAGES:
+                small_files.append(pdf_file)
+                continue
             
-            # Save chunks for this PDF
-            result = {
-                'filename': pdf_file,
-                'text_length': len(text),
-                'chunk_count': len(chunks),
-                'chunks': chunks
-            }
+            print(f"Processing {pdf_file} ({pages} pages, {PAGES_PER_BLOCK} per block)")
+            if executor is None:
+                # spawn: the chunker's model (and its threads) already live in this process
+                executor = ProcessPoolExecutor(max_workers=extract_workers or os.cpu_count(),
+                                               mp_context=multiprocessing.get_context("spawn"))
             
-            # Save individual file
-            output_file = os.path.join(output_path, f"{pdf_file.replace('.pdf', '')}_chunks.json")
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(result, f, indent=2, ensure_ascii=False)
-            
-            all_results.append(result)
-            print(f"  → {len(chunks)} chunks generated")
+            page_lengths = []
+            try:
+                chunks = list(chunker.iter_page_chunks(measure_pages(iter_pages(pdf_path, executor), page_lengths)))
+            except Exception as e:
+                print(f"  ✗ Error processing {pdf_file}: {e}")
+                if isinstance(e, BrokenProcessPool):
+                    # Only this PDF's blocks were in flight; start a new pool for the next one
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = None
+                continue
+            save(pdf_file, sum(page_lengths), chunks)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    
+    # Other PDFs in groups, so the chunker embeds sentences from several papers per batch
+    for batch_start in range(0, len(small_files), DOCS_PER_BATCH):
+        batch = []  # (pdf_file, pages)
+        
+        for i, pdf_file in enumerate(small_files[batch_start:batch_start + DOCS_PER_BATCH], batch_start + 1):
+            print(f"[{i}/{len(small_files)}] Processing {pdf_file}")
             
+            # Step 1: PDF -> Pages of markdown
+            try:
+                batch.append((pdf_file, extract_pages(os.path.join(input_path, pdf_file))))
+            except Exception as e:
+                print(f"✗ Error processing {pdf_file}: {e}")
+        
+        try:
+            # Step 2: Pages -> Chunks (sentences of the whole group embedded together)
+            batch_chunks = chunker.chunk_many_pages([pages for _, pages in batch])
         except Exception as e:
-            print(f"  ✗ Error: {e}")
+            print(f"  ✗ Error chunking batch: {e}")
+            continue
+        
+        for (pdf_file, pages), chunks in zip(batch, batch_chunks):
+            save(pdf_file, sum(len(text) for _, text in pages), chunks)
+    
+    change_set = manifest.save()
     
     # Save summary
     summary = {
         'total_pdfs_processed': len(all_results),
+        'total_pdfs_unchanged': len(plan.unchanged),
+        'total_pdfs_deleted': len(plan.deleted),
         'total_chunks': sum(r['chunk_count'] for r in all_results),
         'files': [{'filename': r['filename'], 'chunks': r['chunk_count']} for r in all_results]
     }
@@ -79,9 +196,10 @@ def process_all_pdfs(input_path=None, output_path=None):
     with open(summary_file, 'w', encoding='utf-8') as f:
         json.dump(summary, f, indent=2)
     
-    print(f"\nDone! Processed {len(all_results)} PDFs")
+    print(f"\nDone! Processed {len(all_results)} PDFs ({len(plan.unchanged)} unchanged, {len(plan.deleted)} deleted)")
     print(f"Total chunks: {summary['total_chunks']}")
     print(f"Output directory: {output_path}")
+    return change_set
 
 
 if __name__ == "__main__":
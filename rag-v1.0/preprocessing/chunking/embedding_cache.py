@@ -0,0 +1,212 @@
+"""
+Sentence Embedding Cache
+Content-addressed sentence embeddings per model: vectors in an append-only float32 file read
+through a memory map, rows found by a hash index of the sentence text. Re-chunking with other
+thresholds or word limits reuses every embedding, and repeated sentences are embedded once.
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "embedding_cache")
+
+DIGEST_SIZE = 16  # Bytes of BLAKE2b per sentence
+VECTORS_FILE = "vectors.f32"  # float32 rows, appended
+INDEX_FILE = "index.bin"  # One digest per row, in row order; appended after the vectors
+META_FILE = "meta.json"
+LOCK_FILE = "lock"  # flock'd while appending, so several processes can share a cache
+
+
+def sentence_digest(sentence: str) -> bytes:
+    """Cache key of a sentence (its model is the cache directory)."""
+    return hashlib.blake2b(sentence.encode('utf-8'), digest_size=DIGEST_SIZE).digest()
+
+
+def model_cache_dir(cache_dir: str, model_name: str) -> str:
+    """Directory of one model's embeddings, e.g. 'all-MiniLM-L6-v2-1a2b3c4d'."""
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "_", model_name.rsplit("/", 1)[-1])
+    return os.path.join(cache_dir, f"{slug}-{hashlib.sha1(model_name.encode('utf-8')).hexdigest()[:8]}")
+
+
+class SentenceEmbeddingCache:
+    """
+    One model's sentence embeddings on disk (thread-safe, and safe to share between processes).
+
+    Only rows listed in the index are valid: vectors are written before their digests, so an
+    interrupted append leaves at most unindexed bytes, which the next append overwrites.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str):
+        """
+        Open (or create) the cache of a model.
+
+        Args:
+            cache_dir (str): Root cache directory, shared by all models
+            model_name (str): Embedding model the vectors come from
+        """
+        self.model_name = model_name
+        self.path = model_cache_dir(cache_dir, model_name)
+        os.makedirs(self.path, exist_ok=True)
+
+        self.dimension = None
+        self._rows = {}  # digest -> row
+        self._index_bytes = 0  # Index file read so far
+        self._vectors = None  # Memory map of the first _mapped_rows rows
+        self._mapped_rows = 0
+        self._lock = threading.Lock()
+
+        with self._lock, self._file_lock():
+            self._refresh()
+
+    def __len__(self):
+        return len(self._rows)
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        with open(os.path.join(self.path, LOCK_FILE), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Pick up rows appended since the last read (by this or another process)."""
+        meta_path = os.path.join(self.path, META_FILE)
+        if self.dimension is None and os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                self.dimension = json.load(f)["dimension"]
+
+        index_path = os.path.join(self.path, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return
+        with open(index_path, 'rb') as f:
+            f.seek(self._index_bytes)
+            data = f.read()
+        data = data[:len(data) - len(data) % DIGEST_SIZE]  # Ignore a partially written digest
+        for start in range(0, len(data), DIGEST_SIZE):
+            self._rows.setdefault(data[start:start + DIGEST_SIZE], len(self._rows))
+        self._index_bytes += len(data)
+
+    def lookup(self, digests: List[bytes]) -> List[Optional[int]]:
+        """Row of each digest, or None if that sentence isn't cached."""
+        rows = self._rows
+        return [rows.get(digest) for digest in digests]
+
+    def vectors(self, rows: List[int]) -> np.ndarray:
+        """Embeddings of the given rows (a copy, not a view of the memory map)."""
+        with self._lock:
+            needed = max(rows) + 1 if rows else 0
+            if needed > self._mapped_rows:
+                self._vectors = np.memmap(os.path.join(self.path, VECTORS_FILE), dtype=np.float32, mode='r',
+                                          shape=(len(self._rows), self.dimension))
+                self._mapped_rows = len(self._rows)
+            vectors = self._vectors
+        if not rows:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+        return vectors[rows]
+
+    def add(self, digests: List[bytes], vectors: np.ndarray):
+        """Append embeddings; digests already cached (e.g. by another process) are skipped."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock, self._file_lock():
+            self._refresh()
+            if self.dimension is None:
+                self.dimension = int(vectors.shape[1])
+                with open(os.path.join(self.path, META_FILE), 'w', encoding='utf-8') as f:
+                    json.dump({"model_name": self.model_name, "dimension": self.dimension,
+                               "digest": f"blake2b-{DIGEST_SIZE}"}, f)
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(f"{self.model_name} cache holds {self.dimension}-d vectors, got {vectors.shape[1]}-d")
+
+            new = {}
+            for digest, vector in zip(digests, vectors):
+                if digest not in self._rows and digest not in new:
+                    new[digest] = vector
+            if not new:
+                return
+
+            with open(os.path.join(self.path, VECTORS_FILE), 'ab') as f:
+                f.truncate(len(self._rows) * self.dimension * 4)  # Drop rows of an interrupted append
+                f.write(np.stack(list(new.values())).tobytes())
+            with open(os.path.join(self.path, INDEX_FILE), 'ab') as f:
+                f.write(b"".join(new))
+
+            for digest in new:
+                self._rows[digest] = len(self._rows)
+            self._index_bytes += len(new) * DIGEST_SIZE
+
+
+class CachedEncoder:
+    """
+    encode()/similarity_pairwise() of a SentenceTransformer (or EmbeddingService) backed by a
+    SentenceEmbeddingCache: only sentences the cache hasn't seen reach the model, each once.
+    encode() returns float32 numpy arrays.
+    """
+
+    def __init__(self, encoder=None, model_name: str = None, cache_dir: str = DEFAULT_CACHE_DIR,
+                 load_encoder=None):
+        """
+        Args:
+            encoder: Model to embed cache misses with
+            model_name (str): Name of the model (defaults to encoder.model_name); the cache key
+            cache_dir (str): Root cache directory
+            load_encoder (callable): Returns the model, called on the first miss instead of
+                passing encoder (a fully cached run never loads it)
+        """
+        self._encoder = encoder
+        self._load_encoder = load_encoder
+        self._load_lock = threading.Lock()
+        self.model_name = model_name or encoder.model_name
+        self.cache = SentenceEmbeddingCache(cache_dir, self.model_name)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def encoder(self):
+        """The wrapped model, loaded on first use if it was given as load_encoder."""
+        with self._load_lock:
+            if self._encoder is None:
+                self._encoder = self._load_encoder()
+            return self._encoder
+
+    def encode(self, sentences: List[str], **kwargs) -> np.ndarray:
+        """Embed sentences, running the model only on uncached ones (kwargs go to its encode())."""
+        sentences = list(sentences)
+        digests = [sentence_digest(sentence) for sentence in sentences]
+        rows = self.cache.lookup(digests)
+
+        missing = {}  # digest -> sentence, first occurrence only
+        for digest, sentence, row in zip(digests, sentences, rows):
+            if row is None and digest not in missing:
+                missing[digest] = sentence
+        self.hits += len(sentences) - len(missing)
+        self.misses += len(missing)
+
+        computed = {}
+        if missing:
+            embeddings = np.asarray(self.encoder.encode(list(missing.values()), **kwargs), dtype=np.float32)
+            self.cache.add(list(missing), embeddings)
+            computed = dict(zip(missing, embeddings))
+
+        cached = [i for i, row in enumerate(rows) if row is not None]
+        result = np.empty((len(sentences), self.cache.dimension or 0), dtype=np.float32)
+        if cached:
+            result[cached] = self.cache.vectors([rows[i] for i in cached])
+        for i, row in enumerate(rows):
+            if row is None:
+                result[i] = computed[digests[i]]
+        return result
+
+    def similarity_pairwise(self, embeddings1, embeddings2):
+        """Cosine similarity of row i of embeddings1 with row i of embeddings2 (no model needed)."""
+        from sentence_transformers.util import pairwise_cos_sim
+        return pairwise_cos_sim(embeddings1, embeddings2)
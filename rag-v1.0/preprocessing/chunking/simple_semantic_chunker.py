@@ -2,9 +2,24 @@
 Minimal Semantic Chunking - Just the essentials
 """
 
-from sentence_transformers import SentenceTransformer
+import itertools
 import re
-from typing import List
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from .embedding_cache import CachedEncoder
+except ImportError:  # Run from this directory
+    from embedding_cache import CachedEncoder
+
+# Sentences embedded per batch by the streaming chunker
+ENCODE_WINDOW = 256
+
+# chunk_many(): sentences pooled across documents per encode call, and the model's batch size
+POOL_SENTENCES = 8192
+ENCODE_BATCH_SIZE = 128
+
+# (first_page, last_page) of a sentence or chunk; None when the text has no pages
+PageRange = Optional[Tuple[int, int]]
 
 
 class SemanticChunker:
@@ -14,131 +29,421 @@ class SemanticChunker:
         threshold: float = 0.02,
         overlap_threshold: float = 0.5,  # Similarity threshold for smart overlap
         min_chunk_words: int = 250,  # Minimum chunk size in words
-        max_chunk_words: int = 800   # Maximum chunk size in words
+        max_chunk_words: int = 800,  # Maximum chunk size in words
+        encode_window: int = ENCODE_WINDOW,  # Sentences embedded at a time
+        pool_sentences: int = POOL_SENTENCES,  # Sentences pooled across documents by chunk_many
+        encode_batch_size: int = ENCODE_BATCH_SIZE,  # Model batch size for pooled sentences
+        encoder=None,  # Shared model, e.g. an EmbeddingService (instead of loading model_name here)
+        embedding_cache: Optional[str] = None  # Directory of persistent sentence embeddings (see embedding_cache.py)
     ):
-        self.model = SentenceTransformer(model_name)
+        self._model = encoder  # Loaded on first use, so config() is cheap
+        self.model_name = getattr(encoder, "model_name", model_name)
+        if embedding_cache:
+            # Cached sentences skip the model, which loads on the first miss
+            self._model = CachedEncoder(encoder, self.model_name, embedding_cache,
+                                        load_encoder=lambda: _load_model(self.model_name))
         self.threshold = threshold
         self.overlap_threshold = overlap_threshold
         self.min_chunk_words = min_chunk_words
         self.max_chunk_words = max_chunk_words
+        self.encode_window = encode_window
+        self.pool_sentences = pool_sentences
+        self.encode_batch_size = encode_batch_size
+    
+    @property
+    def model(self):
+        """Embedding model (the shared encoder, or model_name loaded on first use)."""
+        if self._model is None:
+            self._model = _load_model(self.model_name)
+        return self._model
+    
+    @model.setter
+    def model(self, model):
+        self._model = model
+    
+    def config(self) -> dict:
+        """Settings that determine the chunks (batching settings don't)."""
+        return {
+            "model_name": self.model_name,
+            "threshold": self.threshold,
+            "overlap_threshold": self.overlap_threshold,
+            "min_chunk_words": self.min_chunk_words,
+            "max_chunk_words": self.max_chunk_words
+        }
     
     def chunk(self, text: str) -> List[str]:
         """Split text into semantic chunks with overlap."""
-        return self._chunk_with_overlap(text)
-    
-    def _chunk_with_overlap(self, text: str) -> List[str]:
-        """Split text into semantic chunks with sentence-level overlap."""
-        # Split into sentences
-        sentences = [s.strip() for s in re.split(r'[.!?]+', text) if s.strip()]
-        
-        if len(sentences) <= 1:
-            return [text]
-        
-        # Get similarities between consecutive sentences
-        embeddings = self.model.encode(sentences)
-        similarities = self.model.similarity(embeddings, embeddings)
-        
-        # Find breakpoints where similarity drops below threshold
-        breakpoints = []
-        start = 0
-        
-        for i in range(len(sentences) - 1):
-            sim = similarities[i][i + 1].item()
-            if sim < self.threshold:
-                breakpoints.append(i + 1)
-        
-        # If no breakpoints found, return whole text
-        if not breakpoints:
-            return [text]
-        
-        # Create overlapping chunks
-        chunks = []
-        chunk_start = 0
-        
-        for breakpoint in breakpoints:
-            # Create chunk from start to breakpoint
-            chunk_end = breakpoint
-            chunk_sentences = sentences[chunk_start:chunk_end]
-            chunk = ' '.join(chunk_sentences)
-            chunks.append(chunk)
+        return list(self.iter_chunks(text))
+    
+    def iter_chunks(self, text: str) -> Iterator[str]:
+        """
+        Yield semantic chunks one at a time (same chunks as chunk()).
+        
+        Sentences are embedded encode_window at a time and only the similarity of each
+        sentence to the next is kept, so memory grows with the window and the chunk being
+        built, not with the document - a whole book never becomes an N x N matrix.
+        """
+        sentences = ((sentence, None) for sentence in self._iter_sentences(text))
+        for chunk, _ in self._chunks_from_similarities(lambda: (text, None), self._iter_similarities(sentences)):
+            yield chunk
+    
+    def iter_page_chunks(self, pages: Iterable[Tuple[int, str]]) -> Iterator[Tuple[str, PageRange]]:
+        """
+        Stream chunks of a document that arrives page by page.
+        
+        The pages are chunked as their concatenation would be (sentences may cross page
+        boundaries), but only the current encode window is held, so extraction of later
+        pages can run while earlier ones are chunked.
+        
+        Args:
+            pages: (page_number, page_text) in page order
             
-            # Smart overlap: go back while similarity is high
-            overlap_start = breakpoint - 1
-            while (overlap_start > chunk_start and 
-                   overlap_start < len(sentences) - 1 and
-                   similarities[overlap_start][overlap_start + 1].item() > self.overlap_threshold):
-                overlap_start -= 1
+        Yields:
+            (chunk, (first_page, last_page)): Each chunk with the pages it was taken from
+        """
+        fallback = _PageText()
+        sentences = self._iter_page_sentences(fallback.collect(pages))
+        for chunk in self._chunks_from_similarities(fallback.get, self._iter_similarities(sentences)):
+            fallback.release()  # Only needed if the document has no breakpoint at all
+            yield chunk
+    
+    def chunk_many(self, texts: Iterable[str]) -> List[List[str]]:
+        """
+        Chunk several documents, embedding their sentences together.
+        
+        Sentences from consecutive documents are pooled (up to pool_sentences) into one
+        encode call, so short documents still fill large model batches; the embeddings are
+        scattered back and each document is chunked exactly as chunk() would.
+        
+        Args:
+            texts: Document texts
             
-            chunk_start = max(chunk_start, overlap_start)
+        Returns:
+            List[List[str]]: Chunks per document, in input order
+        """
+        documents = ((text, [(sentence, None) for sentence in self._iter_sentences(text)], None) for text in texts)
+        return [[chunk for chunk, _ in chunks] for chunks in self._chunk_documents(documents)]
+    
+    def chunk_many_pages(self, documents: Iterable[List[Tuple[int, str]]]) -> List[List[Tuple[str, PageRange]]]:
+        """
+        chunk_many() for documents given as pages, keeping each chunk's page range.
         
-        # Add final chunk
-        if chunk_start < len(sentences):
-            final_sentences = sentences[chunk_start:]
-            final_chunk = ' '.join(final_sentences)
-            chunks.append(final_chunk)
+        Args:
+            documents: Per document, its (page_number, page_text) in page order
+            
+        Returns:
+            List[List[Tuple[str, PageRange]]]: (chunk, (first_page, last_page)) per document
+        """
+        return [self.chunks_from_scored(scored) for scored in self.score_many_pages(documents)]
+    
+    def score_many_pages(self, documents: Iterable[List[Tuple[int, str]]]) -> List[tuple]:
+        """
+        The embedding half of chunk_many_pages(): pooled sentence embeddings reduced to each
+        sentence's similarity to the next. Pass each result to chunks_from_scored().
         
-        # Post-process: merge tiny chunks and split oversized chunks
-        chunks = self._merge_tiny_chunks(chunks)
-        chunks = self._split_oversized_chunks(chunks)
-        return chunks
+        Args:
+            documents: Per document, its (page_number, page_text) in page order
+            
+        Returns:
+            List[tuple]: Per document (text, [(sentence, similarity to next, pages)], page range)
+        """
+        def split(pages):
+            pages = list(pages)
+            span = (pages[0][0], pages[-1][0]) if pages else None
+            return ''.join(text for _, text in pages), list(self._iter_page_sentences(pages)), span
+        
+        return self._score_documents(split(pages) for pages in documents)
+    
+    def chunks_from_scored(self, scored: tuple) -> List[Tuple[str, PageRange]]:
+        """The chunking half: (chunk, pages) of a document scored by score_many_pages()."""
+        text, pairs, span = scored
+        return list(self._chunks_from_similarities(lambda: (text, span), iter(pairs)))
+    
+    def _chunk_documents(self, documents):
+        """Chunk (text, [(sentence, pages)], page range) documents; (chunk, pages) lists in input order."""
+        return [self.chunks_from_scored(scored) for scored in self._score_documents(documents)]
     
-    def _merge_tiny_chunks(self, chunks: List[str]) -> List[str]:
-        """Merge chunks that are too small with their neighbors."""
-        if len(chunks) <= 1:
-            return chunks
+    def _score_documents(self, documents):
+        """
+        Pool documents into encode calls of up to pool_sentences sentences.
         
-        merged = []
-        i = 0
+        Args:
+            documents: (text, [(sentence, pages)], pages of the whole text) per document
+            
+        Returns:
+            List of (text, [(sentence, similarity, pages)], pages), in input order
+        """
+        results = []
+        group = []  # Documents pooled into the next encode call
+        group_sentences = 0
         
-        while i < len(chunks):
-            current = chunks[i]
-            word_count = len(current.split())
+        for text, sentences, span in documents:
+            if group and group_sentences + len(sentences) > self.pool_sentences:
+                results.extend(self._score_group(group))
+                group, group_sentences = [], 0
             
-            # If current chunk is too small
-            if word_count < self.min_chunk_words:
-                # Try to merge with next chunk
-                if i + 1 < len(chunks):
-                    chunks[i + 1] = current + " " + chunks[i + 1]
-                # Or merge with previous chunk
-                elif merged:
-                    merged[-1] = merged[-1] + " " + current
-                else:
-                    merged.append(current)  # Keep if it's the only chunk
+            if len(sentences) > self.pool_sentences:
+                # Too large to pool: embed it in windows on its own
+                results.append((text, list(self._iter_similarities(iter(sentences))), span))
             else:
-                merged.append(current)
-            i += 1
+                group.append((text, sentences, span))
+                group_sentences += len(sentences)
         
-        return merged
+        if group:
+            results.extend(self._score_group(group))
+        return results
     
-    def _split_oversized_chunks(self, chunks: List[str]) -> List[str]:
-        """Split chunks that are too large into smaller pieces."""
-        result = []
+    def _score_group(self, group):
+        """Embed the sentences of several documents in one call, then score each document."""
+        pooled = [sentence for _, sentences, _ in group for sentence, _ in sentences]
+        # encode() sorts its input by length, so each model batch holds similar-length
+        # sentences from any of the documents, and returns embeddings in input order
+        embeddings = self.model.encode(pooled, batch_size=self.encode_batch_size) if pooled else None
         
-        for chunk in chunks:
-            word_count = len(chunk.split())
+        results = []
+        offset = 0
+        for text, sentences, span in group:
+            document = embeddings[offset:offset + len(sentences)] if sentences else None
+            offset += len(sentences)
             
-            if word_count <= self.max_chunk_words:
-                result.append(chunk)
-            else:
-                # Split oversized chunk at sentence boundaries
-                sentences = re.split(r'(?<=[.!?])\s+', chunk)
-                current_chunk = []
-                current_words = 0
+            similarities = []
+            if len(sentences) > 1:
+                similarities = self.model.similarity_pairwise(document[:-1], document[1:]).tolist()
+            pairs = [(sentence, similarity, pages)
+                     for (sentence, pages), similarity in zip(sentences, similarities + [None])]
+            results.append((text, pairs, span))
+        
+        return results
+    
+    def _chunks_from_similarities(self, fallback, pairs) -> Iterator[Tuple[str, PageRange]]:
+        """
+        (chunk, pages) of a document from its (sentence, similarity to the next, pages) triples.
+        fallback() returns the whole (text, pages), used when there is no breakpoint.
+        """
+        raw_chunks = self._iter_overlap_chunks(pairs)
+        first = next(raw_chunks, None)
+        
+        # A single sentence, or no breakpoint anywhere: the text is returned as is
+        if first is None:
+            yield fallback()
+            return
+        
+        # Post-process: merge tiny chunks and split oversized chunks
+        for chunk in self._merge_tiny_chunks(itertools.chain([first], raw_chunks)):
+            yield from self._split_oversized_chunk(chunk)
+    
+    def _iter_sentences(self, text: str) -> Iterator[str]:
+        """Sentences of the text, as re.split(r'[.!?]+', text) would give them."""
+        for match in re.finditer(r'[^.!?]+', text):
+            sentence = match.group().strip()
+            if sentence:
+                yield sentence
+    
+    def _iter_page_sentences(self, pages: Iterable[Tuple[int, str]]) -> Iterator[Tuple[str, Tuple[int, int]]]:
+        """
+        Sentences of the concatenated pages, each with its (first_page, last_page).
+        The unterminated tail of a page is carried into the next one.
+        """
+        carry = ""  # Trailing text that may continue on the next page
+        carry_first = carry_last = None  # Pages of the carry's first and last non-space characters
+        
+        for page_number, page_text in pages:
+            text = carry + page_text
+            carry_end = len(carry)
+            carry = ""
+            
+            for match in re.finditer(r'[^.!?]+', text):
+                raw = match.group()
+                sentence = raw.strip()
+                if not sentence and match.end() < len(text):
+                    continue
                 
-                for sentence in sentences:
-                    sentence_words = len(sentence.split())
-                    
-                    if current_words + sentence_words > self.max_chunk_words and current_chunk:
-                        # Save current chunk and start new one
-                        result.append(' '.join(current_chunk))
-                        current_chunk = [sentence]
-                        current_words = sentence_words
-                    else:
-                        current_chunk.append(sentence)
-                        current_words += sentence_words
+                # Page of the first and last non-space characters
+                start = match.start() + len(raw) - len(raw.lstrip())
+                end = match.end() - (len(raw) - len(raw.rstrip()))
+                first = carry_first if start < carry_end else page_number
+                last = carry_last if end <= carry_end else page_number
                 
-                # Add final chunk if any sentences remain
-                if current_chunk:
-                    result.append(' '.join(current_chunk))
+                if match.end() == len(text):
+                    # Unterminated: the sentence may go on on the next page
+                    carry, carry_first, carry_last = raw, first, last
+                    if not sentence:
+                        carry_first = carry_last = None
+                else:
+                    yield sentence, (first, last)
+        
+        sentence = carry.strip()
+        if sentence:
+            yield sentence, (carry_first, carry_last)
+    
+    def _iter_similarities(self, sentences: Iterable[Tuple[str, PageRange]]) -> Iterator[Tuple[str, Optional[float], PageRange]]:
+        """
+        Pair each (sentence, pages) with its similarity to the next one (None for the last sentence).
+        Embeddings are computed per window; the last embedding of a window links it to the next.
+        """
+        previous = None  # (sentence, pages, embedding) waiting for its successor
+        
+        for window in _batched(sentences, self.encode_window):
+            embeddings = self.model.encode([sentence for sentence, _ in window])
+            if previous is not None:
+                similarity = self.model.similarity_pairwise(previous[2][None, :], embeddings[:1])[0].item()
+                yield previous[0], similarity, previous[1]
+            
+            # Consecutive pairs only: O(window) instead of the full similarity matrix
+            similarities = self.model.similarity_pairwise(embeddings[:-1], embeddings[1:]).tolist()
+            for (sentence, pages), similarity in zip(window, similarities):
+                yield sentence, similarity, pages
+            previous = (window[-1][0], window[-1][1], embeddings[-1])
         
-        return result
+        if previous is not None:
+            yield previous[0], None, previous[1]
+    
+    def _iter_overlap_chunks(self, pairs) -> Iterator[Tuple[str, PageRange]]:
+        """
+        Split sentences into semantic chunks with sentence-level overlap, yielding each
+        (chunk, pages) at its breakpoint. Yields nothing if there is no breakpoint (or a single sentence).
+        """
+        # Sentences (and their similarities to the next, and pages) from the current chunk start onward
+        sentences = []
+        similarities = []
+        pages = []
+        found_breakpoint = False
+        
+        for sentence, similarity, sentence_pages in pairs:
+            sentences.append(sentence)
+            pages.append(sentence_pages)
+            if similarity is None:  # Last sentence
+                break
+            similarities.append(similarity)
+            
+            # Breakpoint where similarity drops below threshold
+            if similarity < self.threshold:
+                found_breakpoint = True
+                yield ' '.join(sentences), _merge_pages(pages[0], pages[-1])
+                
+                # Smart overlap: go back while similarity is high
+                overlap_start = len(sentences) - 1
+                while overlap_start > 0 and similarities[overlap_start] > self.overlap_threshold:
+                    overlap_start -= 1
+                
+                del sentences[:overlap_start]
+                del similarities[:overlap_start]
+                del pages[:overlap_start]
+        
+        # Add final chunk
+        if found_breakpoint:
+            yield ' '.join(sentences), _merge_pages(pages[0], pages[-1])
+    
+    def _merge_tiny_chunks(self, chunks: Iterable[Tuple[str, PageRange]]) -> Iterator[Tuple[str, PageRange]]:
+        """
+        Merge chunks that are too small with their neighbors.
+        A tiny chunk is prepended to the next one; only a tiny final chunk is appended to
+        the previous one, so a single merged chunk is held back at a time.
+        """
+        held = None  # Last merged chunk, kept back in case a tiny final chunk joins it
+        current = None
+        
+        for chunk in chunks:
+            if current is not None:
+                # If current chunk is too small, merge with next chunk
+                if len(current[0].split()) < self.min_chunk_words:
+                    chunk = current[0] + " " + chunk[0], _merge_pages(current[1], chunk[1])
+                else:
+                    if held is not None:
+                        yield held
+                    held = current
+            current = chunk
+        
+        if current is None:
+            return
+        
+        # Final chunk: merge with previous chunk if too small
+        if len(current[0].split()) < self.min_chunk_words and held is not None:
+            held = held[0] + " " + current[0], _merge_pages(held[1], current[1])
+        else:
+            if held is not None:
+                yield held
+            held = current
+        yield held
+    
+    def _split_oversized_chunk(self, chunk: Tuple[str, PageRange]) -> Iterator[Tuple[str, PageRange]]:
+        """Split a chunk that is too large into smaller pieces (each keeps the chunk's pages)."""
+        chunk, pages = chunk
+        word_count = len(chunk.split())
+        
+        if word_count <= self.max_chunk_words:
+            yield chunk, pages
+            return
+        
+        # Split oversized chunk at sentence boundaries
+        sentences = re.split(r'(?<=[.!?])\s+', chunk)
+        current_chunk = []
+        current_words = 0
+        
+        for sentence in sentences:
+            sentence_words = len(sentence.split())
+            
+            if current_words + sentence_words > self.max_chunk_words and current_chunk:
+                # Save current chunk and start new one
+                yield ' '.join(current_chunk), pages
+                current_chunk = [sentence]
+                current_words = sentence_words
+            else:
+                current_chunk.append(sentence)
+                current_words += sentence_words
+        
+        # Add final chunk if any sentences remain
+        if current_chunk:
+            yield ' '.join(current_chunk), pages
+
+
+def _load_model(model_name: str):
+    """
+    Load a SentenceTransformer. Imported here rather than at module level, so processes that
+    only import this module (e.g. spawned extraction workers re-importing a processor's
+    main module) don't load torch.
+    """
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def _batched(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    """Group an iterable into lists of at most size items."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _merge_pages(first, second):
+    """Page range covering two (first_page, last_page) ranges (None when pages are unknown)."""
+    if first is None or second is None:
+        return first or second
+    return min(first[0], second[0]), max(first[1], second[1])
+
+
+class _PageText:
+    """Keeps the pages' text only until the first chunk exists (it is the no-breakpoint fallback)."""
+    
+    def __init__(self):
+        self.parts = []
+        self.span = None
+        self.keep = True
+    
+    def collect(self, pages: Iterable[Tuple[int, str]]) -> Iterator[Tuple[int, str]]:
+        for page_number, page_text in pages:
+            self.span = _merge_pages(self.span, (page_number, page_number))
+            if self.keep:
+                self.parts.append(page_text)
+            yield page_number, page_text
+    
+    def get(self) -> Tuple[str, PageRange]:
+        return ''.join(self.parts), self.span
+    
+    def release(self):
+        self.keep = False
+        self.parts = []
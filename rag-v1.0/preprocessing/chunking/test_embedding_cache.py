@@ -0,0 +1,85 @@
+"""
+Test the persistent sentence embedding cache
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from chunking.simple_semantic_chunker import SemanticChunker
+from chunking.embedding_cache import CachedEncoder
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class CountingEncoder:
+    """Model wrapper counting the sentences that reach it."""
+
+    def __init__(self, model):
+        self.model = model
+        self.model_name = MODEL_NAME
+        self.sentences = 0
+
+    def encode(self, sentences, **kwargs):
+        self.sentences += len(sentences)
+        return self.model.encode(sentences, **kwargs)
+
+
+def test_cached_embeddings():
+    """Cached vectors match the model; repeated and already cached sentences aren't re-embedded."""
+
+    print("Testing sentence embedding cache")
+    print("=" * 50)
+
+    model = SentenceTransformer(MODEL_NAME)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        sentences = ["Neural networks learn patterns.", "Solar power is cheap.", "Neural networks learn patterns.",
+                     "Stock prices fluctuated."]
+
+        counting = CountingEncoder(model)
+        encoder = CachedEncoder(counting, cache_dir=cache_dir)
+        embeddings = encoder.encode(sentences)
+        print(f"First run: {counting.sentences} sentences embedded for {len(sentences)} requested")
+
+        assert counting.sentences == 3  # The repeated sentence is embedded once
+        assert np.allclose(embeddings, model.encode(sentences), atol=1e-5)
+
+        # A new process (new cache object) finds them on disk and only embeds the new sentence
+        reopened = CachedEncoder(counting, cache_dir=cache_dir)
+        again = reopened.encode(sentences[::-1] + ["Deforestation threatens biodiversity."])
+        print(f"Reopened: {reopened.hits} hits, {reopened.misses} misses")
+
+        assert counting.sentences == 4 and reopened.hits == 4
+        assert np.array_equal(again[:4], embeddings[::-1])
+
+
+def test_rechunking_skips_the_model():
+    """Chunking again with other thresholds gives the same chunks without running the model."""
+
+    text = " ".join([
+        "Artificial intelligence is transforming modern technology. Machine learning algorithms process data.",
+        "Environmental conservation is crucial. Renewable energy sources offer sustainable alternatives.",
+        "Financial markets reflect economic uncertainty. Cryptocurrency values remain highly volatile."
+    ] * 3)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for threshold in (0.2, 0.4):
+            expected = SemanticChunker(model_name=MODEL_NAME, threshold=threshold, min_chunk_words=5).chunk(text)
+            chunker = SemanticChunker(model_name=MODEL_NAME, threshold=threshold, min_chunk_words=5,
+                                      embedding_cache=cache_dir)
+            chunks = chunker.chunk(text)
+            print(f"threshold={threshold}: {len(chunks)} chunks, {chunker.model.misses} sentences embedded")
+
+            assert chunks == expected
+            assert chunker.config() == SemanticChunker(model_name=MODEL_NAME, threshold=threshold,
+                                                       min_chunk_words=5).config()
+            if threshold == 0.4:
+                assert chunker.model.misses == 0 and chunker.model._encoder is None  # Model never loaded
+
+
+if __name__ == "__main__":
+    test_cached_embeddings()
+    test_rechunking_skips_the_model()
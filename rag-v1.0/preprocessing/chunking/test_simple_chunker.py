@@ -71,6 +71,80 @@ def test_with_single_topic():
         print(f"  Chunk {i + 1}: {len(chunk)} chars")
 
 
+def test_streaming_windows():
+    """Chunks don't depend on how many sentences are embedded at a time."""
+    
+    print("\n" + "=" * 50)
+    print("Testing Streaming Encode Windows")
+    print("=" * 50)
+    
+    text = """
+    Artificial intelligence is transforming modern technology. Machine learning algorithms can process vast datasets efficiently.
+    Environmental conservation is crucial for our planet's future. Deforestation threatens biodiversity worldwide.
+    Financial markets reflect economic uncertainty today. Stock prices fluctuated significantly during trading.
+    Cryptocurrency values remain highly volatile. Investors seek stable investment opportunities.
+    """
+    
+    whole = SemanticChunker(threshold=0.2, min_chunk_words=5, max_chunk_words=20)
+    windowed = SemanticChunker(threshold=0.2, min_chunk_words=5, max_chunk_words=20, encode_window=2)
+    windowed.model = whole.model
+    
+    chunks = whole.chunk(text)
+    streamed = list(windowed.iter_chunks(text))
+    print(f"  {len(chunks)} chunks in one window, {len(streamed)} streamed in windows of 2")
+    assert streamed == chunks
+    
+    # Fallbacks return the text untouched
+    assert whole.chunk("One sentence only") == ["One sentence only"]
+
+
+def test_chunk_many():
+    """Pooling sentences across documents gives the same chunks as one document at a time."""
+    
+    print("\n" + "=" * 50)
+    print("Testing Cross-Document Batching")
+    print("=" * 50)
+    
+    texts = [
+        "Neural networks learn complex patterns. Deep learning needs data. Stock prices fell today. Markets were volatile.",
+        "Single sentence document",
+        "Solar power is growing. Wind farms expand. Cryptocurrency values remain volatile. Investors seek stability."
+    ]
+    
+    chunker = SemanticChunker(threshold=0.2, min_chunk_words=5, pool_sentences=6)
+    batched = chunker.chunk_many(texts)
+    print(f"  Chunks per document: {[len(chunks) for chunks in batched]}")
+    assert batched == [chunker.chunk(text) for text in texts]
+
+
+def test_page_chunks():
+    """Chunking pages as they arrive gives the chunks of the joined text, plus page ranges."""
+    
+    print("\n" + "=" * 50)
+    print("Testing Page-Streamed Chunks")
+    print("=" * 50)
+    
+    # The second sentence runs over the page break
+    pages = [
+        (1, "Neural networks learn complex patterns. Deep learning needs "),
+        (2, "lots of data. Stock prices fell today. Markets were volatile. "),
+        (3, "Solar power is growing. Wind farms expand.")
+    ]
+    
+    chunker = SemanticChunker(threshold=0.2, min_chunk_words=5, encode_window=2)
+    streamed = list(chunker.iter_page_chunks(iter(pages)))
+    for chunk, (first, last) in streamed:
+        print(f"  Pages {first}-{last}: {chunk[:50]}...")
+    
+    assert [chunk for chunk, _ in streamed] == chunker.chunk(''.join(text for _, text in pages))
+    assert chunker.chunk_many_pages([pages]) == [streamed]
+    assert streamed[0][1][0] == 1 and streamed[-1][1][1] == 3
+    assert list(chunker._iter_page_sentences(pages))[1] == ("Deep learning needs lots of data", (1, 2))
+
+
 if __name__ == "__main__":
     test_simple_chunker()
     test_with_single_topic()
+    test_streaming_windows()
+    test_chunk_many()
+    test_page_chunks()
@@ -0,0 +1,154 @@
+"""
+Shared Embedding Service
+One (or a few) processes hold the sentence embedding model and serve encode requests over
+queues, so parallel preprocessing doesn't load a model copy per extraction worker.
+"""
+
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from typing import List
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+ENCODE_BATCH_SIZE = 128
+
+
+def _embedding_worker(model_name, requests, results, torch_threads):
+    """Worker process: load the model once, then encode requests until a None sentinel."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if torch_threads:
+        torch.set_num_threads(torch_threads)
+    model = SentenceTransformer(model_name)
+
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+
+        request_id, sentences, batch_size = request
+        try:
+            results.put((request_id, model.encode(sentences, batch_size=batch_size), None))
+        except Exception as e:
+            results.put((request_id, None, f"{type(e).__name__}: {e}"))
+
+
+class EmbeddingService:
+    """
+    Pool of embedding processes with the encode()/similarity_pairwise() interface of a
+    SentenceTransformer, so it can be passed to SemanticChunker(encoder=...).
+    Thread-safe: concurrent encode() calls are spread over the workers.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, num_workers: int = 1, torch_threads: int = None):
+        """
+        Start the embedding processes.
+
+        Args:
+            model_name (str): SentenceTransformer model to load in each worker
+            num_workers (int): Embedding processes (each holds one model copy)
+            torch_threads (int): Threads per worker (defaults to the cores split across workers)
+        """
+        self.model_name = model_name
+        self.num_workers = num_workers
+        torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // num_workers)
+
+        # spawn: workers must not inherit a forked copy of torch/tokenizer thread state
+        context = multiprocessing.get_context("spawn")
+        self._requests = context.Queue()
+        self._results = context.Queue()
+        self._pending = {}  # request ID -> Future
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False  # No new requests (closing, or a worker died)
+        self._stopped = False
+
+        self._workers = [
+            context.Process(target=_embedding_worker, name=f"embedding-{i}", daemon=True,
+                            args=(model_name, self._requests, self._results, torch_threads))
+            for i in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+        self._collector = threading.Thread(target=self._collect, name="embedding-results", daemon=True)
+        self._collector.start()
+
+    def submit(self, sentences: List[str], batch_size: int = ENCODE_BATCH_SIZE) -> Future:
+        """
+        Queue sentences for embedding.
+
+        Returns:
+            Future: Resolves to the embeddings (numpy array, one row per sentence)
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("EmbeddingService is closed")
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+        self._requests.put((request_id, list(sentences), batch_size))
+        return future
+
+    def encode(self, sentences: List[str], batch_size: int = ENCODE_BATCH_SIZE, **kwargs):
+        """Embed sentences and wait for the result (SentenceTransformer.encode-compatible)."""
+        return self.submit(sentences, batch_size).result()
+
+    def similarity_pairwise(self, embeddings1, embeddings2):
+        """Cosine similarity of row i of embeddings1 with row i of embeddings2."""
+        from sentence_transformers.util import pairwise_cos_sim
+        return pairwise_cos_sim(embeddings1, embeddings2)
+
+    def _collect(self):
+        """Resolve futures as workers return results; fail them all if a worker dies."""
+        while True:
+            try:
+                request_id, embeddings, error = self._results.get(timeout=1.0)
+            except queue.Empty:
+                with self._lock:
+                    if self._closed and not self._pending:
+                        return
+                dead = [w.name for w in self._workers if not w.is_alive()]
+                if dead and self._pending:
+                    self._fail_pending(RuntimeError(f"Embedding worker(s) exited: {', '.join(dead)}"))
+                    return
+                continue
+
+            with self._lock:
+                future = self._pending.pop(request_id, None)
+            if future is None:
+                continue
+            if error:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(embeddings)
+
+    def _fail_pending(self, error):
+        with self._lock:
+            self._closed = True
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(error)
+
+    def close(self):
+        """Stop the workers after the queued requests."""
+        with self._lock:
+            if self._stopped:
+                return
+            self._closed = self._stopped = True
+        for worker in self._workers:
+            if worker.is_alive():
+                self._requests.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._collector.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,193 @@
+"""
+Ingest Manifest
+Records each source document's content hash, the extractor/chunker settings and the chunk IDs
+it produced, so re-runs only process new or changed documents and report what changed.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List
+
+MANIFEST_FILE = "ingest_manifest.json"
+CHANGE_SET_FILE = "ingest_changes.json"
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path: str, block_size: int = 1024 * 1024) -> str:
+    """Content hash of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_ids(filename: str, chunk_count: int) -> List[str]:
+    """Chunk IDs the search indexes assign to a document's chunks."""
+    return [f"{filename}_chunk_{i}" for i in range(1, chunk_count + 1)]
+
+
+def extractor_version(name: str) -> str:
+    """Extractor name with its library version, e.g. 'pymupdf4llm 0.0.17'."""
+    module = {"pymupdf4llm": "pymupdf4llm", "pymupdf_epub": "pymupdf"}.get(name, name)
+    try:
+        return f"{name} {__import__(module).__version__}"
+    except (ImportError, AttributeError):
+        return name
+
+
+class IngestPlan:
+    """Result of comparing the source files with the manifest."""
+
+    def __init__(self):
+        self.to_process = {}  # filename -> (path, sha256) for new or changed documents
+        self.unchanged = []  # filenames
+        self.deleted = []  # filenames whose source file is gone
+
+    def __repr__(self):
+        return (f"IngestPlan(process={len(self.to_process)}, unchanged={len(self.unchanged)}, "
+                f"deleted={len(self.deleted)})")
+
+
+class IngestManifest:
+    """
+    Per-output-directory record of ingested documents (thread-safe).
+
+    Each entry: source path, size/mtime (to skip re-hashing untouched files), sha256,
+    extractor, chunker config, output file and chunk IDs.
+    """
+
+    def __init__(self, output_path: str):
+        """
+        Load the manifest of an output directory (empty if there is none yet).
+
+        Args:
+            output_path (str): Directory holding the *_chunks.json files
+        """
+        self.output_path = output_path
+        self.path = os.path.join(output_path, MANIFEST_FILE)
+        self.documents = {}
+        self._changes = []
+        self._lock = threading.Lock()
+
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.documents = data["documents"]
+
+    def plan(self, sources: Dict[str, str], extractor: str, chunker_config: dict,
+             source_dirs: List[str] = (), reprocess_all: bool = False) -> IngestPlan:
+        """
+        Decide which documents need (re)processing.
+
+        Args:
+            sources (dict): filename -> path of the documents in this run
+            extractor (str): Extractor identity (see extractor_version())
+            chunker_config (dict): SemanticChunker.config()
+            source_dirs (list): Input directories scanned; recorded documents from these
+                directories whose file no longer exists are reported as deleted
+            reprocess_all (bool): Process every document (a full run); recorded ones are then
+                re-recorded as changed, so their old chunk IDs are reported as removed
+
+        Returns:
+            IngestPlan: New/changed, unchanged and deleted documents
+        """
+        plan = IngestPlan()
+
+        for filename, path in sources.items():
+            entry = self.documents.get(filename)
+            stat = os.stat(path)
+
+            # Same size and mtime: trust the recorded hash instead of reading the file again
+            if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                sha256 = entry["sha256"]
+            else:
+                sha256 = file_sha256(path)
+
+            if (not reprocess_all and entry and entry["sha256"] == sha256 and entry["extractor"] == extractor
+                    and entry["chunker"] == chunker_config
+                    and os.path.exists(os.path.join(self.output_path, entry["output_file"]))):
+                plan.unchanged.append(filename)
+            else:
+                plan.to_process[filename] = (path, sha256)
+
+        scanned = {os.path.abspath(d) for d in source_dirs}
+        for filename, entry in self.documents.items():
+            if (filename not in sources and os.path.dirname(entry["source_path"]) in scanned
+                    and not os.path.exists(entry["source_path"])):
+                plan.deleted.append(filename)
+
+        return plan
+
+    def record(self, filename: str, path: str, sha256: str, extractor: str, chunker_config: dict,
+               output_file: str, chunk_count: int):
+        """Record a (re)processed document and note the change."""
+        stat = os.stat(path)
+        entry = {
+            "source_path": os.path.abspath(path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+            "extractor": extractor,
+            "chunker": chunker_config,
+            "output_file": os.path.basename(output_file),
+            "chunk_ids": chunk_ids(filename, chunk_count),
+            "processed_at": time.time()
+        }
+
+        with self._lock:
+            previous = self.documents.get(filename)
+            self.documents[filename] = entry
+            self._changes.append({
+                "filename": filename,
+                "status": "changed" if previous else "added",
+                "removed_chunk_ids": previous["chunk_ids"] if previous else [],
+                "added_chunk_ids": entry["chunk_ids"]
+            })
+
+    def remove(self, filename: str):
+        """Forget a deleted document and delete its chunks file."""
+        with self._lock:
+            entry = self.documents.pop(filename, None)
+            if entry is None:
+                return
+            self._changes.append({
+                "filename": filename,
+                "status": "deleted",
+                "removed_chunk_ids": entry["chunk_ids"],
+                "added_chunk_ids": []
+            })
+
+        output_file = os.path.join(self.output_path, entry["output_file"])
+        if os.path.exists(output_file):
+            os.remove(output_file)
+
+    def save(self) -> dict:
+        """
+        Write the manifest and this run's change set (both replaced atomically).
+
+        Returns:
+            dict: The change set: per-document changes plus flat lists of chunk IDs to
+                  delete and to add, for index builders that update incrementally
+        """
+        with self._lock:
+            changes = list(self._changes)
+            manifest = {"version": MANIFEST_VERSION, "documents": self.documents}
+            change_set = {
+                "created_at": time.time(),
+                "documents": changes,
+                "delete_chunk_ids": [i for change in changes for i in change["removed_chunk_ids"]],
+                "add_chunk_ids": [i for change in changes for i in change["added_chunk_ids"]]
+            }
+
+            for path, data in ((self.path, manifest), (os.path.join(self.output_path, CHANGE_SET_FILE), change_set)):
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=2)
+                os.replace(tmp_path, path)
+
+        return change_set
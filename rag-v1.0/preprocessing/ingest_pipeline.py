@@ -0,0 +1,379 @@
+"""
+Streaming Ingest Pipeline
+Discover -> extract -> embed -> chunk -> write stages connected by bounded queues, with the
+extracted text held between extraction and writing capped by a budget, so ingesting the whole
+data/ tree needs memory for the budget rather than for every document.
+
+Ingest every PDF and EPUB under data/ into processed_chunks:
+    python ingest_pipeline.py
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from normalization.pdf_loader import iter_pages
+from normalization.epub_loader import render_pages
+from chunking.simple_semantic_chunker import SemanticChunker
+from chunking.embedding_cache import DEFAULT_CACHE_DIR
+from embedding_service import DEFAULT_MODEL, EmbeddingService
+from batch_pdf_processor import DOCS_PER_BATCH, output_filename, save_chunks
+from ingest_manifest import IngestManifest, extractor_version
+from parallel_processor import MAX_ATTEMPTS, MAX_TEXT_IN_FLIGHT, IngestProgress, TextBudget
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "hybrid_search"))
+from chunk_corpus import build_corpus, open_corpus
+
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+DEFAULT_OUTPUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "processed_chunks")
+
+# Supported formats and their extractors (as recorded in the ingest manifest)
+EXTRACTORS = {".pdf": "pymupdf4llm", ".epub": "pymupdf_epub"}
+
+# Documents waiting between two stages (bounds documents, not their size)
+QUEUE_SIZE = 8
+
+_DONE = object()  # End-of-stream marker passed down the stages
+
+
+class Stage:
+    """
+    Worker threads taking items from a bounded inbox and putting fn's outputs into the next
+    stage's inbox. With batch_size > 1, fn gets a list of up to batch_size items that were
+    already waiting (it never waits to fill a batch).
+    """
+
+    def __init__(self, name, fn, workers=1, batch_size=1, queue_size=QUEUE_SIZE):
+        """
+        Args:
+            name (str): Stage name (thread names, error messages)
+            fn (callable): Item (or list of items) -> list of outputs
+            workers (int): Threads running fn
+            batch_size (int): Items per call to fn
+            queue_size (int): Inbox capacity; producers block when it is full
+        """
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.batch_size = batch_size
+        self.inbox = queue.Queue(maxsize=queue_size)
+        self._outbox = None
+        self._running = workers
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self, outbox=None):
+        """Start the workers, sending outputs to outbox (the next stage's inbox)."""
+        self._outbox = outbox
+        self._threads = [threading.Thread(target=self._work, name=f"{self.name}-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _work(self):
+        finished = False
+        while not finished:
+            item = self.inbox.get()
+            if item is _DONE:
+                break
+
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.inbox.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    finished = True
+                    break
+                batch.append(item)
+
+            try:
+                outputs = list(self.fn(batch if self.batch_size > 1 else batch[0]))
+            except Exception as e:
+                # A worker that died here would never pass the end marker on
+                print(f"❌ {self.name} stage dropped {len(batch)} item(s): {e}")
+                outputs = []
+
+            for output in outputs:
+                if self._outbox is not None:
+                    self._outbox.put(output)
+
+        # The marker is the last item, so the inbox is empty: hand it on to sibling workers
+        self.inbox.put(_DONE)
+        with self._lock:
+            self._running -= 1
+            last = self._running == 0
+        if last and self._outbox is not None:
+            self._outbox.put(_DONE)
+
+
+def run_stages(stages, items):
+    """Connect the stages, feed items into the first one (blocking while it is full) and wait."""
+    for stage, next_stage in zip(stages, stages[1:] + [None]):
+        stage.start(next_stage.inbox if next_stage else None)
+
+    for item in items:
+        stages[0].inbox.put(item)
+    stages[0].inbox.put(_DONE)
+
+    for stage in stages:
+        stage.join()
+
+
+def discover(source_paths):
+    """
+    Supported documents under the source directories (recursively).
+
+    Returns:
+        dict: extension -> {filename: path}; filenames are unique across the tree
+    """
+    sources = {extension: {} for extension in EXTRACTORS}
+    seen = {}
+    for source_path in source_paths:
+        for dirpath, _, filenames in os.walk(source_path):
+            for filename in sorted(filenames):
+                extension = os.path.splitext(filename)[1].lower()
+                if extension not in EXTRACTORS:
+                    continue
+                path = os.path.join(dirpath, filename)
+                if filename in seen:
+                    # Outputs and chunk IDs are keyed by file name
+                    print(f"⚠️ Skipping {path}: same name as {seen[filename]}")
+                    continue
+                seen[filename] = path
+                sources[extension][filename] = path
+    return sources
+
+
+def estimated_text(path, extension):
+    """
+    Characters a document's extraction is budgeted for before it runs: the file size for a PDF
+    and the uncompressed size for an EPUB (a zip of markup), both usually more than the text.
+    """
+    if extension == ".epub":
+        try:
+            with zipfile.ZipFile(path) as epub:
+                return sum(info.file_size for info in epub.infolist())
+        except (OSError, zipfile.BadZipFile):
+            pass  # Extraction reports the error
+    return os.path.getsize(path)
+
+
+def run_pipeline(source_paths=None, output_path=None, extract_workers=None, embed_workers=1,
+                 chunk_workers=1, incremental=True, queue_size=QUEUE_SIZE, embedding_cache=DEFAULT_CACHE_DIR,
+                 max_text_in_flight=MAX_TEXT_IN_FLIGHT):
+    """
+    Ingest every PDF and EPUB under source_paths through the staged pipeline.
+
+    Args:
+        source_paths (list): Directories to scan (defaults to data/)
+        output_path (str): Directory for the *_chunks.json files
+        extract_workers (int): Extraction processes (defaults to the CPU count); large PDFs
+            are split into page blocks across them
+        embed_workers (int): Embedding processes (one model copy each)
+        chunk_workers (int): Threads turning sentence similarities into chunks
+        incremental (bool): Only process documents that are new or changed since the ingest manifest
+        queue_size (int): Capacity of each queue between stages
+        max_text_in_flight (int): Characters of extracted text held until written; each document
+            is budgeted for its estimated size before it is extracted
+        embedding_cache (str): Directory of cached sentence embeddings, reused by later runs
+            (None to always run the model)
+
+    Returns:
+        dict: Per-document chunk counts, failed files ({filename: error}) and the change set
+    """
+    source_paths = source_paths or [DEFAULT_DATA_PATH]
+    output_path = output_path or DEFAULT_OUTPUT_PATH
+    extract_workers = extract_workers or os.cpu_count() or 1
+    os.makedirs(output_path, exist_ok=True)
+
+    # Discover: plan against the manifest, drop outputs of deleted documents
+    manifest = IngestManifest(output_path)
+    chunker_config = SemanticChunker(model_name=DEFAULT_MODEL).config()  # Model not loaded
+    extractors = {extension: extractor_version(name) for extension, name in EXTRACTORS.items()}
+    scanned = [dirpath for source_path in source_paths for dirpath, _, _ in os.walk(source_path)]
+
+    documents = []
+    for extension, sources in discover(source_paths).items():
+        plan = manifest.plan(sources, extractors[extension], chunker_config, source_dirs=scanned,
+                             reprocess_all=not incremental)
+        print(f"📋 {extension}: {len(plan.to_process)} new or changed, {len(plan.unchanged)} unchanged, "
+              f"{len(plan.deleted)} deleted")
+        for filename in plan.deleted:
+            manifest.remove(filename)
+        for filename, (path, sha256) in plan.to_process.items():
+            documents.append({"filename": filename, "path": path, "sha256": sha256, "extension": extension,
+                              "size": os.path.getsize(path)})
+
+    # Largest first, so a big document never starts last and stalls the end of the run
+    documents.sort(key=lambda document: document["size"], reverse=True)
+    print(f"🚀 Ingesting {len(documents)} documents: {extract_workers} extraction, {embed_workers} embedding "
+          f"and {chunk_workers} chunking workers, queues of {queue_size}, "
+          f"{max_text_in_flight / 1e6:.1f}M characters of text in flight")
+
+    progress = IngestProgress(len(documents), sum(document["size"] for document in documents))
+    results = []
+    context = multiprocessing.get_context("spawn")  # The embedding service's threads already run here
+    pool = {"executor": None}  # Started with the stages; replaced if a worker crashes
+    pool_lock = threading.Lock()
+    budget = TextBudget(max_text_in_flight)
+
+    def drop(document):
+        """Give back the budget of a document that was written or failed."""
+        budget.release(document.pop("budget", 0))
+
+    def executor_for_retry(broken):
+        """Replace a crashed process pool once, however many threads saw it break."""
+        with pool_lock:
+            if pool["executor"] is broken:
+                broken.shutdown(wait=False, cancel_futures=True)
+                pool["executor"] = ProcessPoolExecutor(max_workers=extract_workers, mp_context=context)
+
+    def extract(document):
+        # Waits while the later stages hold too much text, before the document's own text is in memory
+        document["budget"] = budget.acquire(estimated_text(document["path"], document["extension"]))
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            executor = pool["executor"]
+            try:
+                if document["extension"] == ".pdf":
+                    pages = list(iter_pages(document["path"], executor))
+                else:
+                    pages = executor.submit(render_pages, document["path"]).result()
+                break
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    executor_for_retry(executor)
+                if attempt == MAX_ATTEMPTS:
+                    progress.file_failed(document["filename"], document["size"], e)
+                    drop(document)
+                    return []
+                print(f"🔁 Retrying {document['filename']} (attempt {attempt} failed: {e})")
+
+        if not any(text.strip() for _, text in pages):
+            progress.file_failed(document["filename"], document["size"], "no text extracted")
+            drop(document)
+            return []
+        # Hand back what the estimate overshot
+        document["budget"] = budget.resize(document["budget"], sum(len(text) for _, text in pages))
+        document["pages"] = pages
+        return [document]
+
+    def embed(batch):
+        """Sentence embeddings for the documents already waiting, pooled into one encode call."""
+        try:
+            scored = chunker.score_many_pages([document["pages"] for document in batch])
+        except Exception as e:
+            print(f"⚠️ Embedding a batch of {len(batch)} failed ({e}), retrying per file")
+            scored = []
+            for document in batch:
+                for attempt in range(1, MAX_ATTEMPTS + 1):
+                    try:
+                        scored.append(chunker.score_many_pages([document["pages"]])[0])
+                        break
+                    except Exception as file_error:
+                        if attempt == MAX_ATTEMPTS:
+                            progress.file_failed(document["filename"], document["size"], f"embedding: {file_error}")
+                            scored.append(None)
+
+        embedded = []
+        for document, document_scored in zip(batch, scored):
+            del document["pages"]
+            if document_scored is not None:
+                document["scored"] = document_scored
+                embedded.append(document)
+            else:
+                drop(document)
+        return embedded
+
+    def chunk(document):
+        scored = document.pop("scored")
+        document["text_length"] = len(scored[0])
+        try:
+            document["chunks"] = chunker.chunks_from_scored(scored)
+        except Exception as e:
+            progress.file_failed(document["filename"], document["size"], f"chunking: {e}")
+            drop(document)
+            return []
+        return [document]
+
+    def write(document):
+        chunks = document.pop("chunks")
+        try:
+            saved = save_chunks(output_path, document["filename"], document["text_length"],
+                                [text for text, _ in chunks], [pages for _, pages in chunks])
+        except Exception as e:
+            progress.file_failed(document["filename"], document["size"], f"writing: {e}")
+            return []
+        finally:
+            drop(document)
+        manifest.record(document["filename"], document["path"], document["sha256"], extractors[document["extension"]],
+                        chunker_config, output_filename(document["filename"]), len(chunks))
+        results.append({"filename": document["filename"], "chunk_count": saved["chunk_count"]})
+        progress.file_done(document["size"])
+        return []
+
+    if documents:
+        pool["executor"] = ProcessPoolExecutor(max_workers=extract_workers, mp_context=context)
+        try:
+            with EmbeddingService(DEFAULT_MODEL, num_workers=embed_workers) as service:
+                chunker = SemanticChunker(encoder=service, embedding_cache=embedding_cache)
+                run_stages([
+                    Stage("extract", extract, workers=extract_workers, queue_size=queue_size),
+                    Stage("embed", embed, workers=embed_workers, batch_size=DOCS_PER_BATCH, queue_size=queue_size),
+                    Stage("chunk", chunk, workers=chunk_workers, queue_size=queue_size),
+                    Stage("write", write, queue_size=queue_size)
+                ], documents)
+        finally:
+            pool["executor"].shutdown(cancel_futures=True)
+        if embedding_cache:
+            print(f"💾 Embedding cache: {chunker.model.hits} sentences cached, {chunker.model.misses} embedded "
+                  f"({len(chunker.model.cache)} in {chunker.model.cache.path})")
+
+    change_set = manifest.save()
+
+    # Pack the chunks for the retrievers (they read the JSON files while no current corpus exists)
+    if open_corpus(output_path) is None:
+        build_corpus(output_path)
+
+    progress.report(force=True)
+    print(f"\n🎉 Ingest complete!")
+    print(f"Documents processed: {len(results)} ({len(progress.failed)} failures)")
+    print(f"Total chunks: {sum(r['chunk_count'] for r in results)}")
+    print(f"Peak text in flight: {budget.peak / 1e6:.1f}M characters")
+    print(f"Chunk IDs to delete/add: {len(change_set['delete_chunk_ids'])}/{len(change_set['add_chunk_ids'])}")
+    print(f"Output directory: {output_path}")
+    for filename, error in progress.failed.items():
+        print(f"  ✗ {filename}: {error}")
+    return {"results": results, "failed": progress.failed, "changes": change_set}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming ingest of every PDF and EPUB under the data directory")
+    parser.add_argument("sources", nargs="*", default=[DEFAULT_DATA_PATH], help="Directories to scan")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_PATH, help="Directory for the *_chunks.json files")
+    parser.add_argument("--extract-workers", type=int, default=os.cpu_count() or 1, help="Extraction processes")
+    parser.add_argument("--embed-workers", type=int, default=1, help="Embedding model processes")
+    parser.add_argument("--chunk-workers", type=int, default=1, help="Chunking threads")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="Documents buffered between stages")
+    parser.add_argument("--max-text-mb", type=float, default=MAX_TEXT_IN_FLIGHT / 1e6,
+                        help="Millions of characters of extracted text held until written")
+    parser.add_argument("--full", action="store_true", help="Reprocess every document, ignoring the ingest manifest")
+    parser.add_argument("--embedding-cache", default=DEFAULT_CACHE_DIR, help="Sentence embedding cache directory")
+    parser.add_argument("--no-embedding-cache", action="store_true", help="Embed every sentence with the model")
+    args = parser.parse_args()
+
+    run_pipeline(args.sources, args.output, extract_workers=args.extract_workers, embed_workers=args.embed_workers,
+                 chunk_workers=args.chunk_workers, incremental=not args.full, queue_size=args.queue_size,
+                 embedding_cache=None if args.no_embedding_cache else args.embedding_cache,
+                 max_text_in_flight=int(args.max_text_mb * 1e6))
@@ -1,6 +1,33 @@
 import fitz  # PyMuPDF
 import os
-from typing import List, Dict
+from typing import Dict, Iterator, List, Tuple
+
+
+def iter_epub_pages(epub_path: str, doc=None) -> Iterator[Tuple[int, str]]:
+    """
+    Stream an EPUB's pages in order, one page in memory at a time.
+    
+    Pages are rendered in this process: an EPUB is laid out as a whole when it is opened, so
+    splitting a book across processes would lay it out again in every one of them.
+    
+    Args:
+        epub_path (str): Full path to the EPUB file
+        doc: The book already opened with fitz, so it isn't laid out again (closed by the stream)
+        
+    Yields:
+        Tuple[int, str]: (page_number, text), page numbers 1-based
+    """
+    if doc is None:
+        doc = fitz.open(epub_path)
+    
+    with doc:
+        for page_num in range(doc.page_count):
+            yield page_num + 1, doc.load_page(page_num).get_text() + "\n\n"
+
+
+def render_pages(epub_path: str) -> List[Tuple[int, str]]:
+    """All pages of an EPUB as (page_number, text), e.g. as one task for a process pool."""
+    return list(iter_epub_pages(epub_path))
 
 
 class PyMuPDFEpubPreprocessor:
@@ -17,12 +44,13 @@ class PyMuPDFEpubPreprocessor:
         """
         self.data_directory = data_directory
     
-    def process_epubs(self, limit: int = None) -> List[Dict]:
+    def process_epubs(self, limit: int = None, filenames: List[str] = None) -> List[Dict]:
         """
         Process EPUB files and extract clean text.
         
         Args:
             limit (int, optional): Maximum number of files to process
+            filenames (List[str], optional): Only these files (e.g. the changed ones)
             
         Returns:
             List[Dict]: List of documents with text and metadata
@@ -30,42 +58,66 @@ class PyMuPDFEpubPreprocessor:
         # Get EPUB files
         epub_files = [f for f in os.listdir(self.data_directory) if f.endswith('.epub')]
         
+        if filenames is not None:
+            wanted = set(filenames)
+            epub_files = [f for f in epub_files if f in wanted]
+        
         if limit:
             epub_files = epub_files[:limit]
         
         documents = []
         
-        for filename in epub_files:
+        for document in self.iter_epubs(epub_files):
+            filename = document['metadata']['file_name']
+            try:
+                # Materialized here; stream document['pages'] from iter_epubs() to avoid holding the text
+                full_text = ''.join(text for _, text in document['pages']).strip()
+            except Exception as e:
+                print(f"✗ Error processing {filename}: {e}")
+                continue
+            
+            document['text'] = full_text
+            document['metadata']['text_length'] = len(full_text)
+            del document['pages']
+            
+            documents.append(document)
+            print(f"✓ Processed {filename}: {len(full_text)} characters")
+        
+        return documents
+    
+    def iter_epubs(self, filenames: List[str] = None) -> Iterator[Dict]:
+        """
+        Yield one document per EPUB without reading any text yet.
+        
+        Each document has 'pages', an iterator of (page_number, text) rendered on demand (see
+        iter_epub_pages), so a consumer holds one book's current pages instead of all books.
+        Unreadable files are reported and skipped.
+        
+        Args:
+            filenames (List[str], optional): EPUB files in data_directory (default: all of them)
+            
+        Yields:
+            Dict: Document with 'pages' and 'metadata'
+        """
+        if filenames is None:
+            filenames = [f for f in os.listdir(self.data_directory) if f.endswith('.epub')]
+        
+        for filename in filenames:
             epub_path = os.path.join(self.data_directory, filename)
             
             try:
-                # Open EPUB with PyMuPDF
+                # Opening lays the book out; failures surface here instead of mid-stream
                 doc = fitz.open(epub_path)
-                
-                # Extract text from all pages
-                full_text = ""
-                for page_num in range(len(doc)):
-                    page = doc.load_page(page_num)
-                    text = page.get_text()
-                    full_text += text + "\n\n"
-                
-                doc.close()
-                
-                # Create document with metadata
-                document = {
-                    'text': full_text.strip(),
-                    'metadata': {
-                        'file_name': filename,
-                        'file_path': epub_path,
-                        'text_length': len(full_text),
-                        'processor': 'pymupdf_epub'
-                    }
-                }
-                
-                documents.append(document)
-                print(f"✓ Processed {filename}: {len(full_text)} characters")
-                
             except Exception as e:
                 print(f"✗ Error processing {filename}: {e}")
-        
-        return documents
+                continue
+            
+            yield {
+                'pages': iter_epub_pages(epub_path, doc=doc),
+                'metadata': {
+                    'file_name': filename,
+                    'file_path': epub_path,
+                    'page_count': doc.page_count,
+                    'processor': 'pymupdf_epub'
+                }
+            }
@@ -1,6 +1,84 @@
 import pymupdf4llm
+import fitz  # PyMuPDF
 import os
-from typing import List, Dict
+from collections import deque
+from typing import Dict, Iterator, List, Tuple
+
+# Pages extracted per task when a PDF is split across processes
+PAGES_PER_BLOCK = 16
+
+
+def extract_markdown(pdf_path: str) -> str:
+    """
+    Extract one PDF as markdown, raising on failure.
+    Importable without the chunker, so extraction worker processes start light.
+    
+    Args:
+        pdf_path (str): Full path to the PDF file
+        
+    Returns:
+        str: Markdown text
+    """
+    return pymupdf4llm.to_markdown(pdf_path)
+
+
+def page_count(pdf_path: str) -> int:
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def extract_page_block(pdf_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """
+    Extract pages start..end-1 (0-based) as markdown, raising on failure.
+    
+    Returns:
+        List[Tuple[int, str]]: (page_number, markdown) per page, page numbers 1-based
+    """
+    pages = pymupdf4llm.to_markdown(pdf_path, pages=list(range(start, end)), page_chunks=True)
+    return [(page['metadata']['page_number'], page['text']) for page in pages]
+
+
+def extract_pages(pdf_path: str) -> List[Tuple[int, str]]:
+    """Extract a whole PDF as (page_number, markdown) pages."""
+    return extract_page_block(pdf_path, 0, page_count(pdf_path))
+
+
+def iter_pages(pdf_path: str, executor=None, pages_per_block: int = PAGES_PER_BLOCK,
+               blocks_in_flight: int = None) -> Iterator[Tuple[int, str]]:
+    """
+    Stream a PDF's pages in page order, extracting blocks of pages in parallel.
+    
+    Blocks are submitted to the executor ahead of the consumer, at most blocks_in_flight at
+    a time, so a long PDF uses every worker while memory stays bounded by the block size.
+    
+    Args:
+        pdf_path (str): Full path to the PDF file
+        executor: Process pool for the blocks, even a single one (None extracts block by block in this process)
+        pages_per_block (int): Pages per extraction task
+        blocks_in_flight (int): Blocks extracted ahead (defaults to the CPU count + 1)
+        
+    Yields:
+        Tuple[int, str]: (page_number, markdown), page numbers 1-based
+    """
+    count = page_count(pdf_path)
+    blocks = deque((start, min(start + pages_per_block, count)) for start in range(0, count, pages_per_block))
+    
+    if executor is None:
+        for start, end in blocks:
+            yield from extract_page_block(pdf_path, start, end)
+        return
+    
+    blocks_in_flight = blocks_in_flight or (os.cpu_count() or 1) + 1
+    running = deque()
+    try:
+        while blocks or running:
+            while blocks and len(running) < blocks_in_flight:
+                running.append(executor.submit(extract_page_block, pdf_path, *blocks.popleft()))
+            # Results are taken in submission order, i.e. page order
+            yield from running.popleft().result()
+    finally:
+        for future in running:
+            future.cancel()
 
 
 class PyMuPDFPreprocessor:
@@ -17,12 +95,13 @@ class PyMuPDFPreprocessor:
         """
         self.data_directory = data_directory
     
-    def process_pdfs(self, limit: int = None) -> List[Dict]:
+    def process_pdfs(self, limit: int = None, filenames: List[str] = None) -> List[Dict]:
         """
         Process PDF files and extract clean markdown text.
         
         Args:
             limit (int, optional): Maximum number of files to process
+            filenames (List[str], optional): Only these files (e.g. the changed ones)
             
         Returns:
             List[Dict]: List of documents with text and metadata
@@ -30,6 +109,10 @@ class PyMuPDFPreprocessor:
         # Get PDF files
         pdf_files = [f for f in os.listdir(self.data_directory) if f.endswith('.pdf')]
         
+        if filenames is not None:
+            wanted = set(filenames)
+            pdf_files = [f for f in pdf_files if f in wanted]
+        
         if limit:
             pdf_files = pdf_files[:limit]
         
@@ -73,7 +156,7 @@ class PyMuPDFPreprocessor:
         """
         try:
             # Extract markdown text
-            markdown_text = pymupdf4llm.to_markdown(pdf_path)
+            markdown_text = extract_markdown(pdf_path)
             
             # Create document with metadata
             document = {
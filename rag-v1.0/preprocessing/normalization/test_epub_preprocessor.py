@@ -1,17 +1,80 @@
+import os
+import tempfile
+import zipfile
+
+import fitz  # PyMuPDF
+
 from epub_loader import PyMuPDFEpubPreprocessor
 
+
+def write_epub(path, chapters=4, paragraphs=80):
+    """Write a small EPUB whose chapters lay out over several pages."""
+    words = "the quick brown fox jumps over the lazy dog near a river".split()
+    container = ('<?xml version="1.0"?><container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+                 '<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles></container>')
+    items = ''.join(f'<item id="c{i}" href="c{i}.xhtml" media-type="application/xhtml+xml"/>' for i in range(chapters))
+    spine = ''.join(f'<itemref idref="c{i}"/>' for i in range(chapters))
+    package = ('<?xml version="1.0"?><package xmlns="http://www.idpf.org/2007/opf" version="2.0" unique-identifier="id">'
+               '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/"><dc:title>Test</dc:title><dc:identifier id="id">test</dc:identifier>'
+               f'<dc:language>en</dc:language></metadata><manifest>{items}</manifest><spine>{spine}</spine></package>')
+
+    with zipfile.ZipFile(path, 'w') as epub:
+        epub.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+        epub.writestr('META-INF/container.xml', container)
+        epub.writestr('OEBPS/content.opf', package)
+        for i in range(chapters):
+            body = ''.join(f'<p>Paragraph {n}. ' + ' '.join(words[(n + k) % len(words)] for k in range(30)) + '.</p>'
+                           for n in range(paragraphs))
+            epub.writestr(f'OEBPS/c{i}.xhtml', '<?xml version="1.0" encoding="utf-8"?><html xmlns="http://www.w3.org/1999/xhtml">'
+                                               f'<head><title>C{i}</title></head><body><h1>Chapter {i + 1}</h1>{body}</body></html>')
+
+
+def old_full_text(epub_path):
+    """The text the preprocessor produced before pages were streamed."""
+    doc = fitz.open(epub_path)
+    full_text = ""
+    for page_num in range(len(doc)):
+        full_text += doc.load_page(page_num).get_text() + "\n\n"
+    doc.close()
+    return full_text.strip()
+
+
+def test_streamed_pages_match_full_text():
+    """Streamed pages join to the old full_text."""
+
+    print("Testing streamed EPUB pages...")
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_epub(os.path.join(data_dir, "book.epub"))
+        epub_path = os.path.join(data_dir, "book.epub")
+        expected = old_full_text(epub_path)
+
+        preprocessor = PyMuPDFEpubPreprocessor(data_dir)
+        (document,) = preprocessor.iter_epubs()
+        pages = list(document['pages'])
+        print(f"{document['metadata']['page_count']} pages, {len(expected)} characters")
+        assert document['metadata']['page_count'] == len(pages) > 2
+        assert [page_num for page_num, _ in pages] == list(range(1, len(pages) + 1))
+        assert ''.join(text for _, text in pages).strip() == expected
+
+        (document,) = preprocessor.process_epubs()
+        assert document['text'] == expected
+
+    print("✅ Streamed pages match the full text")
+
+
 def test_epub_preprocessor():
     """Test the PyMuPDF EPUB preprocessor with sample EPUB files."""
-    
+
     # Initialize preprocessor
     preprocessor = PyMuPDFEpubPreprocessor("../data/project_gutenberg_books")
-    
+
     # Process first 2 EPUB files
     print("Testing PyMuPDF EPUB Preprocessor...")
     documents = preprocessor.process_epubs(limit=2)
-    
+
     print(f"\nProcessed {len(documents)} documents")
-    
+
     # Display results
     for i, doc in enumerate(documents):
         print(f"\n--- Document {i+1} ---")
@@ -21,4 +84,5 @@ def test_epub_preprocessor():
         print("-" * 50)
 
 if __name__ == "__main__":
+    test_streamed_pages_match_full_text()
     test_epub_preprocessor()
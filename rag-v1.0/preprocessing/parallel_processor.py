@@ -1,120 +1,340 @@
 """
 Parallel PDF Batch Processor
-Uses the existing working batch_pdf_processor function in parallel.
+Extraction processes pull PDFs one at a time from a largest-first queue while a shared
+embedding service chunks them; failed files are retried and never stop the run.
 """
 
+import argparse
+import multiprocessing
 import os
-from concurrent.futures import ProcessPoolExecutor, as_completed
-from batch_pdf_processor import process_all_pdfs
-
-
-def split_pdf_list(pdf_files, num_chunks):
-    """Split PDF list into chunks for parallel processing."""
-    chunk_size = len(pdf_files) // num_chunks
-    chunks = []
-    
-    for i in range(num_chunks):
-        start = i * chunk_size
-        if i == num_chunks - 1:  # Last chunk gets remaining files
-            end = len(pdf_files)
-        else:
-            end = start + chunk_size
-        
-        if start < len(pdf_files):
-            chunks.append(pdf_files[start:end])
-    
-    return chunks
-
-
-def process_pdf_batch(pdf_batch, batch_id, input_path, output_path):
-    """Process a batch of PDFs using the existing function."""
-    print(f"Batch {batch_id}: Processing {len(pdf_batch)} PDFs")
-    
-    # Create temporary input directory with just this batch
-    temp_input = os.path.join(input_path, f"temp_batch_{batch_id}")
-    os.makedirs(temp_input, exist_ok=True)
-    
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from normalization.pdf_loader import extract_pages
+from chunking.simple_semantic_chunker import SemanticChunker
+from embedding_service import DEFAULT_MODEL, EmbeddingService
+from batch_pdf_processor import DOCS_PER_BATCH, output_filename, save_chunks
+from ingest_manifest import IngestManifest, extractor_version
+
+MAX_ATTEMPTS = 3  # Per file, extraction and chunking each
+PROGRESS_INTERVAL = 5.0  # Seconds between progress lines
+
+# Characters of extracted text held from extraction until the chunks are written
+MAX_TEXT_IN_FLIGHT = 64 * 1024 * 1024
+
+
+class IngestProgress:
+    """Thread-safe progress counters with a periodic throughput/ETA report."""
+
+    def __init__(self, total_files, total_bytes):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.done_files = 0
+        self.done_bytes = 0
+        self.failed = {}  # filename -> error
+        self.start = time.perf_counter()
+        self._last_report = self.start
+        self._lock = threading.Lock()
+
+    def file_done(self, size):
+        with self._lock:
+            self.done_files += 1
+            self.done_bytes += size
+        self.report()
+
+    def file_failed(self, pdf_file, size, error):
+        with self._lock:
+            self.failed[pdf_file] = str(error)
+            self.done_bytes += size  # Counts as finished work for the ETA
+        print(f"❌ {pdf_file} failed: {error}")
+        self.report()
+
+    def report(self, force=False):
+        """Print a progress line, at most every PROGRESS_INTERVAL seconds unless forced."""
+        with self._lock:
+            now = time.perf_counter()
+            if not force and now - self._last_report < PROGRESS_INTERVAL:
+                return
+            self._last_report = now
+
+            elapsed = max(now - self.start, 1e-9)
+            finished = self.done_files + len(self.failed)
+            byte_rate = self.done_bytes / elapsed
+            eta = (self.total_bytes - self.done_bytes) / byte_rate if byte_rate else float('inf')
+            print(f"📈 {finished}/{self.total_files} files ({len(self.failed)} failed) | "
+                  f"{finished / elapsed:.2f} files/s, {byte_rate / 1e6:.2f} MB/s | "
+                  f"elapsed {elapsed:.0f}s, ETA {eta:.0f}s")
+
+
+class TextBudget:
+    """
+    Caps the extracted text held between extraction and writing. Queues and pools count documents,
+    so without it a run of book-length files would keep every queued document's whole text in memory.
+    """
+
+    def __init__(self, limit):
+        """
+        Args:
+            limit (int): Characters that may be held at once
+        """
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, size):
+        """
+        Block until size characters fit. A document larger than the whole budget waits
+        until nothing else is held, then runs alone.
+
+        Returns:
+            int: Amount to release() once the document is written or dropped
+        """
+        size = min(size, self.limit)
+        with self._condition:
+            while self.used and self.used + size > self.limit:
+                self._condition.wait()
+            self.used += size
+            self.peak = max(self.peak, self.used)
+        return size
+
+    def resize(self, held, size):
+        """
+        Replace an amount acquired as an estimate by the actual size, without waiting (a holder
+        that waited for more here could deadlock with the others). Any shortfall of the
+        estimate is the only way past the limit.
+
+        Returns:
+            int: Amount to release() instead of held
+        """
+        size = min(size, self.limit)
+        with self._condition:
+            self.used += size - held
+            self.peak = max(self.peak, self.used)
+            self._condition.notify_all()
+        return size
+
+    def release(self, size):
+        with self._condition:
+            self.used -= size
+            self._condition.notify_all()
+
+
+def chunk_batch(chunker, batch, output_path):
+    """Chunk a group of extracted PDFs together and save each one (with its page map) to output_path."""
+    batch_chunks = chunker.chunk_many_pages([pages for _, pages, _ in batch])
+    return [save_chunks(output_path, pdf_file, sum(len(text) for _, text in pages),
+                        [chunk for chunk, _ in chunks], [chunk_pages for _, chunk_pages in chunks])
+            for (pdf_file, pages, _), chunks in zip(batch, batch_chunks)]
+
+
+def extract_all(tasks, extract_workers, on_extracted, progress):
+    """
+    Extract PDFs on a process pool, feeding one file at a time in the given order.
+    A failed file is retried up to MAX_ATTEMPTS times. A crashed worker process
+    (e.g. a PyMuPDF segfault) breaks the whole pool, so the files that were in flight
+    are not charged: they are re-run one at a time on a new pool, and only a file that
+    crashes while running alone uses up an attempt.
+
+    Args:
+        tasks (list): (pdf_file, pdf_path, size) in scheduling order
+        extract_workers (int): Extraction processes
+        on_extracted (callable): Called with (pdf_file, pages, size) for each extracted file
+        progress (IngestProgress): Progress report
+    """
+    # spawn: the embedding service's threads are already running in this process
+    context = multiprocessing.get_context("spawn")
+    executor = ProcessPoolExecutor(max_workers=extract_workers, mp_context=context)
+    queue = deque(tasks)
+    suspects = deque()  # In flight when the pool crashed; run alone until the culprit is found
+    attempts = {}
+    running = {}  # future -> (task, ran alone)
+
+    def retry_or_fail(task, error):
+        if attempts[task[0]] < MAX_ATTEMPTS:
+            print(f"🔁 Retrying {task[0]} (attempt {attempts[task[0]]} failed: {error})")
+            return True
+        progress.file_failed(task[0], task[2], error)
+        return False
+
     try:
-        # Copy PDFs to temp directory (symlinks for speed)
-        for pdf_file in pdf_batch:
-            src = os.path.join(input_path, pdf_file)
-            dst = os.path.join(temp_input, pdf_file)
-            if os.path.exists(src):
-                # Create symlink or copy
+        while queue or suspects or running:
+            if suspects:
+                # Isolation: one file at a time, so a crash points at that file
+                if not running:
+                    task = suspects.popleft()
+                    attempts[task[0]] = attempts.get(task[0], 0) + 1
+                    running[executor.submit(extract_pages, task[1])] = (task, True)
+            else:
+                # A short in-flight window keeps the largest-first order and lets retries interleave
+                while queue and len(running) < 2 * extract_workers:
+                    task = queue.popleft()
+                    attempts[task[0]] = attempts.get(task[0], 0) + 1
+                    running[executor.submit(extract_pages, task[1])] = (task, False)
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            pool_broken = False
+
+            for future in done:
+                task, alone = running.pop(future)
+                pdf_file, pdf_path, size = task
                 try:
-                    os.symlink(src, dst)
-                except:
-                    import shutil
-                    shutil.copy2(src, dst)
-        
-        # Use existing function on this batch
-        temp_output = os.path.join(output_path, f"batch_{batch_id}")
-        process_all_pdfs(input_path=temp_input, output_path=temp_output)
-        
-        # Move results to main output directory
-        if os.path.exists(temp_output):
-            for file in os.listdir(temp_output):
-                src = os.path.join(temp_output, file)
-                dst = os.path.join(output_path, file)
-                if not os.path.exists(dst):
-                    os.rename(src, dst)
-            
-            # Cleanup batch directory properly
-            import shutil
-            shutil.rmtree(temp_output)
-        
-        return len(pdf_batch)
-        
+                    pages = future.result()
+                except BrokenProcessPool as e:
+                    pool_broken = True
+                    if alone:
+                        if retry_or_fail(task, e):
+                            suspects.append(task)
+                    else:
+                        attempts[pdf_file] -= 1  # Maybe another file's crash
+                        suspects.append(task)
+                    continue
+                except Exception as e:
+                    if retry_or_fail(task, e):
+                        queue.append(task)
+                    continue
+
+                if not any(text.strip() for _, text in pages):
+                    progress.file_failed(pdf_file, size, "no text extracted")
+                    continue
+                on_extracted(pdf_file, pages, size)
+
+            if pool_broken:
+                # Every other in-flight future of a broken pool fails too; re-run them alone
+                for task, alone in running.values():
+                    attempts[task[0]] -= 1
+                    suspects.append(task)
+                running.clear()
+                executor.shutdown(wait=False, cancel_futures=True)
+                executor = ProcessPoolExecutor(max_workers=extract_workers, mp_context=context)
     finally:
-        # Cleanup temp directory
-        import shutil
-        if os.path.exists(temp_input):
-            shutil.rmtree(temp_input)
+        executor.shutdown(wait=True, cancel_futures=True)
+
 
+def process_all_pdfs_parallel(input_path=None, output_path=None, extract_workers=4, embed_workers=1,
+                              incremental=True, max_text_in_flight=MAX_TEXT_IN_FLIGHT):
+    """
+    Process PDFs with parallel extraction and a shared embedding model.
+
+    Args:
+        input_path (str): Directory of PDFs
+        output_path (str): Directory for the *_chunks.json files
+        extract_workers (int): PyMuPDF extraction processes
+        embed_workers (int): Embedding processes (one model copy each)
+        incremental (bool): Only process PDFs that are new or changed since the ingest manifest
+        max_text_in_flight (int): Characters of extracted text in batches waiting to be chunked;
+            extraction pauses while chunking is this far behind
+
+    Returns:
+        dict: Saved document records, failed files ({filename: error}) and the change set
+    """
 
-def process_all_pdfs_parallel(input_path=None, output_path=None, num_workers=4):
-    """Process PDFs in parallel using existing working function."""
-    
     # Setup paths
     if input_path is None:
         input_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "arxiv_downloads")
-    
+
     if output_path is None:
         output_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "processed_chunks")
-    
+
     os.makedirs(output_path, exist_ok=True)
-    
-    # Get all PDFs
+
+    # Skip PDFs the manifest says are up to date; drop the chunks of deleted ones
+    manifest = IngestManifest(output_path)
+    extractor = extractor_version("pymupdf4llm")
     pdf_files = [f for f in os.listdir(input_path) if f.endswith('.pdf')]
-    print(f"🚀 Processing {len(pdf_files)} PDFs with {num_workers} parallel batches")
-    
-    # Split into batches
-    pdf_batches = split_pdf_list(pdf_files, num_workers)
-    
-    # Process batches in parallel
-    total_processed = 0
-    
-    with ProcessPoolExecutor(max_workers=num_workers) as executor:
-        # Submit all batches
-        future_to_batch = {
-            executor.submit(process_pdf_batch, batch, i+1, input_path, output_path): i+1 
-            for i, batch in enumerate(pdf_batches)
-        }
-        
-        # Collect results
-        for future in as_completed(future_to_batch):
-            batch_id = future_to_batch[future]
+    chunker_config = SemanticChunker(model_name=DEFAULT_MODEL).config()  # Model not loaded
+    plan = manifest.plan({f: os.path.join(input_path, f) for f in pdf_files}, extractor, chunker_config,
+                         source_dirs=[input_path], reprocess_all=not incremental)
+    print(f"📋 {len(plan.to_process)} new or changed, {len(plan.unchanged)} unchanged, {len(plan.deleted)} deleted")
+    for pdf_file in plan.deleted:
+        manifest.remove(pdf_file)
+
+    # Largest files first, so a big PDF never starts last and stalls the end of the run
+    tasks = []
+    for pdf_file, (pdf_path, _) in plan.to_process.items():
+        tasks.append((pdf_file, pdf_path, os.path.getsize(pdf_path)))
+    tasks.sort(key=lambda task: task[2], reverse=True)
+
+    print(f"🚀 Processing {len(tasks)} PDFs with {extract_workers} extraction and {embed_workers} embedding workers")
+    progress = IngestProgress(len(tasks), sum(size for _, _, size in tasks))
+    results = []
+    budget = TextBudget(max_text_in_flight)
+
+    with EmbeddingService(DEFAULT_MODEL, num_workers=embed_workers) as service, \
+            ThreadPoolExecutor(max_workers=embed_workers) as chunkers:
+        chunker = SemanticChunker(encoder=service)
+        chunk_jobs = []
+        batch = []
+
+        def run_chunk_batch(batch, held):
+            """Chunk a group; on failure fall back to one file at a time, with retries."""
             try:
-                processed_count = future.result()
-                total_processed += processed_count
-                print(f"✅ Batch {batch_id} completed: {processed_count} PDFs")
+                saved = chunk_batch(chunker, batch, output_path)
             except Exception as e:
-                print(f"❌ Batch {batch_id} failed: {e}")
-    
+                print(f"⚠️ Chunking a batch of {len(batch)} failed ({e}), retrying per file")
+                saved = []
+                for item in batch:
+                    for attempt in range(1, MAX_ATTEMPTS + 1):
+                        try:
+                            saved.extend(chunk_batch(chunker, [item], output_path))
+                            break
+                        except Exception as file_error:
+                            if attempt == MAX_ATTEMPTS:
+                                progress.file_failed(item[0], item[2], f"chunking: {file_error}")
+            finally:
+                budget.release(held)  # The page texts are no longer needed
+
+            sizes = {pdf_file: size for pdf_file, _, size in batch}
+            for record in saved:
+                pdf_path, sha256 = plan.to_process[record['filename']]
+                manifest.record(record['filename'], pdf_path, sha256, extractor, chunker_config,
+                                output_filename(record['filename']), record['chunk_count'])
+                progress.file_done(sizes[record['filename']])
+            return saved
+
+        def submit_batch(batch):
+            # Blocks the extraction loop (so no new files start) while earlier batches hold the budget
+            held = budget.acquire(sum(len(text) for _, pages, _ in batch for _, text in pages))
+            chunk_jobs.append(chunkers.submit(run_chunk_batch, batch, held))
+
+        def on_extracted(pdf_file, pages, size):
+            nonlocal batch
+            batch.append((pdf_file, pages, size))
+            if len(batch) == DOCS_PER_BATCH:
+                submit_batch(batch)
+                batch = []
+
+        # Extraction and chunking overlap: batches are chunked while later files extract
+        extract_all(tasks, extract_workers, on_extracted, progress)
+        if batch:
+            submit_batch(batch)
+
+        for job in chunk_jobs:
+            results.extend(job.result())
+
+    change_set = manifest.save()
+
+    progress.report(force=True)
     print(f"\n🎉 Parallel processing complete!")
-    print(f"Total PDFs processed: {total_processed}")
+    print(f"Total PDFs processed: {len(results)} ({len(progress.failed)} failures)")
+    print(f"Total chunks: {sum(r['chunk_count'] for r in results)}")
     print(f"Output directory: {output_path}")
+    for pdf_file, error in progress.failed.items():
+        print(f"  ✗ {pdf_file}: {error}")
+    return {"results": results, "failed": progress.failed, "changes": change_set}
 
 
 if __name__ == "__main__":
-    process_all_pdfs_parallel(num_workers=4)  # Use 4 parallel processes
+    parser = argparse.ArgumentParser(description="Parallel PDF preprocessing")
+    parser.add_argument("--extract-workers", type=int, default=os.cpu_count() or 4, help="PyMuPDF extraction processes")
+    parser.add_argument("--embed-workers", type=int, default=1, help="Embedding model processes")
+    parser.add_argument("--full", action="store_true", help="Reprocess every PDF, ignoring the ingest manifest")
+    parser.add_argument("--max-text-mb", type=float, default=MAX_TEXT_IN_FLIGHT / 1e6,
+                        help="Millions of characters of extracted text waiting to be chunked")
+    args = parser.parse_args()
+
+    process_all_pdfs_parallel(extract_workers=args.extract_workers, embed_workers=args.embed_workers,
+                              incremental=not args.full, max_text_in_flight=int(args.max_text_mb * 1e6))
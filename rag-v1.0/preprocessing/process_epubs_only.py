@@ -5,13 +5,13 @@ Processes EPUBs to add second format support without touching existing PDF chunk
 
 import os
 import sys
-import json
 
 # Add the preprocessing directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from normalization.epub_loader import PyMuPDFEpubPreprocessor
 from chunking.simple_semantic_chunker import SemanticChunker
+from batch_pdf_processor import measure_pages, save_chunks
 
 
 def process_epubs_only(epub_input_path=None, output_path=None, limit=10):
@@ -35,49 +35,34 @@ def process_epubs_only(epub_input_path=None, output_path=None, limit=10):
     chunker = SemanticChunker()
     epub_preprocessor = PyMuPDFEpubPreprocessor(data_directory=epub_input_path)
     
-    # Process EPUBs
-    epub_documents = epub_preprocessor.process_epubs(limit=limit)
-    print(f"✅ Loaded {len(epub_documents)} EPUB documents")
-    
-    # Process each EPUB
+    # Stream EPUBs: each book's pages are rendered as the chunker consumes them,
+    # so only one book's current window is in memory
+    epub_files = sorted(f for f in os.listdir(epub_input_path) if f.endswith('.epub'))[:limit]
+    processed = 0
     total_chunks = 0
     
-    for i, doc in enumerate(epub_documents, 1):
-        filename = doc['metadata']['file_name']  # EPUB loader uses metadata.file_name
-        text = doc['text']
-        
-        print(f"\n🔄 Processing {i}/{len(epub_documents)}: {filename}")
+    for i, document in enumerate(epub_preprocessor.iter_epubs(epub_files), 1):
+        filename = document['metadata']['file_name']  # EPUB loader uses metadata.file_name
+        print(f"\n🔄 Processing {i}/{len(epub_files)}: {filename}")
         
-        # Chunk the document
+        page_lengths = []
         try:
-            chunks = chunker.chunk(text)  # Use 'chunk' method not 'chunk_text'
-            print(f"   Generated {len(chunks)} chunks")
-            
-            # Create document data in the SAME FORMAT as existing PDFs
-            document_data = {
-                "filename": filename,
-                "text_length": len(text),
-                "chunk_count": len(chunks),
-                "chunks": chunks  # Just the text chunks, same as PDFs
-            }
-            
-            # Create filename for this document (same format as PDFs)
-            doc_filename = f"{os.path.splitext(filename)[0]}_chunks.json"
-            doc_path = os.path.join(output_path, doc_filename)
-            
-            # Save document with all chunks (same format as PDFs)
-            with open(doc_path, 'w', encoding='utf-8') as f:
-                json.dump(document_data, f, indent=2, ensure_ascii=False)
-            
-            total_chunks += len(chunks)
+            chunks = list(chunker.iter_page_chunks(measure_pages(document['pages'], page_lengths)))
             
+            # Same format as the PDFs, plus each chunk's page range
+            save_chunks(output_path, filename, sum(page_lengths), [chunk for chunk, _ in chunks],
+                        [pages for _, pages in chunks])
         except Exception as e:
             print(f"   ❌ Error processing {filename}: {e}")
             continue
+        
+        print(f"   Generated {len(chunks)} chunks")
+        processed += 1
+        total_chunks += len(chunks)
     
     print(f"\n✅ EPUB processing complete!")
     print(f"📊 Summary:")
-    print(f"   - EPUBs processed: {len(epub_documents)}")
+    print(f"   - EPUBs processed: {processed}")
     print(f"   - Total new chunks created: {total_chunks}")
     print(f"   - Output directory: {output_path}")
 
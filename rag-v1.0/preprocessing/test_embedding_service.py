@@ -0,0 +1,47 @@
+"""
+Test the shared embedding service: same embeddings and chunks as a local model
+"""
+
+import os
+import sys
+
+import numpy as np
+
+# Add the preprocessing directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from chunking.simple_semantic_chunker import SemanticChunker
+from embedding_service import EmbeddingService, DEFAULT_MODEL
+
+
+def test_service_matches_local_model():
+    """Chunks made through the service equal chunks made with an in-process model."""
+    
+    print("Embedding Service Test")
+    print("=" * 50)
+    
+    text = """
+    Artificial intelligence is transforming modern technology. Machine learning algorithms can process vast datasets.
+    Environmental conservation is crucial for our planet's future. Deforestation threatens biodiversity worldwide.
+    Financial markets reflect economic uncertainty today. Investors seek stable investment opportunities.
+    """
+    
+    local = SemanticChunker(model_name=DEFAULT_MODEL, threshold=0.2, min_chunk_words=5)
+    
+    with EmbeddingService(DEFAULT_MODEL, num_workers=2) as service:
+        sentences = ["Deep learning needs data", "Solar power is growing"]
+        embeddings = service.encode(sentences)
+        assert np.allclose(embeddings, local.model.encode(sentences), atol=1e-5)
+        
+        # Concurrent requests are spread over both workers
+        futures = [service.submit(sentences) for _ in range(8)]
+        assert all(f.result().shape == embeddings.shape for f in futures)
+        
+        remote = SemanticChunker(threshold=0.2, min_chunk_words=5, encoder=service)
+        chunks = remote.chunk_many([text, text])
+        print(f"  {len(chunks[0])} chunks through the service")
+        assert chunks == [local.chunk(text)] * 2
+
+
+if __name__ == "__main__":
+    test_service_matches_local_model()
@@ -0,0 +1,96 @@
+"""
+Test the ingest manifest: only new or changed documents are reprocessed, deleted ones are reported
+"""
+
+import os
+import sys
+import tempfile
+
+# Add the preprocessing directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ingest_manifest import IngestManifest, chunk_ids
+
+CHUNKER_CONFIG = {"model_name": "test-model", "threshold": 0.6}
+
+
+def ingest(input_dir, output_dir, chunker_config=CHUNKER_CONFIG, incremental=True):
+    """One run that 'chunks' every document into two chunks."""
+    manifest = IngestManifest(output_dir)
+    sources = {f: os.path.join(input_dir, f) for f in sorted(os.listdir(input_dir))}
+    plan = manifest.plan(sources, "test-extractor", chunker_config, source_dirs=[input_dir],
+                         reprocess_all=not incremental)
+    
+    for filename in plan.deleted:
+        manifest.remove(filename)
+    for filename, (path, sha256) in plan.to_process.items():
+        output_file = os.path.join(output_dir, f"{filename}_chunks.json")
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write("{}")
+        manifest.record(filename, path, sha256, "test-extractor", chunker_config, output_file, 2)
+    
+    return plan, manifest.save()
+
+
+def test_incremental_runs():
+    """Unchanged files are skipped; edits, config changes and deletions show up in the change set."""
+    
+    print("Ingest Manifest Test")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as input_dir, tempfile.TemporaryDirectory() as output_dir:
+        for name in ("a.pdf", "b.pdf"):
+            with open(os.path.join(input_dir, name), 'w') as f:
+                f.write(f"contents of {name}")
+        
+        plan, changes = ingest(input_dir, output_dir)
+        print(f"First run: {plan}")
+        assert sorted(plan.to_process) == ["a.pdf", "b.pdf"]
+        assert sorted(changes["add_chunk_ids"]) == sorted(chunk_ids("a.pdf", 2) + chunk_ids("b.pdf", 2))
+        
+        plan, changes = ingest(input_dir, output_dir)
+        print(f"Re-run:    {plan}")
+        assert not plan.to_process and sorted(plan.unchanged) == ["a.pdf", "b.pdf"]
+        assert changes["documents"] == []
+        
+        with open(os.path.join(input_dir, "a.pdf"), 'a') as f:
+            f.write(" (edited)")
+        os.remove(os.path.join(input_dir, "b.pdf"))
+        
+        plan, changes = ingest(input_dir, output_dir)
+        print(f"Edit + delete: {plan}")
+        statuses = {d["filename"]: d["status"] for d in changes["documents"]}
+        assert statuses == {"a.pdf": "changed", "b.pdf": "deleted"}
+        assert sorted(changes["delete_chunk_ids"]) == sorted(chunk_ids("a.pdf", 2) + chunk_ids("b.pdf", 2))
+        assert not os.path.exists(os.path.join(output_dir, "b.pdf_chunks.json"))
+        
+        plan, _ = ingest(input_dir, output_dir, {**CHUNKER_CONFIG, "threshold": 0.5})
+        print(f"New chunker config: {plan}")
+        assert list(plan.to_process) == ["a.pdf"]
+    
+    print("✅ Incremental runs behave as expected")
+
+
+def test_full_run_removes_old_chunks():
+    """A full run reprocesses everything and still reports the chunk IDs it replaces or deletes."""
+    
+    with tempfile.TemporaryDirectory() as input_dir, tempfile.TemporaryDirectory() as output_dir:
+        for name in ("a.pdf", "b.pdf"):
+            with open(os.path.join(input_dir, name), 'w') as f:
+                f.write(f"contents of {name}")
+        ingest(input_dir, output_dir)
+        os.remove(os.path.join(input_dir, "b.pdf"))
+        
+        plan, changes = ingest(input_dir, output_dir, incremental=False)
+        print(f"Full run: {plan}")
+        assert list(plan.to_process) == ["a.pdf"] and plan.deleted == ["b.pdf"]
+        assert {d["filename"]: d["status"] for d in changes["documents"]} == {"a.pdf": "changed", "b.pdf": "deleted"}
+        assert sorted(changes["delete_chunk_ids"]) == sorted(chunk_ids("a.pdf", 2) + chunk_ids("b.pdf", 2))
+        assert changes["add_chunk_ids"] == chunk_ids("a.pdf", 2)
+    
+    print("✅ Full runs report the chunks they replace")
+
+
+if __name__ == "__main__":
+    test_incremental_runs()
+    test_full_run_removes_old_chunks()
@@ -0,0 +1,129 @@
+"""
+Test the ingest pipeline stages: every item arrives once, and bounded queues hold producers back
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+
+# Add the preprocessing directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ingest_pipeline import Stage, TextBudget, estimated_text, run_stages
+
+
+def test_stages_with_backpressure():
+    """A slow last stage keeps the number of items in flight at the queue and worker capacity."""
+    
+    print("Ingest Pipeline Test")
+    print("=" * 50)
+    
+    lock = threading.Lock()
+    in_flight = {"now": 0, "max": 0}
+    batch_sizes = []
+    written = []
+    
+    def start(item):
+        with lock:
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        return [item]
+    
+    def double(batch):
+        batch_sizes.append(len(batch))
+        return [item * 2 for item in batch]
+    
+    def write(item):
+        time.sleep(0.002)  # Slowest stage
+        with lock:
+            in_flight["now"] -= 1
+            written.append(item)
+        return []
+    
+    run_stages([
+        Stage("start", start, workers=3, queue_size=2),
+        Stage("double", double, workers=2, batch_size=4, queue_size=2),
+        Stage("write", write, queue_size=2)
+    ], range(200))
+    
+    print(f"  Written: {len(written)}, max in flight: {in_flight['max']}, largest batch: {max(batch_sizes)}")
+    assert sorted(written) == [i * 2 for i in range(200)]
+    assert max(batch_sizes) <= 4
+    # Queues (3 x 2) plus items held by workers (3 + 4 x 2 + 1), never the whole input
+    assert in_flight["max"] <= 3 * 2 + 3 + 4 * 2 + 1
+    
+    # A failing item is dropped without stalling the rest
+    results = []
+    run_stages([
+        Stage("fail", lambda item: [item // item * item], workers=2),
+        Stage("collect", lambda item: results.append(item) or [])
+    ], range(5))
+    assert sorted(results) == [1, 2, 3, 4]
+    
+    print("✅ All items passed through with bounded memory")
+
+
+def test_text_budget():
+    """Documents wait while the text already held would exceed the budget."""
+    
+    # Documents of different sizes through a slow writer: the text held never exceeds the budget
+    budget = TextBudget(100)
+    held = []
+    
+    def extract(size):
+        return [(size, budget.acquire(size))]
+    
+    def write(document):
+        time.sleep(0.002)
+        held.append(budget.used)
+        budget.release(document[1])
+        return []
+    
+    sizes = [60, 30, 90, 10, 250, 40] * 5
+    run_stages([
+        Stage("extract", extract, workers=3, queue_size=4),
+        Stage("write", write, queue_size=4)
+    ], sizes)
+    
+    print(f"  Peak text held: {budget.peak} of {budget.limit}, after the run: {budget.used}")
+    assert len(held) == len(sizes)
+    assert budget.peak <= 100 and budget.used == 0
+    
+    # A document larger than the whole budget is admitted once nothing else is held
+    assert budget.acquire(500) == 100
+    budget.release(100)
+    
+    # An estimate is trimmed to the actual size without waiting, which frees room for others
+    held = budget.resize(budget.acquire(80), 20)
+    assert held == 20 and budget.used == 20
+    assert budget.resize(held, 120) == 100 and budget.used == 100
+    budget.release(100)
+    assert budget.used == 0
+    
+    print("✅ Text in flight stays within the budget")
+
+
+def test_estimated_text():
+    """EPUBs are budgeted by their uncompressed size, other files by their size on disk."""
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        epub_path = os.path.join(tmp_dir, "book.epub")
+        with zipfile.ZipFile(epub_path, "w", compression=zipfile.ZIP_DEFLATED) as epub:
+            epub.writestr("OEBPS/c1.xhtml", "<p>" + "antimatter " * 1000 + "</p>")
+        assert estimated_text(epub_path, ".epub") == 11007 > os.path.getsize(epub_path)
+        
+        pdf_path = os.path.join(tmp_dir, "paper.pdf")
+        with open(pdf_path, "wb") as f:
+            f.write(b"%PDF" + b"0" * 500)
+        assert estimated_text(pdf_path, ".pdf") == 504
+        # Not a zip after all: fall back to the size on disk and let extraction report it
+        assert estimated_text(pdf_path, ".epub") == 504
+
+
+if __name__ == "__main__":
+    test_stages_with_backpressure()
+    test_text_budget()
+    test_estimated_text()
@@ -0,0 +1,115 @@
+"""
+Test parallel extraction: a file that crashes its worker process fails alone
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+# Add the preprocessing directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import parallel_processor
+from batch_pdf_processor import DOCS_PER_BATCH
+from parallel_processor import IngestProgress, extract_all
+
+
+def fake_extract(pdf_path):
+    """Stands in for extract_pages in the worker processes; 'crash.pdf' kills its worker."""
+    if pdf_path.endswith("crash.pdf"):
+        os._exit(1)
+    return [(1, f"text of {pdf_path}")]
+
+
+def test_crash_charges_only_the_crashing_file():
+    """Files in flight when the pool breaks are re-run one at a time, without using up attempts."""
+
+    print("Parallel Extraction Crash Test")
+    print("=" * 50)
+
+    tasks = [(name, name, 1) for name in ["a.pdf", "b.pdf", "crash.pdf", "c.pdf", "d.pdf", "e.pdf"]]
+    progress = IngestProgress(len(tasks), len(tasks))
+    extracted = []
+
+    original = parallel_processor.extract_pages
+    parallel_processor.extract_pages = fake_extract
+    try:
+        extract_all(tasks, 2, lambda pdf_file, pages, size: extracted.append(pdf_file), progress)
+    finally:
+        parallel_processor.extract_pages = original
+
+    print(f"Extracted: {sorted(extracted)}, failed: {list(progress.failed)}")
+    assert sorted(extracted) == ["a.pdf", "b.pdf", "c.pdf", "d.pdf", "e.pdf"]
+    assert list(progress.failed) == ["crash.pdf"]
+
+    print("✅ Only the crashing file failed")
+
+
+class FakeEmbeddingService:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def test_extraction_waits_for_chunking():
+    """Extracted text waiting to be chunked stays within the budget when chunking is slow."""
+
+    print("Parallel Extraction Backpressure Test")
+    print("=" * 50)
+
+    page_chars = 1000
+    limit = 2 * DOCS_PER_BATCH * page_chars
+    waiting = {"chars": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def fake_extract_all(tasks, extract_workers, on_extracted, progress):
+        # Extraction is instant, so without backpressure every file would be waiting at once
+        for pdf_file, _, size in tasks:
+            with lock:
+                waiting["chars"] += page_chars
+                waiting["peak"] = max(waiting["peak"], waiting["chars"])
+            on_extracted(pdf_file, [(1, "x" * page_chars)], size)
+
+    def slow_chunk_batch(chunker, batch, output_path):
+        time.sleep(0.05)
+        with lock:
+            waiting["chars"] -= page_chars * len(batch)
+        return [{"filename": pdf_file, "chunk_count": 1} for pdf_file, _, _ in batch]
+
+    fakes = {"extract_all": fake_extract_all, "chunk_batch": slow_chunk_batch,
+             "EmbeddingService": FakeEmbeddingService,
+             "SemanticChunker": lambda **kwargs: SimpleNamespace(config=lambda: {})}
+    originals = {name: getattr(parallel_processor, name) for name in fakes}
+    with tempfile.TemporaryDirectory() as input_path, tempfile.TemporaryDirectory() as output_path:
+        for i in range(10 * DOCS_PER_BATCH):
+            with open(os.path.join(input_path, f"paper_{i}.pdf"), "w") as f:
+                f.write(f"paper {i}")
+
+        for name, fake in fakes.items():
+            setattr(parallel_processor, name, fake)
+        try:
+            summary = parallel_processor.process_all_pdfs_parallel(input_path, output_path,
+                                                                   max_text_in_flight=limit)
+        finally:
+            for name, original in originals.items():
+                setattr(parallel_processor, name, original)
+
+    print(f"Peak text waiting: {waiting['peak']} characters (budget {limit})")
+    assert len(summary["results"]) == 10 * DOCS_PER_BATCH
+    # The budget, plus the batch being filled while the extraction loop waits
+    assert waiting["peak"] <= limit + DOCS_PER_BATCH * page_chars
+
+    print("✅ Extraction paused while chunking caught up")
+
+
+if __name__ == "__main__":
+    test_crash_charges_only_the_crashing_file()
+    test_extraction_waits_for_chunking()
@@ -0,0 +1,88 @@
+"""
+Admission Control
+Runs queries on a bounded worker pool behind a bounded queue, rejecting work when full.
+"""
+
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+class ServerBusy(Exception):
+    """Raised when the worker pool and its queue are both full."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Server busy, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """
+    Bounded pool of query workers. At most `workers` queries run at once and at
+    most `queue_depth` more wait; anything beyond that is rejected with ServerBusy.
+    """
+
+    def __init__(self, workers=16, queue_depth=32):
+        """
+        Args:
+            workers (int): Queries processed concurrently
+            queue_depth (int): Queries allowed to wait for a worker
+        """
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.capacity = workers + queue_depth
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rag-worker")
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._avg_service_seconds = 1.0  # Moving average used for Retry-After
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue fn(*args, **kwargs) for a worker.
+
+        Returns:
+            Future: Result of the call
+
+        Raises:
+            ServerBusy: If the queue is full
+        """
+        if not self._slots.acquire(blocking=False):
+            raise ServerBusy(self.retry_after())
+
+        with self._lock:
+            self._in_flight += 1
+        start = time.perf_counter()
+
+        def run():
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                # Free the slot before the result is published, so a caller woken
+                # by the result can be admitted again right away
+                with self._lock:
+                    self._in_flight -= 1
+                    self._avg_service_seconds = 0.9 * self._avg_service_seconds + 0.1 * (time.perf_counter() - start)
+                self._slots.release()
+
+        return self._executor.submit(run)
+
+    def retry_after(self):
+        """
+        Returns:
+            int: Seconds until a queue slot should be free, rounded up
+        """
+        with self._lock:
+            backlog = self._in_flight / self.workers
+            return max(1, math.ceil(backlog * self._avg_service_seconds))
+
+    def stats(self):
+        """
+        Returns:
+            dict: Queries in flight (running or queued) and the admission limits
+        """
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "workers": self.workers,
+                "queue_depth": self.queue_depth
+            }
@@ -0,0 +1,214 @@
+"""
+Bounded Conversation Store
+Keeps recent conversation messages in RAM under per-session and global byte caps,
+with every message written through to SQLite so history survives restarts.
+"""
+
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "conversations.sqlite3")
+DEFAULT_MAX_SESSION_BYTES = 256 * 1024  # Per conversation held in RAM
+DEFAULT_MAX_TOTAL_BYTES = 64 * 1024 * 1024  # Across all conversations held in RAM
+
+# Result fields kept in the log; retrieved chunk texts are replaced by their IDs
+STORED_RESULT_FIELDS = ("query", "answer", "error", "expanded_queries", "sources",
+                        "source_attribution", "cache_hit", "coalesced")
+
+
+def compact_result(result):
+    """
+    Reduce a rag_query result to what a conversation log needs.
+
+    Args:
+        result (dict): rag_query result
+
+    Returns:
+        dict: The answer, sources and the IDs (not texts) of the retrieved chunks
+    """
+    compact = {field: result[field] for field in STORED_RESULT_FIELDS if field in result}
+
+    if "chunks" in result:
+        # Chunks that made it into the context
+        chunk_ids = [chunk["chunk_id"] for chunk in result["chunks"]]
+    else:
+        search_results = result.get("search_results") or {}
+        chunk_ids = [r["chunk_id"] for r in search_results.get("bm25", []) + search_results.get("chroma", [])]
+    compact["chunk_ids"] = list(dict.fromkeys(chunk_ids))
+    return compact
+
+
+class _Session:
+    __slots__ = ("messages", "bytes", "complete")
+
+    def __init__(self, complete=True):
+        self.messages = []  # (message dict, size in bytes)
+        self.bytes = 0
+        self.complete = complete  # False once older messages were dropped from RAM
+
+
+class ConversationStore:
+    """
+    Conversation log with an LRU of sessions in RAM and SQLite as the source of truth.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, max_session_bytes=DEFAULT_MAX_SESSION_BYTES,
+                 max_total_bytes=DEFAULT_MAX_TOTAL_BYTES):
+        """
+        Open (or create) the store file.
+
+        Args:
+            path (str): Path to the SQLite file
+            max_session_bytes (int): Oldest messages of a conversation leave RAM above this size
+            max_total_bytes (int): Least recently used conversations leave RAM above this size
+        """
+        self.path = path
+        self.max_session_bytes = max_session_bytes
+        self.max_total_bytes = max_total_bytes
+        self._sessions = OrderedDict()  # conversation_id -> _Session, least recently used first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                conversation_id TEXT NOT NULL,
+                message TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_conversation ON messages(conversation_id, id)")
+        # Conversation IDs issued by create(); only these can be resumed
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS conversations (
+                conversation_id TEXT PRIMARY KEY,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def create(self):
+        """
+        Start a conversation under a new unguessable ID.
+
+        The ID doubles as the token a client presents to resume the conversation.
+
+        Returns:
+            str: Conversation ID
+        """
+        conversation_id = secrets.token_urlsafe(24)
+        with self._lock:
+            self._conn.execute("INSERT INTO conversations (conversation_id, created_at) VALUES (?, ?)",
+                               (conversation_id, time.time()))
+            self._conn.commit()
+        return conversation_id
+
+    def exists(self, conversation_id):
+        """
+        Returns:
+            bool: True if the ID was issued by create()
+        """
+        if not isinstance(conversation_id, str):
+            return False
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM conversations WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()
+        return row is not None
+
+    def append(self, conversation_id, message_type, message):
+        """
+        Add a message to a conversation.
+
+        Args:
+            conversation_id (str): Conversation ID from create()
+            message_type (str): 'user' or 'bot'
+            message: Query text, or a rag_query result (stored compacted)
+        """
+        if isinstance(message, dict):
+            message = compact_result(message)
+
+        entry = {"type": message_type, "message": message, "timestamp": time.time()}
+        encoded = json.dumps(entry)
+
+        with self._lock:
+            session = self._sessions.get(conversation_id)
+            if session is None:
+                # Earlier messages on disk only (evicted, or from before a restart) are read back by get()
+                session = self._sessions[conversation_id] = _Session(complete=not self._exists_on_disk(conversation_id))
+            self._sessions.move_to_end(conversation_id)
+
+            self._conn.execute(
+                "INSERT INTO messages (conversation_id, message, created_at) VALUES (?, ?, ?)",
+                (conversation_id, encoded, entry["timestamp"])
+            )
+            self._conn.commit()
+
+            session.messages.append((entry, len(encoded)))
+            session.bytes += len(encoded)
+            self._total_bytes += len(encoded)
+            self._enforce_limits(session)
+
+    def get(self, conversation_id):
+        """
+        Full history of a conversation, from RAM when it is all there, otherwise from disk.
+
+        Returns:
+            list: Messages in order, each {'type', 'message', 'timestamp'}
+        """
+        with self._lock:
+            session = self._sessions.get(conversation_id)
+            if session is not None and session.complete:
+                self._sessions.move_to_end(conversation_id)
+                return [entry for entry, _ in session.messages]
+
+            rows = self._conn.execute(
+                "SELECT message FROM messages WHERE conversation_id = ? ORDER BY id", (conversation_id,)
+            ).fetchall()
+
+        return [json.loads(message) for (message,) in rows]
+
+    def release(self, conversation_id):
+        """Drop a conversation from RAM (e.g. on disconnect); it stays on disk."""
+        with self._lock:
+            session = self._sessions.pop(conversation_id, None)
+            if session is not None:
+                self._total_bytes -= session.bytes
+
+    def stats(self):
+        """
+        Returns:
+            dict: Conversations and bytes currently held in RAM
+        """
+        with self._lock:
+            return {"sessions_in_memory": len(self._sessions), "bytes_in_memory": self._total_bytes}
+
+    def _exists_on_disk(self, conversation_id):
+        row = self._conn.execute(
+            "SELECT 1 FROM messages WHERE conversation_id = ? LIMIT 1", (conversation_id,)
+        ).fetchone()
+        return row is not None
+
+    def _enforce_limits(self, session):
+        """Trim the session to its cap, then evict least recently used sessions to the global cap."""
+        while session.bytes > self.max_session_bytes and len(session.messages) > 1:
+            _, size = session.messages.pop(0)
+            session.bytes -= size
+            self._total_bytes -= size
+            session.complete = False
+
+        while self._total_bytes > self.max_total_bytes and len(self._sessions) > 1:
+            _, evicted = self._sessions.popitem(last=False)
+            self._total_bytes -= evicted.bytes
+
+    def close(self):
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,115 @@
+"""
+Pre-Fork REST Server
+Runs several worker processes on one listening socket, each mapping the same read-only
+index files (RAG_INDEX_BACKEND=mmap) so the corpus is held in memory once, not per worker.
+
+Usage:
+    python ../hybrid_search/mmap_index.py
+    python prefork.py --workers 4
+
+Socket.IO needs sticky sessions, so real-time chat stays on the single-process run.py;
+the pre-forked workers serve the REST endpoints (/query, /query/batch, /health, /metrics).
+"""
+
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+
+# Default to the shared index; RAG_INDEX_BACKEND=memory gives every worker its own copy (for comparison)
+os.environ.setdefault("RAG_INDEX_BACKEND", "mmap")
+
+# Libraries imported before forking are shared copy-on-write; the app itself (thread pools,
+# SQLite connections, index mappings) is created after fork in each worker
+PRELOAD_MODULES = ("numpy", "flask", "flask_socketio", "requests", "rank_bm25", "tiktoken")
+
+RESPAWN_DELAY = 1.0  # Seconds before replacing a worker that exited
+
+
+def preload():
+    """Import the heavy libraries once in the master."""
+    for module in PRELOAD_MODULES:
+        try:
+            __import__(module)
+        except ImportError as e:
+            print(f"⚠️ Could not preload {module}: {e}")
+
+
+def serve_worker(sock, host, port):
+    """Worker process: build the app on the inherited socket and serve until terminated."""
+    from werkzeug.serving import make_server
+
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    import run
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    run.get_context().start_background_warmup()  # Maps the index files in this process
+
+    server = make_server(host, port, run.app, threaded=True, fd=sock.fileno())
+    print(f"👷 Worker {os.getpid()} serving on http://{host}:{port}")
+    server.serve_forever()
+
+
+def spawn_worker(sock, host, port):
+    """Fork one worker; returns its pid in the master."""
+    pid = os.fork()
+    if pid == 0:
+        try:
+            serve_worker(sock, host, port)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-forked RAG REST server")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("RAG_PROCESSES", os.cpu_count() or 2)))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(128)
+    sock.set_inheritable(True)
+
+    preload()
+
+    workers = {spawn_worker(sock, args.host, args.port) for _ in range(args.workers)}
+    print(f"Server running on http://{args.host}:{args.port} with {args.workers} workers "
+          f"({os.environ['RAG_INDEX_BACKEND']} indexes, master {os.getpid()})")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Replace workers that die, until asked to stop
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        workers.discard(pid)
+        if not stopping:
+            print(f"⚠️ Worker {pid} exited ({status}); starting a replacement")
+            time.sleep(RESPAWN_DELAY)
+            workers.add(spawn_worker(sock, args.host, args.port))
+
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
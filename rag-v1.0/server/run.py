@@ -1,31 +1,288 @@
 import sys
 import os
-from flask import Flask, request, jsonify
+
+# 'threading' (default) or 'gevent' for green I/O; gevent must patch before other imports
+ASYNC_MODE = os.getenv("RAG_ASYNC_MODE", "threading")
+if ASYNC_MODE == "gevent":
+    import gevent
+    from gevent import monkey
+    # Green sockets only: the query and retrieval pools must stay real threads to use more than one core,
+    # and their work queues native queues (a gevent queue would block a pool thread on its own empty hub)
+    monkey.patch_all(thread=False, queue=False)
+
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
-import json
+import threading
+from concurrent.futures import Future
 
 # Add parent directory to import ai.py
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from ai import rag_query
+from ai import rag_query, prepare_rag_query, rag_query_batch, PendingAnswer, DETAIL_LEVELS
+from app_context import get_context
+from observability.metrics import render_metrics
+from admission import AdmissionController, ServerBusy
+from single_flight import SingleFlight, query_key
+from conversation_store import ConversationStore
+import serialization
 
 app = Flask(__name__)
+app.json = serialization.OrjsonProvider(app)  # orjson for jsonify() and request bodies
 CORS(app, origins=["http://localhost:3000", "http://127.0.0.1:3000"])  # Allow React frontend
-socketio = SocketIO(app, cors_allowed_origins=["http://localhost:3000", "http://127.0.0.1:3000"])
+socketio = SocketIO(app, cors_allowed_origins=["http://localhost:3000", "http://127.0.0.1:3000"],
+                    async_mode=ASYNC_MODE, json=serialization)
+
+# Queries run concurrently on a bounded pool; beyond the queue depth clients are told to retry
+admission = AdmissionController(
+    workers=int(os.getenv("RAG_WORKERS", 16)),
+    queue_depth=int(os.getenv("RAG_QUEUE_DEPTH", 32))
+)
+
+# Batch requests stream for a long time; cap how many run at once and how large they are
+MAX_BATCH_SIZE = 256
+MAX_BATCHES = int(os.getenv("RAG_MAX_BATCHES", 2))
+batch_slots = threading.BoundedSemaphore(MAX_BATCHES)
+
+# Identical concurrent queries share one rag_query run
+single_flight = SingleFlight()
+
+# Gevent mode: answers' LLM calls in flight at once, as greenlets outside the worker pool
+LLM_CONCURRENCY = int(os.getenv("RAG_LLM_CONCURRENCY", 256))
+
+if ASYNC_MODE == "gevent":
+    from gevent.lock import BoundedSemaphore as GreenSemaphore
+    from gevent.threadpool import ThreadPool
+    # Native threads that wait on worker results, so a waiting request doesn't stall the event loop
+    _waiters = ThreadPool(admission.capacity + MAX_BATCHES)
+    _llm_slots = GreenSemaphore(LLM_CONCURRENCY)
+
+def wait_for(fn, *args):
+    """
+    Call fn(*args), which blocks on the worker pools (e.g. future.result).
+    
+    In gevent mode the call runs on a waiter thread while other greenlets keep running.
+    """
+    if ASYNC_MODE == "gevent":
+        return _waiters.apply(fn, args)
+    return fn(*args)
+
+# Response size when the client doesn't ask for one: everything the frontend shows
+DEFAULT_DETAIL = "sources"
+
+def response_options(data):
+    """
+    Read the response-shaping options of a request.
+    
+    Returns:
+        dict: rag_query keyword arguments (detail, include_snippets, use_cache)
+    
+    Raises:
+        ValueError: If detail is not a known level
+    """
+    detail = data.get('detail', DEFAULT_DETAIL)
+    if detail not in DETAIL_LEVELS:
+        raise ValueError(f"'detail' must be one of {', '.join(DETAIL_LEVELS)}")
+    return {"detail": detail, "include_snippets": bool(data.get('snippets', False)),
+            "use_cache": bool(data.get('cache', True))}
+
+MAX_TOP_K = 20
+
+def batch_options(data):
+    """
+    Read the retrieval options of a batch request.
+    
+    Returns:
+        dict: rag_query_batch keyword arguments (top_k, use_query_expansion)
+    
+    Raises:
+        ValueError: If top_k is not an integer in 1..MAX_TOP_K or use_query_expansion is not a boolean
+    """
+    top_k = data.get('top_k', 3)
+    if isinstance(top_k, bool) or not isinstance(top_k, int) or not 1 <= top_k <= MAX_TOP_K:
+        raise ValueError(f"'top_k' must be an integer from 1 to {MAX_TOP_K}")
+    use_query_expansion = data.get('use_query_expansion', True)
+    if not isinstance(use_query_expansion, bool):
+        raise ValueError("'use_query_expansion' must be a boolean")
+    return {"top_k": top_k, "use_query_expansion": use_query_expansion}
+
+def submit_query(query_text, options):
+    """
+    Start rag_query on the worker pool, or join an identical query already running.
+    
+    Returns:
+        tuple: (Future of the result, True if this request joined another one)
+    
+    Raises:
+        ServerBusy: If a new computation is needed and the queue is full
+    """
+    if ASYNC_MODE == "gevent":
+        start = lambda: submit_green(query_text, options)
+    else:
+        start = lambda: admission.submit(rag_query, query_text, **options)
+    
+    future, leader = single_flight.submit(query_key(query_text, **options), start)
+    if not leader:
+        print(f"🔗 Coalesced with in-flight query: {query_text}")
+    return future, not leader
 
-# Store active conversations
-conversations = {}
+def submit_green(query_text, options):
+    """
+    Gevent mode: retrieve on the worker pool, then call the LLM from a greenlet, so a query
+    waiting for its answer doesn't hold a worker thread (LLM_CONCURRENCY caps those calls).
+    
+    Returns:
+        Future: The rag_query result
+    
+    Raises:
+        ServerBusy: If the queue is full
+    """
+    prepared = admission.submit(prepare_rag_query, query_text, **options)
+    future = Future()
+    
+    def answer():
+        try:
+            outcome = wait_for(prepared.result)
+            if isinstance(outcome, PendingAnswer):
+                with _llm_slots:
+                    outcome = outcome.complete()
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(outcome)
+    
+    gevent.spawn(answer)
+    return future
+
+def shared_result(result, query_text, coalesced):
+    """Tailor a (possibly shared) result to the request that asked for it."""
+    if not coalesced:
+        return result
+    return {**result, "query": query_text, "coalesced": True}
+
+# Conversation history: recent messages in RAM under byte caps, everything in SQLite
+conversations = ConversationStore(
+    max_session_bytes=int(os.getenv("RAG_CONVERSATION_SESSION_BYTES", 256 * 1024)),
+    max_total_bytes=int(os.getenv("RAG_CONVERSATION_TOTAL_BYTES", 64 * 1024 * 1024))
+)
+
+# Socket.IO session ID -> conversation IDs it used, released from RAM on disconnect
+session_conversations = {}
+# Socket.IO session ID -> conversation that queries without a conversation_id go to
+current_conversation = {}
+
+def use_conversation(session_id, conversation_id=None, create=True):
+    """
+    Pick the conversation a socket reads or writes.
+    
+    Clients only name conversations by the IDs the server issued, so one client can't
+    read or append to another's history by guessing or reusing an ID.
+    
+    Args:
+        session_id (str): Socket.IO session ID
+        conversation_id (str): ID from an earlier query_received/query_response, to resume
+        create (bool): Start a conversation if the session has none yet
+    
+    Returns:
+        str: Conversation ID, or None if conversation_id is unknown (or none exists and create is False)
+    """
+    if conversation_id:
+        if not conversations.exists(conversation_id):
+            return None
+    else:
+        conversation_id = current_conversation.get(session_id)
+        if conversation_id is None:
+            if not create:
+                return None
+            conversation_id = conversations.create()
+    
+    current_conversation[session_id] = conversation_id
+    session_conversations.setdefault(session_id, set()).add(conversation_id)
+    return conversation_id
 
 @app.route('/query', methods=['POST'])
 def query():
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('query'), str) or not data['query'].strip():
+        return jsonify({"error": "Body must be a JSON object with a non-empty 'query'"}), 400
     query_text = data['query']
-    result = rag_query(query_text)
-    return jsonify(result)
+    
+    try:
+        options = response_options(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        future, coalesced = submit_query(query_text, options)
+    except ServerBusy as e:
+        response = jsonify({"error": "Server busy", "retry_after": e.retry_after})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 503
+    
+    return jsonify(shared_result(wait_for(future.result), query_text, coalesced))
+
+@app.route('/query/batch', methods=['POST'])
+def query_batch():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Body must be a JSON object"}), 400
+    queries = data.get('queries')
+    
+    if not isinstance(queries, list) or not all(isinstance(q, str) and q.strip() for q in queries):
+        return jsonify({"error": "'queries' must be a list of non-empty strings"}), 400
+    if len(queries) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"At most {MAX_BATCH_SIZE} queries per batch"}), 400
+    try:
+        options = {**response_options(data), **batch_options(data)}
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    if not batch_slots.acquire(blocking=False):
+        response = jsonify({"error": "Server busy", "retry_after": 10})
+        response.headers['Retry-After'] = '10'
+        return response, 503
+    
+    results = rag_query_batch(queries, **options)
+    started = []
+    
+    def stream():
+        # One JSON object per line, as soon as each answer is ready
+        started.append(True)
+        try:
+            while True:
+                item = wait_for(next, results, None)
+                if item is None:
+                    break
+                index, result = item
+                yield serialization.dumps_line({"index": index, **result})
+        finally:
+            # Runs when stream() is closed at a yield, so no next() is in progress on results
+            results.close()
+    
+    def close():
+        if not started:
+            results.close()
+        batch_slots.release()
+    
+    response = Response(stream(), mimetype='application/x-ndjson')
+    response.call_on_close(close)
+    return response
 
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({"status": "healthy", "message": "RAG server is running"})
+    # Liveness: the process is up, whether or not the engines are warm yet
+    return jsonify({"status": "healthy", "message": "RAG server is running",
+                    "ready": get_context().ready.is_set()})
+
+@app.route('/health/ready', methods=['GET'])
+def health_ready():
+    # Readiness: only route traffic here once warmup has finished
+    status = {**get_context().status(), "admission": admission.stats()}
+    return jsonify(status), 200 if status["ready"] else 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Prometheus scrape target: stage latency histograms and cold-start timings
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
 
 # WebSocket events for real-time communication
 @socketio.on('connect')
@@ -36,8 +293,10 @@ def handle_connect():
 @socketio.on('disconnect')
 def handle_disconnect():
     print(f"Client disconnected: {request.sid}")
-    if request.sid in conversations:
-        del conversations[request.sid]
+    # History stays on disk and can be resumed with the issued conversation_id
+    current_conversation.pop(request.sid, None)
+    for conversation_id in session_conversations.pop(request.sid, ()):
+        conversations.release(conversation_id)
 
 @socketio.on('send_query')
 def handle_query(data):
@@ -48,51 +307,75 @@ def handle_query(data):
         emit('error', {'message': 'Query cannot be empty'})
         return
     
+    try:
+        options = response_options(data)
+    except ValueError as e:
+        emit('error', {'message': str(e), 'query': query_text})
+        return
+    
     print(f"Received query from {session_id}: {query_text}")
     
-    # Store conversation
-    if session_id not in conversations:
-        conversations[session_id] = []
+    # Store conversation (clients may resume an earlier one by passing the ID it was issued)
+    conversation_id = use_conversation(session_id, data.get('conversation_id'))
+    if conversation_id is None:
+        emit('error', {'message': 'Unknown conversation_id', 'query': query_text})
+        return
+    conversations.append(conversation_id, 'user', query_text)
     
-    conversations[session_id].append({
-        'type': 'user',
-        'message': query_text,
-        'timestamp': str(os.times())
-    })
+    try:
+        # Process with RAG on the worker pool; the handler returns immediately
+        future, coalesced = submit_query(query_text, options)
+    except ServerBusy as e:
+        emit('busy', {'query': query_text, 'retry_after': e.retry_after})
+        return
     
     # Emit query received confirmation
-    emit('query_received', {'query': query_text, 'status': 'processing'})
+    emit('query_received', {'query': query_text, 'status': 'processing', 'conversation_id': conversation_id})
     
-    try:
-        # Process with RAG
-        result = rag_query(query_text)
+    def send_result(future):
+        try:
+            result = shared_result(wait_for(future.result), query_text, coalesced)
+        except Exception as e:
+            error_msg = f"Error processing query: {str(e)}"
+            print(f"Error: {error_msg}")
+            socketio.emit('error', {'message': error_msg, 'query': query_text}, to=session_id)
+            return
         
-        # Store bot response
-        conversations[session_id].append({
-            'type': 'bot',
-            'message': result,
-            'timestamp': str(os.times())
-        })
+        # Store bot response (chunk IDs only, not the retrieved texts)
+        conversations.append(conversation_id, 'bot', result)
         
         # Send response back
-        emit('query_response', {
+        socketio.emit('query_response', {
             'query': query_text,
             'response': result,
-            'status': 'completed'
-        })
-        
-    except Exception as e:
-        error_msg = f"Error processing query: {str(e)}"
-        print(f"Error: {error_msg}")
-        emit('error', {'message': error_msg, 'query': query_text})
+            'status': 'completed',
+            'conversation_id': conversation_id
+        }, to=session_id)
+    
+    if ASYNC_MODE == "gevent":
+        # Emit from a greenlet, not from the worker thread that finishes the query
+        gevent.spawn(send_result, future)
+    else:
+        future.add_done_callback(send_result)
 
 @socketio.on('get_conversation')
-def handle_get_conversation():
-    session_id = request.sid
-    conversation = conversations.get(session_id, [])
-    emit('conversation_history', {'conversation': conversation})
+def handle_get_conversation(data=None):
+    requested = (data or {}).get('conversation_id')
+    conversation_id = use_conversation(request.sid, requested, create=False)
+    if conversation_id is None:
+        if requested:
+            emit('error', {'message': 'Unknown conversation_id'})
+        else:
+            emit('conversation_history', {'conversation': [], 'conversation_id': None})
+        return
+    conversation = conversations.get(conversation_id)
+    emit('conversation_history', {'conversation': conversation, 'conversation_id': conversation_id})
 
 if __name__ == '__main__':
+    # Load indexes and models while already answering health checks
+    get_context().start_background_warmup()
+    
     print("Server running on http://127.0.0.1:5000")
-    print("WebSocket enabled for real-time communication")
+    print(f"WebSocket enabled for real-time communication ({ASYNC_MODE} mode, "
+          f"{admission.workers} workers, queue depth {admission.queue_depth})")
     socketio.run(app, debug=False, host='127.0.0.1', port=5000)  # Disable debug to avoid restart issues
@@ -0,0 +1,35 @@
+"""
+Fast JSON Serialization
+orjson-backed encoders for Flask responses, Socket.IO packets and NDJSON streams.
+"""
+
+import orjson
+from flask.json.provider import JSONProvider
+
+# numpy scalars appear in BM25 scores
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(obj, *args, **kwargs):
+    """Serialize to a JSON string (stdlib-style arguments such as separators are ignored)."""
+    return orjson.dumps(obj, option=ORJSON_OPTIONS).decode('utf-8')
+
+
+def loads(s, *args, **kwargs):
+    """Parse a JSON string or bytes."""
+    return orjson.loads(s)
+
+
+def dumps_line(obj):
+    """Serialize to one NDJSON line."""
+    return orjson.dumps(obj, option=ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider used by jsonify() and request.get_json()."""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s)
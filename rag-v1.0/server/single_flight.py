@@ -0,0 +1,63 @@
+"""
+Single-Flight Request Coalescing
+Concurrent requests for the same normalized query share one in-flight computation.
+"""
+
+import threading
+
+from caching.expansion_cache import normalize_query
+
+def query_key(query_text, **params):
+    """
+    Build the coalescing key for a query.
+
+    Args:
+        query_text (str): User's question
+        **params: rag_query parameters that change the result
+
+    Returns:
+        tuple: Normalized query plus sorted parameters
+    """
+    return (normalize_query(query_text), tuple(sorted(params.items())))
+
+class SingleFlight:
+    """
+    Map of key -> Future for computations that are still running.
+    The first caller (leader) starts the work; later callers attach to its Future.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, start):
+        """
+        Join the in-flight computation for key, or start it.
+
+        Args:
+            key (tuple): Coalescing key (see query_key)
+            start (callable): Starts the work and returns its Future; may raise (e.g. ServerBusy)
+
+        Returns:
+            tuple: (Future, True if this caller started the work)
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+
+            future = start()
+            self._calls[key] = future
+
+        # Later requests recompute (or hit the answer cache) once this one is done
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future, True
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._calls)
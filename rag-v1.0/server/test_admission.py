@@ -0,0 +1,39 @@
+"""
+Test Admission Control
+"""
+
+import threading
+
+from admission import AdmissionController, ServerBusy
+
+
+def test_rejects_when_full():
+    """Work beyond workers + queue depth is rejected until a slot frees up."""
+
+    print("🔍 Testing admission control")
+    print("=" * 50)
+
+    admission = AdmissionController(workers=2, queue_depth=1)
+    release = threading.Event()
+
+    futures = [admission.submit(release.wait) for _ in range(3)]
+    print(f"Admitted 3, stats: {admission.stats()}")
+
+    try:
+        admission.submit(release.wait)
+        raise AssertionError("fourth query should have been rejected")
+    except ServerBusy as e:
+        print(f"Rejected with retry_after={e.retry_after}")
+        assert e.retry_after >= 1
+
+    release.set()
+    for future in futures:
+        future.result()
+
+    # Slots are released on completion
+    assert admission.submit(lambda: "ok").result() == "ok"
+    print(f"Admitted again, stats: {admission.stats()}")
+
+
+if __name__ == "__main__":
+    test_rejects_when_full()
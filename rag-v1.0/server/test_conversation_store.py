@@ -0,0 +1,73 @@
+"""
+Test Bounded Conversation Store
+"""
+
+import os
+import tempfile
+
+from conversation_store import ConversationStore
+
+
+def sample_result(query):
+    chunk = {"chunk_id": "paper_chunk_1", "filename": "paper.pdf", "chunk_number": 1, "text": "word " * 500}
+    return {
+        "query": query,
+        "answer": "An answer",
+        "sources": ["paper.pdf"],
+        "search_results": {"bm25": [chunk], "chroma": [chunk]},
+        "context_used": [chunk["text"]]
+    }
+
+
+def test_caps_and_persistence():
+    """Results are stored without chunk texts, RAM stays under the caps and history survives a reopen."""
+
+    print("🔍 Testing conversation store")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "conversations.sqlite3")
+        store = ConversationStore(path, max_session_bytes=1000, max_total_bytes=1500)
+
+        for i in range(10):
+            store.append("session_a", "user", f"question {i}")
+            store.append("session_a", "bot", sample_result(f"question {i}"))
+        store.append("session_b", "user", "another question")
+
+        stats = store.stats()
+        print(f"RAM: {stats}")
+        assert stats["bytes_in_memory"] <= 1500
+
+        history = store.get("session_a")
+        assert len(history) == 20  # Trimmed from RAM, read back from disk
+        assert history[1]["message"]["chunk_ids"] == ["paper_chunk_1"]
+        assert "search_results" not in history[1]["message"]
+
+        store.close()
+        reopened = ConversationStore(path)
+        assert len(reopened.get("session_a")) == 20
+        reopened.append("session_a", "user", "after restart")
+        assert len(reopened.get("session_a")) == 21
+        print("History survives restart: 21 messages")
+        reopened.close()
+
+
+def test_issued_ids():
+    """Only IDs from create() exist, and they survive a reopen."""
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "conversations.sqlite3")
+        store = ConversationStore(path)
+        first, second = store.create(), store.create()
+        assert first != second
+        assert store.exists(first) and not store.exists("default") and not store.exists(None)
+        store.close()
+
+        reopened = ConversationStore(path)
+        assert reopened.exists(second)
+        reopened.close()
+
+
+if __name__ == "__main__":
+    test_caps_and_persistence()
+    test_issued_ids()
@@ -0,0 +1,101 @@
+"""
+Test Gevent Mode
+Runs the server module with RAG_ASYNC_MODE=gevent in a child process (monkey-patching must
+happen before anything else is imported), against the OpenRouter stub with a fixed latency.
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+STUB = os.path.join(os.path.dirname(SERVER_DIR), "benchmarks", "openrouter_stub.py")
+LLM_LATENCY = 0.4  # Seconds per stub LLM call
+
+# Runs in the child process
+CHILD = """
+import json, os, sys, time
+sys.path.insert(0, os.getcwd())
+import run  # Patches sockets first
+import ai
+from types import SimpleNamespace
+from test_run import FakeEngines
+
+ai.get_context = lambda: SimpleNamespace(engines=FakeEngines(), base_url=os.environ["OPENROUTER_BASE_URL"],
+                                         api_key="test", answer_cache=None)
+options = {"detail": "sources", "include_snippets": False, "use_cache": False}
+
+def ask(queries, expansion):
+    start = time.perf_counter()
+    futures = [run.submit_query(query, {**options, "use_query_expansion": expansion})[0] for query in queries]
+    results = [run.wait_for(future.result) for future in futures]
+    return time.perf_counter() - start, results
+
+# Answers only: the LLM calls run as greenlets, not on the 2 workers
+answers_elapsed, answers = ask([f"Question {i}?" for i in range(12)], False)
+# With expansion: LLM calls from the expansion threads too, each thread on its own hub
+expanded_elapsed, expanded = ask([f"Expanded question {i}?" for i in range(4)], True)
+
+print(json.dumps({"answers_elapsed": answers_elapsed, "answers": answers,
+                  "expanded_elapsed": expanded_elapsed, "expanded": expanded}))
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Nothing listening on port {port}")
+
+
+def test_llm_calls_in_gevent_mode():
+    """LLM calls in gevent mode aren't capped by the worker pool and work from every thread."""
+
+    print("🌿 Testing gevent mode")
+    print("=" * 50)
+
+    port = free_port()
+    stub = subprocess.Popen([sys.executable, STUB, "--port", str(port), "--latency-ms", str(LLM_LATENCY * 1000),
+                             "--latency-jitter-ms", "0", "--tokens-per-sec", "0"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        env = {**os.environ, "RAG_ASYNC_MODE": "gevent", "RAG_WORKERS": "2", "RAG_QUEUE_DEPTH": "30",
+               "OPENROUTER_BASE_URL": f"http://127.0.0.1:{port}/api/v1"}
+        child = subprocess.run([sys.executable, "-c", CHILD], cwd=SERVER_DIR, env=env,
+                               capture_output=True, text=True, timeout=120)
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    assert child.returncode == 0, child.stderr[-2000:]
+    assert "cannot switch to a different thread" not in child.stderr
+    report = json.loads(child.stdout.strip().splitlines()[-1])
+    print(f"12 answers with 2 workers in {report['answers_elapsed']:.2f}s, "
+          f"4 expanded queries in {report['expanded_elapsed']:.2f}s")
+
+    for result in report["answers"] + report["expanded"]:
+        assert "error" not in result and result["answer"], result
+    assert all(len(result["expanded_queries"]) == 3 for result in report["expanded"])
+
+    # Holding a worker through each call would take 12 / 2 workers * LLM_LATENCY = 2.4s
+    assert report["answers_elapsed"] < 12 / 2 * LLM_LATENCY / 2
+
+    print("✅ LLM calls ran concurrently beyond the worker pool")
+
+
+if __name__ == "__main__":
+    test_llm_calls_in_gevent_mode()
@@ -0,0 +1,225 @@
+"""
+Test Server Endpoints
+With the RAG pipeline stubbed out, so no models or indexes are needed.
+"""
+
+import json
+import os
+import socket
+import tempfile
+import time
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import requests
+
+import run  # Adds the parent directory for ai.py
+import ai
+from conversation_store import ConversationStore
+from observability import tracing
+
+
+def answered(query_text, options):
+    """submit_query stand-in that answers at once."""
+    future = Future()
+    future.set_result({"query": query_text, "answer": f"Answer to {query_text}", "sources": []})
+    return future, False
+
+
+def events(client, name):
+    return [event['args'][0] for event in client.get_received() if event['name'] == name]
+
+
+def test_conversations_are_bound_to_issued_ids():
+    """A socket can only resume conversations by an ID the server issued."""
+
+    print("🔒 Testing conversation ownership")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        original_store, original_submit = run.conversations, run.submit_query
+        run.conversations = ConversationStore(os.path.join(tmp_dir, "conversations.sqlite3"))
+        run.submit_query = answered
+        try:
+            alice = run.socketio.test_client(run.app)
+            (connected,) = events(alice, 'connected')
+            alice.emit('send_query', {'query': 'What is antimatter?'})
+            alice.emit('send_query', {'query': 'Who found positrons?'})
+            responses = events(alice, 'query_response')
+            conversation_id = responses[0]['conversation_id']
+            print(f"Issued conversation_id: {conversation_id}")
+            assert len(conversation_id) >= 32
+            assert [r['conversation_id'] for r in responses] == [conversation_id] * 2
+
+            # Another client can't read or write by guessing a session ID or a common name
+            mallory = run.socketio.test_client(run.app)
+            mallory.get_received()
+            for guess in [connected['session_id'], "default"]:
+                mallory.emit('get_conversation', {'conversation_id': guess})
+                mallory.emit('send_query', {'query': 'Injected', 'conversation_id': guess})
+                errors = events(mallory, 'error')
+                assert [e['message'] for e in errors] == ['Unknown conversation_id'] * 2
+            mallory.emit('get_conversation')
+            assert events(mallory, 'conversation_history') == [{'conversation': [], 'conversation_id': None}]
+
+            # The owner resumes after reconnecting by presenting the issued ID
+            alice.disconnect()
+            alice = run.socketio.test_client(run.app)
+            alice.emit('get_conversation', {'conversation_id': conversation_id})
+            (history,) = events(alice, 'conversation_history')
+            assert [m['type'] for m in history['conversation']] == ['user', 'bot', 'user', 'bot']
+            alice.emit('send_query', {'query': 'And electrons?'})
+            assert len(run.conversations.get(conversation_id)) == 6
+            print("Resumed with the issued ID; guessed IDs rejected")
+            alice.disconnect()
+            mallory.disconnect()
+        finally:
+            run.conversations.close()
+            run.conversations, run.submit_query = original_store, original_submit
+
+
+class FakeEngines:
+    """One matching chunk per query from each search method."""
+
+    def bm25_search_many(self, queries, top_k):
+        return [[{"chunk_id": "paper_chunk_1", "filename": "paper.pdf", "chunk_number": 1,
+                  "text": f"Positrons are the antiparticles of electrons. {query}", "score": 2.0}] for query in queries]
+
+    def chroma_search_many(self, queries, top_k):
+        return [[{"chunk_id": "paper_chunk_2", "filename": "paper.pdf", "chunk_number": 2,
+                  "text": "Antimatter annihilates with matter.", "distance": 0.2}] for _ in queries]
+
+    def bm25_search(self, query, top_k):
+        return self.bm25_search_many([query], top_k)[0]
+
+    def chroma_search(self, query, top_k, query_embedding=None):
+        return self.chroma_search_many([query], top_k)[0]
+
+
+def fake_llm(prompt, model=ai.LLM_MODEL):
+    """Expansion prompts get one variation, answer prompts echo their question."""
+    if "query expansion expert" in prompt:
+        return "Alternative phrasing " + prompt.split('Original query: "')[1].split('"')[0]
+    return "Answer to " + prompt.split("QUESTION: ")[1].split("\n")[0]
+
+
+def stubbed_pipeline(test):
+    """Run test with the search engines and the LLM replaced by fakes."""
+    def run_test():
+        original = ai.get_context, ai.call_openrouter_api
+        ai.get_context = lambda: SimpleNamespace(engines=FakeEngines(), answer_cache=None)
+        ai.call_openrouter_api = fake_llm
+        try:
+            test()
+        finally:
+            ai.get_context, ai.call_openrouter_api = original
+    run_test.__name__ = test.__name__
+    run_test.__doc__ = test.__doc__
+    return run_test
+
+
+@stubbed_pipeline
+def test_rag_query_batch():
+    """Every question is answered once, with its own variants, whatever order they finish in."""
+
+    print("📦 Testing rag_query_batch")
+    print("=" * 50)
+
+    queries = ["What is antimatter?", "Who found positrons?", "What is antimatter?"]
+    results = dict(ai.rag_query_batch(queries, top_k=2, detail="sources", use_cache=False))
+    print(f"Answers: {[results[i]['answer'] for i in sorted(results)]}")
+
+    assert sorted(results) == [0, 1, 2]
+    for index, query in enumerate(queries):
+        assert results[index]["query"] == query
+        assert results[index]["answer"] == f"Answer to {query}"
+        assert results[index]["expanded_queries"] == [query, f"Alternative phrasing {query}"]
+        assert results[index]["sources"] == ["paper.pdf"]
+
+
+@stubbed_pipeline
+def test_batch_endpoint():
+    """/query/batch streams one line per question, validates its options and always frees its slot."""
+
+    client = run.app.test_client()
+    free_slots = run.batch_slots._value
+
+    response = client.post('/query/batch', json={"queries": ["What is antimatter?", "Who found positrons?"],
+                                                 "top_k": 2, "use_query_expansion": False, "cache": False})
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    response.close()  # As the WSGI server does after the last line
+    assert response.status_code == 200
+    assert sorted(line["index"] for line in lines) == [0, 1]
+    assert all(line["answer"] == f"Answer to {line['query']}" for line in lines)
+    assert run.batch_slots._value == free_slots
+
+    for body in [{"queries": ["q"], "top_k": "3"}, {"queries": ["q"], "top_k": 0},
+                 {"queries": ["q"], "top_k": run.MAX_TOP_K + 1}, {"queries": ["q"], "top_k": True},
+                 {"queries": ["q"], "use_query_expansion": "no"}, ["q"], "q"]:
+        response = client.post('/query/batch', json=body)
+        print(f"{body!r}: {response.status_code} {response.get_json()}")
+        assert response.status_code == 400 and "error" in response.get_json()
+    assert client.post('/query', json=["q"]).status_code == 400
+    assert client.post('/query', data="not json", content_type='application/json').status_code == 400
+
+    # A client that goes away before reading anything still releases the slot
+    response = client.post('/query/batch', json={"queries": ["What is antimatter?"], "cache": False}, buffered=False)
+    response.close()
+    assert run.batch_slots._value == free_slots
+
+    # ...and so does one that goes away after the first line
+    response = client.post('/query/batch', json={"queries": ["What is antimatter?", "Who found positrons?"],
+                                                 "cache": False}, buffered=False)
+    next(iter(response.response))
+    response.close()
+    assert run.batch_slots._value == free_slots
+
+
+@stubbed_pipeline
+def test_prepared_answer():
+    """prepare_rag_query stops before the LLM call; completing it gives rag_query's result and timings."""
+
+    prepared = ai.prepare_rag_query("Who found positrons?", top_k=2, use_query_expansion=False, use_cache=False)
+    assert isinstance(prepared, ai.PendingAnswer)
+
+    result = prepared.complete()
+    print(f"Answer: {result['answer']}, timings: {sorted(result.get('timings', {}))}")
+    assert result["answer"] == "Answer to Who found positrons?"
+    assert result["sources"] == ["paper.pdf"]
+    if tracing.TRACING_ENABLED:
+        assert {"generation", "total"} <= set(result["timings"])
+
+    direct = ai.rag_query("Who found positrons?", top_k=2, use_query_expansion=False, use_cache=False)
+    assert direct["answer"] == result["answer"]
+
+
+def test_llm_timeout():
+    """An LLM API that accepts the connection but never answers fails after LLM_TIMEOUT."""
+
+    with socket.socket() as server:
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        original = ai.get_context, ai.LLM_TIMEOUT
+        ai.get_context = lambda: SimpleNamespace(base_url=f"http://127.0.0.1:{server.getsockname()[1]}",
+                                                 api_key="test")
+        ai.LLM_TIMEOUT = 0.5
+        start = time.perf_counter()
+        try:
+            ai.call_openrouter_api("Who found positrons?")
+        except requests.Timeout:
+            elapsed = time.perf_counter() - start
+        else:
+            raise AssertionError("Expected a timeout")
+        finally:
+            ai.get_context, ai.LLM_TIMEOUT = original
+
+    print(f"Timed out after {elapsed:.2f}s")
+    assert elapsed < 5
+
+
+if __name__ == "__main__":
+    test_conversations_are_bound_to_issued_ids()
+    test_rag_query_batch()
+    test_batch_endpoint()
+    test_prepared_answer()
+    test_llm_timeout()
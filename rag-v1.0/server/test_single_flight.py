@@ -0,0 +1,82 @@
+"""
+Test Single-Flight Request Coalescing
+"""
+
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory for caching.expansion_cache
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from single_flight import SingleFlight, query_key
+
+
+def test_identical_queries_share_one_call():
+    """Concurrent identical queries run once; every caller gets the same result."""
+
+    print("🔗 Testing single-flight coalescing")
+    print("=" * 50)
+
+    single_flight = SingleFlight()
+    pool = ThreadPoolExecutor(max_workers=2)
+    release = threading.Event()
+    calls = []
+
+    def start():
+        calls.append(1)
+        return pool.submit(lambda: release.wait() and {"answer": "A"})
+
+    keys = [query_key(q, detail="sources") for q in ["What is antimatter?", "  what is ANTIMATTER? ", "What is antimatter?"]]
+    submitted = [single_flight.submit(key, start) for key in keys]
+    print(f"Calls started: {len(calls)}, in flight: {len(single_flight)}")
+    assert len(calls) == 1 and len(single_flight) == 1
+    assert [leader for _, leader in submitted] == [True, False, False]
+
+    # Other parameters are a different computation
+    other, leader = single_flight.submit(query_key("What is antimatter?", detail="full"), start)
+    assert leader and len(calls) == 2
+
+    release.set()
+    assert all(future.result(timeout=5) == {"answer": "A"} for future, _ in submitted)
+    other.result(timeout=5)
+    pool.shutdown()  # Waits for the done callbacks too
+
+    # Finished calls are forgotten, so the next identical query starts a new one
+    assert len(single_flight) == 0
+    future, leader = single_flight.submit(keys[0], lambda: ThreadPoolExecutor(max_workers=1).submit(dict))
+    assert leader and future.result(timeout=5) == {}
+
+
+def test_exception_reaches_every_waiter():
+    """A failing call raises in every caller that joined it."""
+
+    single_flight = SingleFlight()
+    pool = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+
+    def fail():
+        release.wait()
+        raise RuntimeError("LLM unavailable")
+
+    key = query_key("Who found positrons?")
+    futures = [single_flight.submit(key, lambda: pool.submit(fail))[0] for _ in range(3)]
+    release.set()
+
+    errors = []
+    for future in futures:
+        try:
+            future.result(timeout=5)
+        except RuntimeError as e:
+            errors.append(str(e))
+    pool.shutdown()  # Waits for the done callbacks too
+
+    print(f"Errors: {errors}")
+    assert errors == ["LLM unavailable"] * 3
+    assert len(single_flight) == 0
+
+
+if __name__ == "__main__":
+    test_identical_queries_share_one_call()
+    test_exception_reaches_every_waiter()